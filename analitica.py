@@ -0,0 +1,450 @@
+# ========================================
+# ANALÍTICA COLUMNAR CON NUMPY - Carloszerpav
+# ========================================
+# Los reportes por período recorrían dicts venta por venta. Aquí el libro
+# se guarda además como columnas de NumPy y cada reporte es un par de
+# máscaras y sumas agrupadas (bincount), sin bucles de Python por venta
+#
+# - LibroColumnar: índice derivado del VentaStore con una columna por dato
+#   (día, valor, abonado, pendiente, máscara de rubros, estado, cliente)
+# - La posición en las columnas es el ID de la venta: agregar y quitar son
+#   O(1) y las ventas del período salen ya ordenadas por ID
+# - Un índice por día (días con ventas ordenados y los IDs de cada día)
+#   se mantiene con cada escritura: un rango se ubica con bisect y solo
+#   toca sus filas, O(log n + días + ventas del rango)
+# - Reportes: totales, por rubro, series por día / semana / mes, mejores
+#   clientes y ticket promedio por rubro
+# - Las ventas archivadas (archivo.py) no están en las columnas: cada
+#   partición que cruza el período entra como un bloque aparte (bloque())
+# - CachePeriodos guarda los reportes ya calculados por rango de días: un
+#   cambio solo descarta los rangos que incluyen el día de la venta
+
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+
+import numpy as np
+
+from busqueda import plegar_texto
+from cache_lru import CacheLRU
+from estadisticas import limpiar_total, ordinal_de_fecha
+from modelo import ESTADOS
+
+# Estado de una posición sin venta (ID eliminado o nunca usado)
+SIN_VENTA = -1
+
+# Día 0 de datetime64 (1970-01-01) como ordinal, para pasar a meses
+_ORDINAL_EPOCA = date(1970, 1, 1).toordinal()
+
+# Mejores clientes que devuelve el reporte por defecto
+TOP_CLIENTES = 10
+
+# Campos de la venta que cambian un reporte por período
+CAMPOS_PERIODO = frozenset(('cliente', 'valor_total', 'abono', 'saldo_pendiente', 'rubros', 'fecha', 'estado'))
+# Más los que solo se ven en el detalle del reporte (el cierre mensual
+# cambia cómo sale cada venta, no las sumas)
+CAMPOS_DETALLE_PERIODO = CAMPOS_PERIODO | {'incluida_en_estadisticas', 'mes_cierre'}
+
+# Reportes por período que se guardan ya calculados
+PERIODOS_EN_CACHE = 32
+
+
+def _serie(claves, cantidad, valor_total, abonado):
+    return {
+        clave: {'cantidad': int(c), 'valor_total': limpiar_total(v), 'abonado': limpiar_total(a)}
+        for clave, c, v, a in zip(claves, cantidad.tolist(), valor_total.tolist(), abonado.tolist())
+    }
+
+
+def _agrupar(grupos, *columnas):
+    """
+    Suma columnas por grupo con bincount (sin ordenar)
+    Args:
+        grupos (ndarray): Clave entera de grupo de cada fila
+        *columnas (ndarray): Valores a sumar
+    Returns:
+        tuple: (claves con filas, en orden; cantidad por clave; suma de cada columna)
+    """
+    if not len(grupos):
+        vacio = np.zeros(0)
+        return (np.zeros(0, dtype=np.int64), vacio, *(vacio for _ in columnas))
+    base = int(grupos.min())
+    posicion = grupos - base
+    cantidad = np.bincount(posicion)
+    usadas = np.flatnonzero(cantidad)
+    sumas = [np.bincount(posicion, weights=columna)[usadas] for columna in columnas]
+    return (usadas + base, cantidad[usadas], *sumas)
+
+
+class LibroColumnar:
+    """
+    El libro de ventas como columnas de NumPy para los reportes por período
+
+    Se registra como índice derivado del VentaStore. quitar() marca la
+    posición como vacía y la saca del índice por día; agregar() la vuelve
+    a escribir
+    """
+
+    def __init__(self, rubros, capacidad_inicial=1024):
+        self.rubros = list(rubros)
+        self._bit_rubro = {rubro: 1 << i for i, rubro in enumerate(self.rubros)}
+        # Campos de los que depende (ver VentaStore.actualizar)
+        self.campos = CAMPOS_PERIODO
+
+        self._dia = np.zeros(capacidad_inicial, dtype=np.int32)
+        self._valor = np.zeros(capacidad_inicial, dtype=np.float64)
+        self._abono = np.zeros(capacidad_inicial, dtype=np.float64)
+        self._saldo = np.zeros(capacidad_inicial, dtype=np.float64)
+        self._rubros = np.zeros(capacidad_inicial, dtype=np.int32)
+        self._estado = np.full(capacidad_inicial, SIN_VENTA, dtype=np.int8)
+        self._cliente = np.zeros(capacidad_inicial, dtype=np.int32)
+        # Referencia a cada venta por ID (para el detalle del período)
+        self._ventas = np.full(capacidad_inicial, None, dtype=object)
+
+        # Clientes por nombre plegado; se muestra el primer nombre visto
+        self._codigo_cliente = {}
+        self._nombres_clientes = []
+        self._largo = 0   # Posiciones en uso (ID más alto + 1)
+
+        # Índice por día: los días con ventas en orden y los IDs de cada
+        # día en orden, para sacar las filas de un rango sin recorrer todo
+        # (array de int64: NumPy lo lee como buffer, sin pasar por Python)
+        self._dias = []
+        self._ids_por_dia = {}
+
+    def _asegurar_capacidad(self, posicion):
+        capacidad = len(self._estado)
+        if posicion < capacidad:
+            return
+        while capacidad <= posicion:
+            capacidad *= 2
+        for nombre in ('_dia', '_valor', '_abono', '_saldo', '_rubros', '_cliente'):
+            columna = getattr(self, nombre)
+            nueva = np.zeros(capacidad, dtype=columna.dtype)
+            nueva[:len(columna)] = columna
+            setattr(self, nombre, nueva)
+        for nombre, vacio in (('_estado', SIN_VENTA), ('_ventas', None)):
+            columna = getattr(self, nombre)
+            nueva = np.full(capacidad, vacio, dtype=columna.dtype)
+            nueva[:len(columna)] = columna
+            setattr(self, nombre, nueva)
+
+    def _codigo(self, cliente):
+        plegado = plegar_texto(cliente)
+        codigo = self._codigo_cliente.get(plegado)
+        if codigo is None:
+            codigo = self._codigo_cliente[plegado] = len(self._nombres_clientes)
+            self._nombres_clientes.append(cliente)
+        return codigo
+
+    def agregar(self, venta):
+        dia = ordinal_de_fecha(venta['fecha'])
+        if dia is None or venta['estado'] not in ESTADOS:
+            return
+        posicion = venta['id']
+        self._asegurar_capacidad(posicion)
+        if self._estado[posicion] != SIN_VENTA:
+            self._quitar_del_dia(posicion)
+        mascara = 0
+        for rubro in venta['rubros']:
+            mascara |= self._bit_rubro.get(rubro, 0)
+        self._dia[posicion] = dia
+        self._valor[posicion] = venta['valor_total']
+        self._abono[posicion] = venta['abono']
+        self._saldo[posicion] = venta['saldo_pendiente']
+        self._rubros[posicion] = mascara
+        self._estado[posicion] = ESTADOS.index(venta['estado'])
+        self._cliente[posicion] = self._codigo(venta['cliente'])
+        self._ventas[posicion] = venta
+        self._largo = max(self._largo, posicion + 1)
+
+        ids = self._ids_por_dia.get(dia)
+        if ids is None:
+            ids = self._ids_por_dia[dia] = array('q')
+            insort(self._dias, dia)
+        if not ids or ids[-1] < posicion:
+            ids.append(posicion)
+        else:
+            insort(ids, posicion)
+
+    def quitar(self, venta):
+        posicion = venta['id']
+        if posicion < self._largo and self._estado[posicion] != SIN_VENTA:
+            self._quitar_del_dia(posicion)
+            self._estado[posicion] = SIN_VENTA
+            self._ventas[posicion] = None
+
+    def _quitar_del_dia(self, posicion):
+        # Saca el ID del índice por día (el día es el de la columna, no el
+        # de la venta, que puede haber cambiado ya)
+        dia = int(self._dia[posicion])
+        ids = self._ids_por_dia[dia]
+        del ids[bisect_left(ids, posicion)]
+        if not ids:
+            del self._ids_por_dia[dia]
+            del self._dias[bisect_left(self._dias, dia)]
+
+    def _ids_del_rango(self, inicio, fin):
+        # Listas de IDs de cada día con ventas del rango, en orden de día
+        desde = bisect_left(self._dias, inicio)
+        hasta = bisect_right(self._dias, fin)
+        return [self._ids_por_dia[dia] for dia in self._dias[desde:hasta]]
+
+    def _seleccion(self, inicio, fin):
+        # Columnas de las ventas del libro que caen en el rango, en orden de ID
+        por_dia = self._ids_del_rango(inicio, fin)
+        if not por_dia:
+            ids = np.zeros(0, dtype=np.int64)
+        elif sum(map(len, por_dia)) * 2 > self._largo:
+            # Más de la mitad del libro: una pasada por las columnas cuesta
+            # lo mismo y los IDs salen ya en orden, sin ordenarlos
+            largo = self._largo
+            dias = self._dia[:largo]
+            ids = np.flatnonzero((self._estado[:largo] != SIN_VENTA) & (dias >= inicio) & (dias <= fin))
+        else:
+            ids = np.concatenate([np.frombuffer(ids_dia, dtype=np.int64) for ids_dia in por_dia])
+            ids.sort()
+        return {
+            'id': ids,
+            'dia': self._dia[ids],
+            'valor': self._valor[ids],
+            'abono': self._abono[ids],
+            'saldo': self._saldo[ids],
+            'rubros': self._rubros[ids],
+            'estado': self._estado[ids],
+            'cliente': self._cliente[ids],
+            'venta': self._ventas[ids]
+        }
+
+    def recorrer(self, inicio, fin):
+        """
+        Las ventas del libro en un rango de días (ambos incluidos), en orden
+        de fecha y luego de ID (para exportar un período)
+        Returns:
+            list: Las ventas del rango
+        """
+        # El índice por día ya da ese orden
+        por_dia = self._ids_del_rango(inicio, fin)
+        if not por_dia:
+            return []
+        return self._ventas[np.concatenate([np.frombuffer(ids_dia, dtype=np.int64) for ids_dia in por_dia])].tolist()
+
+    def bloque(self, ventas_bloque):
+        """
+        Columnas de ventas que no están en el libro (una partición del
+        archivo), con los mismos códigos de cliente que el libro
+        Args:
+            ventas_bloque (list): Ventas en orden de ID
+        Returns:
+            dict: Una columna por dato, como las de _seleccion()
+        """
+        filas = []
+        for venta in ventas_bloque:
+            dia = ordinal_de_fecha(venta['fecha'])
+            if dia is None or venta['estado'] not in ESTADOS:
+                continue
+            mascara = 0
+            for rubro in venta['rubros']:
+                mascara |= self._bit_rubro.get(rubro, 0)
+            filas.append((venta['id'], dia, venta['valor_total'], venta['abono'], venta['saldo_pendiente'],
+                          mascara, ESTADOS.index(venta['estado']), self._codigo(venta['cliente']), venta))
+        columnas = list(zip(*filas)) or [()] * 9
+        objetos = np.empty(len(filas), dtype=object)
+        objetos[:] = columnas[8]
+        return {
+            'id': np.array(columnas[0], dtype=np.int64),
+            'dia': np.array(columnas[1], dtype=np.int32),
+            'valor': np.array(columnas[2], dtype=np.float64),
+            'abono': np.array(columnas[3], dtype=np.float64),
+            'saldo': np.array(columnas[4], dtype=np.float64),
+            'rubros': np.array(columnas[5], dtype=np.int32),
+            'estado': np.array(columnas[6], dtype=np.int8),
+            'cliente': np.array(columnas[7], dtype=np.int32),
+            'venta': objetos
+        }
+
+    def consultar(self, inicio, fin, top_clientes=TOP_CLIENTES, bloques=()):
+        """
+        Estadísticas de un rango de días (ambos incluidos)
+        Args:
+            inicio (int): Ordinal del primer día
+            fin (int): Ordinal del último día
+            top_clientes (int): Cuántos clientes devolver en 'top_clientes'
+            bloques (iterable): Columnas de ventas fuera del libro que
+                también entran al reporte (ver bloque())
+        Returns:
+            dict: Totales, conteos por estado, 'por_rubro', 'por_dia',
+                  'ventas_detalle', 'por_semana', 'por_mes', 'top_clientes', 'ticket_promedio'
+                  y 'ticket_promedio_por_rubro'
+        """
+        columnas = self._seleccion(inicio, fin)
+        extra = []
+        for bloque in bloques:
+            dias = bloque['dia']
+            if not len(dias):
+                continue
+            if dias.min() >= inicio and dias.max() <= fin:
+                # El bloque entero cae en el rango: sin copiar columnas
+                extra.append(bloque)
+                continue
+            dentro = (dias >= inicio) & (dias <= fin)
+            if dentro.any():
+                extra.append({nombre: columna[dentro] for nombre, columna in bloque.items()})
+        if extra:
+            todas = [columnas] + extra
+            columnas = {nombre: np.concatenate([c[nombre] for c in todas]) for nombre in columnas}
+            # El detalle sigue en orden de ID aunque venga de varios bloques
+            orden = np.argsort(columnas['id'], kind='stable')
+            columnas['venta'] = columnas['venta'][orden]
+
+        dia = columnas['dia']
+        valor = columnas['valor']
+        abono = columnas['abono']
+        saldo = columnas['saldo']
+        rubros = columnas['rubros']
+        estado = columnas['estado']
+        cliente = columnas['cliente']
+        total = len(dia)
+
+        # Matriz venta × rubro (0/1) desde la máscara: un producto da las
+        # sumas de todos los rubros a la vez
+        bits = ((rubros[:, None] >> np.arange(len(self.rubros))) & 1).astype(np.float64)
+        cantidades = bits.sum(axis=0).astype(np.int64).tolist()
+        sumas = (bits.T @ np.column_stack((valor, abono, saldo))).tolist()
+
+        por_rubro = {}
+        ticket_promedio_por_rubro = {}
+        for rubro, cantidad, (valor_rubro, abonado, pendiente) in zip(self.rubros, cantidades, sumas):
+            por_rubro[rubro] = {
+                'cantidad': cantidad,
+                'valor_total': limpiar_total(valor_rubro),
+                'abonado': limpiar_total(abonado),
+                'pendiente': limpiar_total(pendiente)
+            }
+            ticket_promedio_por_rubro[rubro] = round(valor_rubro / cantidad, 2) if cantidad else 0.0
+
+        # Series: día, lunes de la semana (el ordinal 1 es lunes) y mes
+        claves, cantidad, valores, abonos = _agrupar(dia, valor, abono)
+        por_dia = _serie([date.fromordinal(d).isoformat() for d in claves.tolist()], cantidad, valores, abonos)
+
+        claves, cantidad, valores, abonos = _agrupar(dia - (dia - 1) % 7, valor, abono)
+        por_semana = _serie([date.fromordinal(d).isoformat() for d in claves.tolist()], cantidad, valores, abonos)
+
+        meses = (dia - _ORDINAL_EPOCA).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        claves, cantidad, valores, abonos = _agrupar(meses, valor, abono)
+        por_mes = _serie([str(mes) for mes in claves.astype('datetime64[M]')], cantidad, valores, abonos)
+
+        return {
+            'total_ventas': total,
+            'total_valor': limpiar_total(float(valor.sum())),
+            'total_abonado': limpiar_total(float(abono.sum())),
+            'total_pendiente': limpiar_total(float(saldo.sum())),
+            'ventas_activas': int(np.count_nonzero(estado == 0)),
+            'ventas_cerradas': int(np.count_nonzero(estado == 1)),
+            'ticket_promedio': round(float(valor.sum()) / total, 2) if total else 0.0,
+            'por_rubro': por_rubro,
+            'ticket_promedio_por_rubro': ticket_promedio_por_rubro,
+            'por_dia': por_dia,
+            'por_semana': por_semana,
+            'por_mes': por_mes,
+            'top_clientes': self._top_clientes(cliente, valor, abono, saldo, top_clientes),
+            'ventas_detalle': columnas['venta'].tolist()
+        }
+
+    def _top_clientes(self, cliente, valor, abono, saldo, cuantos):
+        """
+        Returns:
+            list: Los clientes con más valor vendido en el período, de mayor
+                  a menor: {'cliente', 'cantidad', 'valor_total', 'abonado', 'pendiente'}
+        """
+        if not len(cliente) or cuantos <= 0:
+            return []
+        claves, cantidad, valores, abonos, saldos = _agrupar(cliente, valor, abono, saldo)
+        if len(claves) > cuantos:
+            # Solo ordeno los candidatos (argpartition es O(n))
+            candidatos = np.argpartition(-valores, cuantos - 1)[:cuantos]
+        else:
+            candidatos = np.arange(len(claves))
+        # Desempate por orden de aparición del cliente para que sea estable
+        orden = candidatos[np.lexsort((claves[candidatos], -valores[candidatos]))]
+        return [
+            {
+                'cliente': self._nombres_clientes[claves[i]],
+                'cantidad': int(cantidad[i]),
+                'valor_total': limpiar_total(float(valores[i])),
+                'abonado': limpiar_total(float(abonos[i])),
+                'pendiente': limpiar_total(float(saldos[i]))
+            }
+            for i in orden.tolist()
+        ]
+
+
+class CachePeriodos:
+    """
+    Reportes por período ya calculados, por rango de días
+
+    Se registra como índice derivado del VentaStore: cada venta que entra,
+    sale o cambia descarta solo los rangos que incluyen su día. Cada
+    reporte guarda la versión del libro con que se calculó, que sigue
+    valiendo mientras ningún cambio toque su rango (sirve de ETag)
+    """
+
+    # Campos de los que depende (ver VentaStore.actualizar)
+    campos = CAMPOS_DETALLE_PERIODO
+
+    def __init__(self, maximo_entradas=PERIODOS_EN_CACHE):
+        # (inicio, fin) -> (versión, reporte)
+        self._cache = CacheLRU(maximo_entradas)
+        # Sube con cada cambio: un reporte calculado mientras cambiaba el
+        # libro no se guarda (podría haberse perdido su invalidación)
+        self._cambios = 0
+        self.invalidaciones = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def aciertos(self):
+        return self._cache.aciertos
+
+    @property
+    def fallos(self):
+        return self._cache.fallos
+
+    def descartar_dia(self, dia):
+        """
+        Descarta los reportes cuyo rango incluye un día
+        Args:
+            dia (int): Ordinal del día que cambió (None = ninguno)
+        """
+        self._cambios += 1
+        if dia is not None and len(self._cache):
+            self.invalidaciones += self._cache.descartar(lambda rango: rango[0] <= dia <= rango[1])
+
+    def agregar(self, venta):
+        self.descartar_dia(ordinal_de_fecha(venta['fecha']))
+
+    def quitar(self, venta):
+        self.descartar_dia(ordinal_de_fecha(venta['fecha']))
+
+    def limpiar(self):
+        self._cache.limpiar()
+
+    def obtener_o_calcular(self, inicio, fin, version, calcular):
+        """
+        Args:
+            inicio (int): Ordinal del primer día
+            fin (int): Ordinal del último día
+            version (int): Versión actual del libro
+            calcular (callable): Arma el reporte si no está guardado
+        Returns:
+            tuple: (versión con que se calculó, reporte)
+        """
+        entrada = self._cache.obtener((inicio, fin))
+        if entrada is not None:
+            return entrada
+        cambios = self._cambios
+        entrada = (version, calcular())
+        if self._cambios == cambios:
+            self._cache.guardar((inicio, fin), entrada)
+        return entrada
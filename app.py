@@ -1,10 +1,102 @@
-from flask import Flask, request, redirect, url_for, render_template, jsonify
-from datetime import datetime
+from flask import Flask, request, redirect, url_for, render_template, jsonify, make_response, Response, send_from_directory, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from markupsafe import Markup
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import wraps
+from heapq import merge
+from itertools import islice
+import atexit
+import click
+import csv
 import json
+import math
+import mimetypes
 import os
+import time
+import uuid
+
+from analitica import CachePeriodos, LibroColumnar
+from archivo import PARTICIONES_EN_MEMORIA
+from busqueda import IndiceBusqueda, plegar_texto
+from cache_lru import CacheLRU
+from caja import LibroCaja, resumir_caja
+from cambios import RegistroCambios
+from cartera import CarteraClientes
+from cerrojos import CerrojoLecturaEscritura
+from cierres import PendientesCierre, reconstruir_cierres, resumir_cierre
+from eventos import DifusorEventos
+from estaticos import CACHE_INMUTABLE, cargar_manifiesto
+from estadisticas import EstadisticasIncrementales, calcular_estadisticas, comparar_estadisticas, ordinal_de_fecha
+from exportacion import CAMPOS_EXPORTACION, FORMATOS_EXPORTACION, comprimir_gzip, filas_pagos, filas_ventas, generar_csv, generar_jsonl
+from idempotencia import LARGO_CLAVE, ClavesIdempotencia, huella_datos
+from indice_orden import CAMPOS_ORDEN, IndiceOrdenado
+from importacion import FORMATOS_IMPORTACION, FilaInvalida, ValidadorVentas, abrir_texto, detectar_formato, en_lotes, leer_filas
+from metricas import Metricas
+from modelo import CAMPOS_VENTA, LibroPagos, Venta, configurar_rubros
+from persistencia import crear_almacen
+from ventas_store import VentaStore
 
 app = Flask(__name__)
 
+class ProveedorJSON(DefaultJSONProvider):
+    """
+    JSON de Flask que sabe convertir las ventas compactas (modelo.Venta)
+    """
+    @staticmethod
+    def default(o):
+        if isinstance(o, Venta):
+            return o.a_dict()
+        return DefaultJSONProvider.default(o)
+
+app.json = ProveedorJSON(app)
+
+# Los mensajes de la app van al log (nivel con VENTAS_LOG, por defecto INFO)
+app.logger.setLevel(os.environ.get('VENTAS_LOG', 'INFO').upper())
+
+# Métricas por ruta para /metrics (ver metricas.py); se instrumenta antes
+# que cualquier otro before_request para medir la request completa
+metricas = Metricas(umbral_lento=float(os.environ.get('VENTAS_LENTO_MS', 500)) / 1000, logger=app.logger)
+metricas.instrumentar(app)
+
+# Archivos estáticos reducidos, con hash y ya comprimidos (ver estaticos.py);
+# si no se construyeron se sirven los originales
+estaticos_con_hash, estaticos_viejos = cargar_manifiesto(app.static_folder)
+if estaticos_viejos:
+    app.logger.warning("Estáticos modificados sin reconstruir, se sirven los originales: %s",
+                       ', '.join(estaticos_viejos))
+estaticos_construidos = frozenset(estaticos_con_hash.values())
+
+@app.url_defaults
+def estatico_con_hash(endpoint, valores):
+    """
+    url_for('static', filename='js/script.js') da la versión con hash
+    (las plantillas no cambian)
+    """
+    if endpoint == 'static':
+        construido = estaticos_con_hash.get(valores.get('filename'))
+        if construido is not None:
+            valores['filename'] = construido
+
+def servir_estatico(filename):
+    """
+    Los archivos con hash se guardan un año en el navegador y salen ya
+    comprimidos si el navegador acepta gzip; el resto, como siempre
+    """
+    if filename not in estaticos_construidos:
+        return app.send_static_file(filename)
+    if request.accept_encodings['gzip']:
+        respuesta = send_from_directory(app.static_folder, filename + '.gz',
+                                        mimetype=mimetypes.guess_type(filename)[0])
+        respuesta.headers['Content-Encoding'] = 'gzip'
+    else:
+        respuesta = app.send_static_file(filename)
+    respuesta.headers['Cache-Control'] = CACHE_INMUTABLE
+    respuesta.headers['Vary'] = 'Accept-Encoding'
+    return respuesta
+
+app.view_functions['static'] = servir_estatico
+
 # ========================================
 # SISTEMA DE VENTAS - Carloszerpav
 # ========================================
@@ -12,18 +104,394 @@ app = Flask(__name__)
 # Lo hice para manejar mis ventas de manera fácil y rápida
 # - Carloszerpav
 
-# Lista global de ventas - aquí guardo todas mis ventas
-ventas = []
-contador_id = 1
-
 # Mis rubros de trabajo - Carloszerpav
 RUBROS = ['Maquillaje', 'Renacer', 'Tendencia', 'Accesorios', 'Zapatos']
 
-def agregar_venta(cliente, valor_total, abono, rubros, fecha=None):
+# Las ventas guardan sus rubros como máscara de bits sobre esta lista
+configurar_rubros(RUBROS)
+
+# Almacén en disco - cada cambio queda en el diario (ver persistencia.py)
+almacen = crear_almacen()
+atexit.register(almacen.cerrar)
+
+# Ventas excluidas por los cierres, en particiones por mes fuera del libro
+# (ver archivo.py); None si el almacén no archiva
+archivo = almacen.archivo
+
+def cargar_ventas():
+    """
+    Lee el libro completo del almacén con un libro de pagos nuevo (al
+    recargar, los pagos de la carga anterior no se repiten ni quedan los
+    de ventas que ya no están)
+    Returns:
+        tuple: (ventas, próximo ID, libro de pagos)
+    """
+    libro = LibroPagos()
+    ventas_cargadas, contador = almacen.cargar(lambda datos: Venta.desde_dict(datos, libro))
+    # El diario puede traer ventas que después se eliminaron: sus pagos
+    # quedaron en el libro
+    if len(libro) > sum(venta.total_pagos for venta in ventas_cargadas):
+        libro.compactar(ventas_cargadas)
+    return ventas_cargadas, contador, libro
+
+def montar_ventas(ventas_cargadas, libro):
+    """
+    Arma el almacén indexado y sus índices derivados
+    Se usa al arrancar y cuando hay que recargar el libro completo
+    Args:
+        ventas_cargadas (list): Ventas leídas del almacén
+        libro (LibroPagos): Libro con los pagos de esas ventas
+    """
+    global libro_pagos, ventas, estadisticas_incrementales, libro_columnar, indice_busqueda, orden_activas, pendientes_cierre
+    global bloques_archivados, libro_caja, cartera, cache_periodos, registro_cambios
+
+    # Todas mis ventas, indexadas por ID, estado e inclusión (ver ventas_store.py)
+    # Al recargar, la versión sigue desde la del libro anterior
+    anterior = globals().get('ventas')
+    libro_pagos = libro
+    ventas = VentaStore(ventas_cargadas, version=anterior.version + 1 if anterior is not None else 0)
+
+    # Estadísticas del dashboard, se actualizan solas con cada cambio
+    estadisticas_incrementales = ventas.registrar_indice(EstadisticasIncrementales(RUBROS))
+
+    # El libro en columnas de NumPy para los reportes y la exportación por
+    # período (ver analitica.py)
+    libro_columnar = ventas.registrar_indice(LibroColumnar(RUBROS))
+
+    # Columnas de las particiones del archivo ya leídas, por partición y
+    # revisión (usan los códigos de cliente de este libro_columnar)
+    bloques_archivados = CacheLRU(PARTICIONES_EN_MEMORIA)
+
+    # Reportes por período ya calculados; cada cambio descarta solo los
+    # rangos que incluyen el día de la venta
+    cache_periodos = ventas.registrar_indice(CachePeriodos())
+
+    # Índice de n-gramas del cliente para el buscador (solo ventas activas)
+    indice_busqueda = ventas.registrar_indice(IndiceBusqueda(estado='Activa'))
+
+    # Ventas activas ordenadas por cada columna de la tabla (paginación)
+    orden_activas = {campo: ventas.registrar_indice(IndiceOrdenado(campo, estado='Activa')) for campo in CAMPOS_ORDEN}
+
+    # Ventas cerradas que esperan el cierre mensual (las agrega el pago que las cierra)
+    pendientes_cierre = ventas.registrar_indice(PendientesCierre())
+
+    # Cobrado por día de pago (ver caja.py); lo archivado suma la caja
+    # guardada en cada partición
+    libro_caja = ventas.registrar_indice(LibroCaja(libro_pagos))
+    if archivo is not None:
+        for mes in archivo.meses():
+            libro_caja.sumar_caja(archivo.caja(mes))
+
+    # Saldo pendiente por cliente y por antigüedad (ver cartera.py); lo
+    # archivado ya está pagado y no entra
+    cartera = ventas.registrar_indice(CarteraClientes())
+
+    # Versión del último cambio de cada venta para /api/cambios (ver
+    # cambios.py); al recargar sigue desde la del registro anterior
+    anterior_cambios = globals().get('registro_cambios')
+    registro_cambios = ventas.registrar_indice(
+        RegistroCambios(anterior_cambios.version + 1 if anterior_cambios is not None else 0))
+
+    # Meses cerrados antes de que se guardaran sus resúmenes: se arman una
+    # vez con las ventas excluidas
+    reconstruidos = reconstruir_cierres(almacen.cierres, ventas.filtrar(incluida=False), RUBROS)
+    if reconstruidos:
+        app.logger.info("Resúmenes reconstruidos para %s meses cerrados", reconstruidos)
+
+# Al arrancar se reconstruye desde la instantánea + diario (o desde SQLite)
+ventas_cargadas, contador_id, libro_cargado = cargar_ventas()
+montar_ventas(ventas_cargadas, libro_cargado)
+del ventas_cargadas, libro_cargado
+
+# Entre hilos de este proceso: lecturas a la par, escrituras de a una y
+# sin lecturas en curso (ver cerrojos.py); entre procesos ordena la
+# transacción del almacén (ver escritura())
+cerrojo_ventas = CerrojoLecturaEscritura()
+
+# Límites del buscador en vivo
+LIMITE_BUSQUEDA = 50
+LIMITE_BUSQUEDA_MAXIMO = 200
+
+# Campos de cada fila que necesita la tabla de ventas
+CAMPOS_FILA = ('id', 'cliente', 'valor_total', 'abono', 'saldo_pendiente', 'total_pagos', 'rubros', 'fecha', 'estado')
+
+# Paginación de /api/ventas
+LIMITE_PAGINA = 100
+LIMITE_PAGINA_MAXIMO = 1000
+
+# Paginación de la tabla de ventas activas
+POR_PAGINA_TABLA = 50
+POR_PAGINA_TABLA_MAXIMO = 200
+
+# Importación masiva: filas por transacción y errores que se devuelven
+LOTE_IMPORTACION = 2000
+LOTE_IMPORTACION_MAXIMO = 20000
+LIMITE_ERRORES_IMPORTACION = 1000
+
+# Cambios por página de /api/cambios, y campos de cada venta cambiada
+LIMITE_CAMBIOS = 500
+LIMITE_CAMBIOS_MAXIMO = 5000
+CAMPOS_CAMBIO = CAMPOS_FILA + ('historial_pagos',)
+
+# Mayores deudores de /api/cartera/deudores
+LIMITE_DEUDORES = 20
+LIMITE_DEUDORES_MAXIMO = 500
+
+# Ventas o pagos por envío en POST /api/ventas y /api/ventas/<id>/pagos
+# (todo el envío va en una sola escritura; para más está /api/ventas/bulk)
+LOTE_API_MAXIMO = 500
+
+# Claves de idempotencia de la API ya usadas (ver idempotencia.py)
+claves_idempotencia = ClavesIdempotencia()
+
+# Fragmentos HTML ya renderizados, por versión del libro (ver fragmento());
+# acotado en entradas y en caracteres (la tabla completa pesa varios MB)
+cache_fragmentos = CacheLRU(64, maximo_tamano=64 * 1024 * 1024)
+
+# Avisos de cambios para los clientes de /api/eventos (ver eventos.py)
+difusor = DifusorEventos()
+
+# /api/eventos: cada cuánto se revisa el almacén compartido si no hay
+# avisos, cada cuánto va un latido, cuánto dura una conexión (el navegador
+# se reconecta solo) y en cuánto reintenta
+ESPERA_EVENTOS = 2
+LATIDO_EVENTOS = 15
+DURACION_EVENTOS = 300
+REINTENTO_EVENTOS_MS = 3000
+
+# Identifica a este proceso en los ETag: la versión es de cada proceso y
+# empieza de nuevo al reiniciar, así un ETag nunca se confunde con otro
+INSTANCIA = uuid.uuid4().hex[:8]
+
+def persistir(operacion):
+    """
+    Guarda una operación en el almacén y compacta si hace falta
+    Args:
+        operacion (dict): Operación a registrar en el diario
+    """
+    almacen.registrar(operacion)
+    if almacen.debe_compactar(len(ventas)):
+        almacen.compactar((venta.a_dict() for venta in ventas), contador_id)
+
+def recordar_clave(operacion, confirmada=True):
+    """
+    Recuerda la clave de idempotencia que trae una operación (si trae),
+    sea de este proceso o de otro worker
+    Args:
+        operacion (dict): Operación 'agregar' o 'pago' ya aplicada
+        confirmada (bool): False si la operación es de la escritura en
+            curso y todavía puede deshacerse (ver escritura())
+    """
+    clave = operacion.get('clave')
+    if clave is None:
+        return
+    # Las operaciones guardadas antes de 'creada' cuentan desde ahora
+    if operacion['op'] == 'agregar':
+        clave = ('venta', clave)
+        claves_idempotencia.recordar(clave, operacion['huella'], operacion['venta']['id'], operacion.get('creada'))
+    elif operacion['op'] == 'pago':
+        clave = ('pago', operacion['venta_id'], clave)
+        claves_idempotencia.recordar(clave, operacion['huella'], operacion['pago']['id'], operacion.get('creada'))
+    else:
+        return
+    if not confirmada and claves_sin_confirmar is not None:
+        claves_sin_confirmar.append(clave)
+
+def aplicar_cambio(operacion):
+    """
+    Aplica en memoria una operación que registró otro proceso
+    Igual que persistencia.aplicar_operacion pero pasando por el VentaStore,
+    así los índices derivados quedan al día
+    Args:
+        operacion (dict): Operación leída del almacén compartido
+    """
+    global contador_id
+    tipo = operacion['op']
+
+    if tipo == 'agregar':
+        venta = Venta.desde_dict(operacion['venta'], libro_pagos)
+        ventas.agregar(venta)
+        contador_id = max(contador_id, venta['id'] + 1)
+        recordar_clave(operacion)
+        difusor.publicar('venta', venta['id'])
+
+    elif tipo == 'pago':
+        venta = ventas.obtener(operacion['venta_id'])
+        if venta is not None:
+            posicion = venta.agregar_pago(operacion['pago'])
+            ventas.actualizar(venta,
+                              abono=operacion['abono'],
+                              saldo_pendiente=operacion['saldo_pendiente'],
+                              estado=operacion['estado'])
+            libro_caja.agregar_pago(posicion)
+            recordar_clave(operacion)
+            difusor.publicar('venta', venta['id'])
+
+    elif tipo == 'eliminar':
+        ventas.eliminar(operacion['id'])
+        difusor.publicar('venta', operacion['id'])
+
+    elif tipo == 'cierre':
+        for id in operacion['ids']:
+            venta = ventas.obtener(id)
+            if venta is not None:
+                ventas.actualizar(venta, incluida_en_estadisticas=False, mes_cierre=operacion['mes_cierre'])
+        difusor.publicar('estadisticas')
+
+def recargar_ventas():
+    """
+    Vuelve a leer el libro completo del almacén (cuando este proceso se
+    quedó demasiado atrás o una transacción falló a medias)
+    """
+    global contador_id
+    ventas_cargadas, contador_id, libro = cargar_ventas()
+    montar_ventas(ventas_cargadas, libro)
+    recordar_claves_cargadas()
+    difusor.publicar('tabla')
+
+def recordar_claves_cargadas():
+    """
+    Recuerda las claves de idempotencia de las operaciones que trajo la
+    última carga del almacén (un reintento después de reiniciar, o que
+    llega a un worker nuevo, tampoco registra dos veces)
+    """
+    for operacion in almacen.operaciones_con_clave:
+        recordar_clave(operacion)
+    # Ya quedaron en claves_idempotencia: no las guardo dos veces
+    almacen.operaciones_con_clave = []
+
+# Las claves que quedaron en el almacén al arrancar
+recordar_claves_cargadas()
+
+def sincronizar_ventas():
+    """
+    Trae a memoria lo que escribieron otros workers en el almacén compartido
+    (no hace nada con el diario o en memoria: ahí hay un solo proceso)
+    Solo toma el cerrojo de escritura si hay algo nuevo: sin cambios de
+    otros workers las lecturas de este siguen a la par
+    """
+    if not almacen.compartido or not almacen.hay_cambios():
+        return
+    with cerrojo_ventas.escribiendo():
+        cambios = almacen.leer_cambios()
+        if cambios is None:
+            recargar_ventas()
+            return
+        for operacion in cambios:
+            aplicar_cambio(operacion)
+
+# Claves de idempotencia que recordó la escritura en curso (None fuera
+# de una escritura): valen recién cuando la transacción se confirma
+claves_sin_confirmar = None
+
+@contextmanager
+def escritura():
+    """
+    Sección de escritura: un hilo y un proceso a la vez, con la memoria al
+    día antes de validar, y todo lo registrado en una sola transacción
+    Si la transacción se deshace, también se olvidan sus claves de
+    idempotencia: un reintento tiene que registrar de nuevo
+    """
+    global claves_sin_confirmar
+    with cerrojo_ventas.escribiendo():
+        externa = claves_sin_confirmar is None
+        if externa:
+            claves_sin_confirmar = []
+        try:
+            with almacen.transaccion():
+                sincronizar_ventas()
+                yield
+        except BaseException:
+            if externa and almacen.transaccional:
+                claves_idempotencia.olvidar(claves_sin_confirmar)
+            raise
+        finally:
+            if externa:
+                claves_sin_confirmar = None
+
+def solo_lectura(vista):
+    """
+    Para las rutas que solo leen el libro: corren a la par entre hilos,
+    pero nunca en medio de una escritura
+    (lo que se genera en streaming después de responder queda afuera: va
+    con leyendo_por_bloques)
+    """
+    @wraps(vista)
+    def leer(*args, **kwargs):
+        with cerrojo_ventas.leyendo():
+            return vista(*args, **kwargs)
+    return leer
+
+# Ventas que se arman de una vez con el cerrojo de lectura tomado en las
+# respuestas en streaming
+VENTAS_POR_BLOQUE = 500
+
+def leyendo_por_bloques(generador, por_bloque):
+    """
+    Recorre lo que se manda en streaming tomando el cerrojo de lectura por
+    bloques: cada bloque se arma sin escrituras en medio y entre bloque y
+    bloque (mientras se manda) las escrituras pueden pasar
+    Una descarga lenta no frena las escrituras y nunca lee una venta a
+    medio actualizar (los recorridos del libro toleran cambios entre
+    bloques, ver VentaStore.recorrer)
+    Args:
+        generador (iterable): Lo que se genera desde el libro
+        por_bloque (int): Elementos por bloque
+    Yields:
+        Lo mismo que el generador
+    """
+    generador = iter(generador)
+    while True:
+        with cerrojo_ventas.leyendo():
+            bloque = list(islice(generador, por_bloque))
+        if not bloque:
+            return
+        yield from bloque
+
+def leer_venta_nueva(cliente, valor_total, abono, rubros, fecha=None):
+    """
+    Valida lo que llega del formulario o de la API para una venta nueva
+    Returns:
+        tuple: (cliente, valor_total, abono, rubros, fecha) ya limpios
+    Raises:
+        ValueError: Con el motivo para mostrar
+    """
+    cliente = str(cliente or '').strip()
+    if not cliente:
+        raise ValueError("El nombre del cliente es requerido")
+    
+    # Validación obligatoria de rubros
+    if not rubros:
+        raise ValueError("Debe seleccionar al menos un rubro")
+    if not isinstance(rubros, (list, tuple)):
+        raise ValueError("Los rubros deben ser una lista")
+    
+    try:
+        valor_total = float(valor_total) if valor_total else 0.0
+        abono = float(abono) if abono else 0.0
+    except (TypeError, ValueError):
+        raise ValueError("El valor y el abono deben ser números")
+    if not (math.isfinite(valor_total) and math.isfinite(abono)):
+        raise ValueError("El valor y el abono deben ser números")
+    
+    if valor_total < 0 or abono < 0:
+        raise ValueError("El valor y el abono no pueden ser negativos")
+    
+    fecha = str(fecha or '').strip() or datetime.now().strftime("%Y-%m-%d")
+    try:
+        date.fromisoformat(fecha)
+    except ValueError:
+        raise ValueError("La fecha debe tener el formato YYYY-MM-DD")
+    
+    return cliente, valor_total, abono, rubros, fecha
+
+def agregar_venta(cliente, valor_total, abono, rubros, fecha=None, idempotencia=None):
     """
     Función para agregar una nueva venta - Carloszerpav
     Esta función es la que uso para registrar cada venta que hago
     Me valida que todo esté bien antes de guardar
+    idempotencia ({'clave', 'huella', 'creada'}) viaja en la operación del
+    diario para que un reintento con la misma clave no la registre de nuevo
     """
     global contador_id
     
@@ -62,44 +530,132 @@ def agregar_venta(cliente, valor_total, abono, rubros, fecha=None):
                 'tipo': 'Pago inicial'
             })
         
-        # Crear la nueva venta con todos los datos - Carloszerpav
-        nueva_venta = {
-            'id': contador_id,
-            'cliente': cliente,
-            'valor_total': valor_total,
-            'abono': abono,
-            'saldo_pendiente': saldo_pendiente,
-            'rubros': rubros_validos,  # Solo uso los rubros válidos
-            'fecha': fecha,
-            'fecha_registro': datetime.now().strftime("%Y-%m-%d %H:%M"),
-            'estado': 'Activa' if saldo_pendiente > 0 else 'Cerrada',
-            'historial_pagos': historial_pagos,
-            'total_pagos': len(historial_pagos),
-            'incluida_en_estadisticas': True,  # Nueva venta siempre incluida
-            'mes_cierre': None  # Se establecerá cuando se cierre mensualmente
-        }
+        # El ID se toma dentro de la escritura para que no choque con otro
+        # hilo o worker
+        with escritura():
+            # Crear la nueva venta con todos los datos - Carloszerpav
+            # (se guarda en su forma compacta, ver modelo.py)
+            nueva_venta = Venta.desde_dict({
+                'id': contador_id,
+                'cliente': cliente,
+                'valor_total': valor_total,
+                'abono': abono,
+                'saldo_pendiente': saldo_pendiente,
+                'rubros': rubros_validos,  # Solo uso los rubros válidos
+                'fecha': fecha,
+                'fecha_registro': datetime.now().strftime("%Y-%m-%d %H:%M"),
+                'estado': 'Activa' if saldo_pendiente > 0 else 'Cerrada',
+                'historial_pagos': historial_pagos,
+                'total_pagos': len(historial_pagos),
+                'incluida_en_estadisticas': True,  # Nueva venta siempre incluida
+                'mes_cierre': None  # Se establecerá cuando se cierre mensualmente
+            }, libro_pagos)
         
-        ventas.append(nueva_venta)
-        contador_id += 1
+            ventas.agregar(nueva_venta)
+            contador_id += 1
+            operacion = {'op': 'agregar', 'venta': nueva_venta.a_dict()}
+            if idempotencia:
+                operacion.update(idempotencia)
+            persistir(operacion)
+            recordar_clave(operacion, confirmada=False)
         
+        difusor.publicar('venta', nueva_venta['id'])
         return nueva_venta
         
     except Exception as e:
-        print(f"❌ Error en agregar_venta: {e}")
+        app.logger.debug("Error en agregar_venta: %s", e)
         raise e
 
+def importar_ventas(filas, lote=LOTE_IMPORTACION, solo_validar=False, al_fallar=None):
+    """
+    Importa muchas ventas de una vez (planillas históricas)
+    Valida por lotes y guarda cada lote en una sola escritura, con un
+    bloque de IDs consecutivos; las filas con error se saltan y se reportan
+    Args:
+        filas (iterable): (número de fila, datos) como los da importacion.leer_filas
+        lote (int): Filas por transacción
+        solo_validar (bool): Revisar el archivo sin guardar nada
+        al_fallar (callable): Recibe cada error {'fila', 'error'} (para reportes completos)
+    Returns:
+        dict: Resumen con importadas, errores (los primeros LIMITE_ERRORES_IMPORTACION),
+        total_errores, primer_id y ultimo_id
+    """
+    global contador_id
+    
+    validador = ValidadorVentas(RUBROS)
+    resumen = {
+        'importadas': 0,
+        'validas': 0,
+        'total_errores': 0,
+        'errores': [],
+        'primer_id': None,
+        'ultimo_id': None,
+        'solo_validar': solo_validar
+    }
+    
+    def reportar(numero, mensaje):
+        error = {'fila': numero, 'error': mensaje}
+        resumen['total_errores'] += 1
+        if len(resumen['errores']) < LIMITE_ERRORES_IMPORTACION:
+            resumen['errores'].append(error)
+        if al_fallar is not None:
+            al_fallar(error)
+    
+    try:
+        for grupo in en_lotes(filas, lote):
+            validas = []
+            for numero, datos in grupo:
+                try:
+                    validas.append(validador.validar(datos))
+                except FilaInvalida as e:
+                    reportar(numero, str(e))
+            
+            resumen['validas'] += len(validas)
+            if solo_validar or not validas:
+                continue
+            
+            with escritura():
+                # Reservo el bloque de IDs del lote completo
+                primer_id = contador_id
+                contador_id += len(validas)
+                for desplazamiento, datos in enumerate(validas):
+                    datos['id'] = primer_id + desplazamiento
+                    ventas.agregar(Venta.desde_dict(datos, libro_pagos))
+                    # La fila ya viene normalizada: la guardo tal cual
+                    persistir({'op': 'agregar', 'venta': datos})
+            
+            resumen['importadas'] += len(validas)
+            difusor.publicar('tabla')
+            if resumen['primer_id'] is None:
+                resumen['primer_id'] = primer_id
+            resumen['ultimo_id'] = primer_id + len(validas) - 1
+    
+    except (ValueError, csv.Error) as e:
+        # El archivo está roto: lo importado hasta aquí queda guardado
+        resumen['error'] = f"No se pudo leer el archivo: {e}"
+    
+    return resumen
+
 def eliminar_venta(id):
     """
-    Elimina una venta de la lista
+    Elimina una venta del almacén
     Args:
         id (int): El ID de la venta a eliminar
     Returns:
         bool: True si se encontró y eliminó la venta, False si no existe
     """
-    global ventas
-    ventas_original = len(ventas)
-    ventas = [venta for venta in ventas if venta['id'] != id]
-    return len(ventas) < ventas_original
+    with escritura():
+        if ventas.eliminar(id) is None:
+            archivada = archivo.eliminar(id) if archivo is not None else None
+            if archivada is None:
+                return False
+            libro_caja.sumar_caja(resumir_caja([archivada]), -1)
+            cache_periodos.descartar_dia(ordinal_de_fecha(archivada['fecha']))
+            # Lo archivado también cuenta para los cachés por versión del libro
+            ventas.version += 1
+        persistir({'op': 'eliminar', 'id': id})
+    difusor.publicar('venta', id)
+    return True
 
 def obtener_venta(id):
     """
@@ -109,55 +665,78 @@ def obtener_venta(id):
     Returns:
         dict: La venta encontrada o None si no existe
     """
-    for venta in ventas:
-        if venta['id'] == id:
-            return venta
-    return None
+    venta = ventas.obtener(id)
+    if venta is None and archivo is not None:
+        # Las archivadas se devuelven como dict de solo lectura
+        venta = archivo.obtener(id)
+    return venta
 
-def registrar_pago(venta_id, monto_pago, tipo_pago="Abono"):
+def registrar_pago(venta_id, monto_pago, tipo_pago="Abono", idempotencia=None):
     """
     Registra un pago adicional para una venta
     Args:
         venta_id (int): ID de la venta
         monto_pago (float): Monto del pago
         tipo_pago (str): Tipo de pago (Abono, Cuota, etc.)
+        idempotencia (dict): {'clave', 'huella', 'creada'} de la API (ver agregar_venta)
     Returns:
         dict: La venta actualizada o None si no se encuentra
     """
-    venta = obtener_venta(venta_id)
-    if not venta:
-        return None
+    # Validar y aplicar en la misma escritura: nadie puede pagar la misma
+    # venta entre que leo el saldo y lo actualizo
+    with escritura():
+        venta = obtener_venta(venta_id)
+        if not venta:
+            return None
     
-    if venta['estado'] == 'Cerrada':
-        raise ValueError("No se pueden registrar pagos en ventas cerradas")
+        if venta['estado'] == 'Cerrada':
+            raise ValueError("No se pueden registrar pagos en ventas cerradas")
     
-    if monto_pago <= 0:
-        raise ValueError("El monto del pago debe ser mayor a 0")
+        if not math.isfinite(monto_pago) or monto_pago <= 0:
+            raise ValueError("El monto del pago debe ser mayor a 0")
     
-    if monto_pago > venta['saldo_pendiente']:
-        raise ValueError("El monto del pago no puede ser mayor al saldo pendiente")
+        if monto_pago > venta['saldo_pendiente']:
+            raise ValueError("El monto del pago no puede ser mayor al saldo pendiente")
     
-    # Agregar pago al historial
-    nuevo_pago = {
-        'id': len(venta['historial_pagos']) + 1,
-        'monto': monto_pago,
-        'fecha': datetime.now().strftime("%Y-%m-%d %H:%M"),
-        'tipo': tipo_pago
-    }
+        # Agregar pago al historial
+        nuevo_pago = {
+            'id': venta['total_pagos'] + 1,
+            'monto': monto_pago,
+            'fecha': datetime.now().strftime("%Y-%m-%d %H:%M"),
+            'tipo': tipo_pago
+        }
     
-    venta['historial_pagos'].append(nuevo_pago)
+        posicion = venta.agregar_pago(nuevo_pago)
     
-    # Actualizar totales
-    venta['abono'] += monto_pago
-    venta['saldo_pendiente'] -= monto_pago
-    venta['total_pagos'] = len(venta['historial_pagos'])
+        # Actualizar totales
+        cambios = {
+            'abono': venta['abono'] + monto_pago,
+            'saldo_pendiente': venta['saldo_pendiente'] - monto_pago
+        }
+    
+        # Verificar si la venta se completa
+        if cambios['saldo_pendiente'] <= 0:
+            cambios['estado'] = 'Cerrada'
+            cambios['saldo_pendiente'] = 0
+            # NO cambiar incluida_en_estadisticas aquí - se hará en el cierre mensual
     
-    # Verificar si la venta se completa
-    if venta['saldo_pendiente'] <= 0:
-        venta['estado'] = 'Cerrada'
-        venta['saldo_pendiente'] = 0
-        # NO cambiar incluida_en_estadisticas aquí - se hará en el cierre mensual
+        ventas.actualizar(venta, **cambios)
+        libro_caja.agregar_pago(posicion)
+    
+        operacion = {
+            'op': 'pago',
+            'venta_id': venta_id,
+            'pago': nuevo_pago,
+            'abono': venta['abono'],
+            'saldo_pendiente': venta['saldo_pendiente'],
+            'estado': venta['estado']
+        }
+        if idempotencia:
+            operacion.update(idempotencia)
+        persistir(operacion)
+        recordar_clave(operacion, confirmada=False)
     
+    difusor.publicar('venta', venta_id)
     return venta
 
 def obtener_estadisticas():
@@ -166,37 +745,74 @@ def obtener_estadisticas():
     Esta función me da todos los números importantes de mis ventas
     Me ayuda a ver cómo va mi negocio
     """
-    # Ventas incluidas en estadísticas (activas + cerradas que aún no se han cerrado mensualmente)
-    ventas_en_estadisticas = [venta for venta in ventas if venta.get('incluida_en_estadisticas', True)]
-    ventas_activas = [venta for venta in ventas_en_estadisticas if venta['estado'] == 'Activa']
-    ventas_cerradas = [venta for venta in ventas_en_estadisticas if venta['estado'] == 'Cerrada']
-    ventas_excluidas = [venta for venta in ventas if not venta.get('incluida_en_estadisticas', True)]
-    
-    total_ventas_activas = len(ventas_activas)
-    total_valor_activas = sum(venta['valor_total'] for venta in ventas_activas)
-    total_abonado_activas = sum(venta['abono'] for venta in ventas_activas)
-    total_pendiente_activas = sum(venta['saldo_pendiente'] for venta in ventas_activas)
-    
-    # Estadísticas por rubro (ventas incluidas en estadísticas)
-    estadisticas_rubros = {}
-    for rubro in RUBROS:
-        ventas_rubro = [venta for venta in ventas_en_estadisticas if rubro in venta['rubros']]
-        estadisticas_rubros[rubro] = {
-            'cantidad': len(ventas_rubro),
-            'valor_total': sum(venta['valor_total'] for venta in ventas_rubro),
-            'abonado': sum(venta['abono'] for venta in ventas_rubro),
-            'pendiente': sum(venta['saldo_pendiente'] for venta in ventas_rubro)
-        }
-    
+    # Los totales se mantienen al día en cada agregar/pago/eliminar/cierre,
+    # así que esto ya no depende de cuántas ventas tenga
+    estadisticas = estadisticas_incrementales.obtener()
+    if archivo is not None:
+        # Las archivadas están excluidas: solo suman a los conteos totales
+        archivadas = len(archivo)
+        estadisticas['total_ventas'] += archivadas
+        estadisticas['total_ventas_excluidas'] += archivadas
+    return estadisticas
+
+def verificar_estadisticas(reparar=False):
+    """
+    Recalcula las estadísticas desde cero y las compara con las incrementales
+    Args:
+        reparar (bool): Si hay diferencias, reconstruye los contadores
+    Returns:
+        list: Diferencias encontradas (vacía si todo cuadra)
+    """
+    # Solo el libro: las archivadas no están en los contadores incrementales
+    with cerrojo_ventas.leyendo():
+        diferencias = comparar_estadisticas(calcular_estadisticas(ventas, RUBROS), estadisticas_incrementales.obtener())
+    if diferencias and reparar:
+        with escritura():
+            estadisticas_incrementales.reiniciar()
+            for venta in ventas:
+                estadisticas_incrementales.agregar(venta)
+    return diferencias
+
+def buscar_ventas_activas(query, limite=None):
+    """
+    Busca ventas activas por nombre de cliente (sin importar acentos)
+    Args:
+        query (str): Texto a buscar; vacío devuelve todas las activas
+        limite (int): Máximo de ventas a devolver (None = todas)
+    Returns:
+        tuple: (lista de ventas, total de coincidencias)
+    """
+    if not query:
+        activas = ventas.filtrar(estado='Activa')
+        return (activas[:limite] if limite is not None else activas), len(activas)
+    return indice_busqueda.buscar(query, limite)
+
+def pagina_ventas_activas(orden='id', direccion='asc', pagina=1, por_pagina=POR_PAGINA_TABLA):
+    """
+    Una página de la tabla de ventas activas, ordenada por una columna
+    Usa los índices ordenados: cuesta O(log n + por_pagina)
+    Args:
+        orden (str): Campo de CAMPOS_ORDEN
+        direccion (str): 'asc' o 'desc'
+        pagina (int): Número de página (desde 1); si se pasa del final
+            se devuelve la última
+        por_pagina (int): Ventas por página
+    Returns:
+        dict: ventas de la página y los datos para armar la navegación
+    """
+    indice = orden_activas[orden]
+    total = len(indice)
+    paginas = max(1, -(-total // por_pagina))
+    pagina = min(max(1, pagina), paginas)
+    ids = indice.pagina((pagina - 1) * por_pagina, por_pagina, descendente=direccion == 'desc')
     return {
-        'total_ventas_activas': total_ventas_activas,
-        'total_ventas_cerradas': len(ventas_cerradas),
-        'total_ventas_excluidas': len(ventas_excluidas),
-        'total_ventas': len(ventas),
-        'total_valor': total_valor_activas,
-        'total_abonado': total_abonado_activas,
-        'total_pendiente': total_pendiente_activas,
-        'por_rubro': estadisticas_rubros
+        'ventas': [ventas.obtener(id) for id in ids],
+        'orden': orden,
+        'dir': direccion,
+        'pagina': pagina,
+        'paginas': paginas,
+        'por_pagina': por_pagina,
+        'total': total
     }
 
 def formatear_fecha(fecha_str):
@@ -234,16 +850,26 @@ def cerrar_mes_estadisticas(mes=None, año=None):
     if año is None:
         año = datetime.now().year
     
-    # Obtener ventas cerradas que aún están en estadísticas
-    ventas_a_excluir = [
-        venta for venta in ventas 
-        if venta['estado'] == 'Cerrada' and venta.get('incluida_en_estadisticas', True)
-    ]
+    with escritura():
+        # Solo las ventas que el pago ya dejó en el conjunto de pendientes
+        ventas_a_excluir = obtener_ventas_cerradas_pendientes()
+        mes_cierre = f"{año}-{mes:02d}"
+    
+        if ventas_a_excluir:
+            # Resumen congelado del mes, antes de que las ventas salgan de las estadísticas
+            resumen_mes = resumir_cierre(ventas_a_excluir, RUBROS, mes_cierre,
+                                         datetime.now().strftime("%Y-%m-%d %H:%M"))
     
-    # Marcar ventas como excluidas de estadísticas
-    for venta in ventas_a_excluir:
-        venta['incluida_en_estadisticas'] = False
-        venta['mes_cierre'] = f"{año}-{mes:02d}"
+            # Marcar ventas como excluidas de estadísticas
+            for venta in ventas_a_excluir:
+                ventas.actualizar(venta, incluida_en_estadisticas=False, mes_cierre=mes_cierre)
+    
+            persistir({
+                'op': 'cierre',
+                'ids': [venta['id'] for venta in ventas_a_excluir],
+                'mes_cierre': mes_cierre,
+                'resumen': resumen_mes
+            })
     
     # Calcular resumen del cierre
     total_excluidas = len(ventas_a_excluir)
@@ -259,7 +885,11 @@ def cerrar_mes_estadisticas(mes=None, año=None):
         'fecha_cierre': datetime.now().strftime("%Y-%m-%d %H:%M")
     }
     
-    print(f"✅ Cierre mensual {mes}/{año}: {total_excluidas} ventas excluidas")
+    app.logger.info("Cierre mensual %s/%s: %s ventas excluidas", mes, año, total_excluidas)
+    difusor.publicar('estadisticas')
+    
+    # Las excluidas dejan el libro y pasan al archivo del mes
+    archivar_excluidas()
     return resumen
 
 def obtener_ventas_cerradas_pendientes():
@@ -268,10 +898,87 @@ def obtener_ventas_cerradas_pendientes():
     Returns:
         list: Lista de ventas cerradas pendientes de cierre mensual
     """
-    return [
-        venta for venta in ventas 
-        if venta['estado'] == 'Cerrada' and venta.get('incluida_en_estadisticas', True)
-    ]
+    return pendientes_cierre.ventas()
+
+def obtener_ventas_excluidas(mes=None):
+    """
+    Ventas excluidas de estadísticas: las que siguen en el libro y las archivadas
+    Args:
+        mes (str): Solo las de este mes de cierre ('YYYY-MM'); None = todas
+    Returns:
+        list: Ventas ordenadas por ID
+    """
+    en_libro = ventas.filtrar(incluida=False)
+    if mes is not None:
+        en_libro = [venta for venta in en_libro if venta['mes_cierre'] == mes]
+    if archivo is None:
+        return en_libro
+    archivadas = archivo.recorrer(meses=[mes] if mes is not None else None)
+    return list(merge(en_libro, archivadas, key=lambda venta: venta['id']))
+
+def archivar_excluidas():
+    """
+    Pasa las ventas excluidas del libro a la partición de su mes de cierre
+    (si el almacén tiene archivo); el libro se queda con lo abierto
+    Returns:
+        int: Cuántas ventas se archivaron
+    """
+    if archivo is None:
+        return 0
+    archivadas = 0
+    with escritura():
+        por_mes = {}
+        for venta in ventas.filtrar(incluida=False):
+            if venta['mes_cierre']:
+                por_mes.setdefault(venta['mes_cierre'], []).append(venta)
+        for mes_cierre, ventas_mes in sorted(por_mes.items()):
+            # Primero la partición en disco, después el diario: si se corta
+            # en el medio, al arrancar se vuelven a archivar sin duplicarse
+            nuevas = archivo.archivar(mes_cierre, [venta.a_dict() for venta in ventas_mes])
+            for venta in ventas_mes:
+                ventas.eliminar(venta['id'])
+            # Lo cobrado en estas ventas sigue en la caja, ahora desde el archivo
+            # (las que ya estaban archivadas ya se sumaron al arrancar)
+            libro_caja.sumar_caja(resumir_caja(nuevas))
+            persistir({'op': 'archivar', 'mes_cierre': mes_cierre, 'ids': [venta['id'] for venta in ventas_mes]})
+            archivadas += len(ventas_mes)
+        # Los pagos de lo archivado ya están en su partición: salen del libro
+        # de pagos (con las ventas eliminadas desde la última carga)
+        if archivadas:
+            libro_pagos.compactar(ventas)
+    return archivadas
+
+def obtener_cierre_mensual(mes, año):
+    """
+    Resumen congelado de un mes ya cerrado (ver cierres.py)
+    Args:
+        mes (int): Mes (1-12)
+        año (int): Año
+    Returns:
+        dict: Ventas, valor, abonado y desglose por rubro, o None si el mes
+              no tiene cierres
+    """
+    return almacen.cierres.get(f"{año}-{mes:02d}")
+
+def obtener_cierres_mensuales():
+    """
+    Returns:
+        list: Los resúmenes de todos los meses cerrados, del más reciente al más viejo
+    """
+    return [almacen.cierres[mes_cierre] for mes_cierre in sorted(almacen.cierres, reverse=True)]
+
+def consultar_periodo(inicio, fin):
+    """
+    Reporte de un rango de días, del caché si ningún cambio tocó el rango
+    Args:
+        inicio (int): Ordinal del primer día
+        fin (int): Ordinal del último día
+    Returns:
+        tuple: (versión del libro con que se calculó, reporte)
+    """
+    return cache_periodos.obtener_o_calcular(
+        inicio, fin, ventas.version,
+        lambda: libro_columnar.consultar(inicio, fin, bloques=bloques_archivo_periodo(inicio, fin)))
 
 def obtener_estadisticas_por_periodo(fecha_inicio, fecha_fin):
     """
@@ -283,137 +990,321 @@ def obtener_estadisticas_por_periodo(fecha_inicio, fecha_fin):
         dict: Estadísticas del período
     """
     try:
-        # Convertir fechas a objetos datetime para comparación
-        inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d")
-        fin = datetime.strptime(fecha_fin, "%Y-%m-%d")
-        
-        # Filtrar ventas en el período
-        ventas_periodo = []
-        for venta in ventas:
-            fecha_venta = datetime.strptime(venta['fecha'], "%Y-%m-%d")
-            if inicio <= fecha_venta <= fin:
-                ventas_periodo.append(venta)
-        
-        # Calcular estadísticas
-        total_ventas = len(ventas_periodo)
-        total_valor = sum(venta['valor_total'] for venta in ventas_periodo)
-        total_abonado = sum(venta['abono'] for venta in ventas_periodo)
-        total_pendiente = sum(venta['saldo_pendiente'] for venta in ventas_periodo)
+        # Convertir fechas a número de día para filtrar las columnas
+        inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d").toordinal()
+        fin = datetime.strptime(fecha_fin, "%Y-%m-%d").toordinal()
         
-        # Ventas por estado
-        ventas_activas = [v for v in ventas_periodo if v['estado'] == 'Activa']
-        ventas_cerradas = [v for v in ventas_periodo if v['estado'] == 'Cerrada']
-        
-        # Estadísticas por rubro
-        estadisticas_rubros = {}
-        for rubro in RUBROS:
-            ventas_rubro = [v for v in ventas_periodo if rubro in v['rubros']]
-            estadisticas_rubros[rubro] = {
-                'cantidad': len(ventas_rubro),
-                'valor_total': sum(v['valor_total'] for v in ventas_rubro),
-                'abonado': sum(v['abono'] for v in ventas_rubro),
-                'pendiente': sum(v['saldo_pendiente'] for v in ventas_rubro)
-            }
-        
-        # Ventas por día (para gráfica)
-        ventas_por_dia = {}
-        for venta in ventas_periodo:
-            dia = venta['fecha']
-            if dia not in ventas_por_dia:
-                ventas_por_dia[dia] = {
-                    'cantidad': 0,
-                    'valor_total': 0,
-                    'abonado': 0
-                }
-            ventas_por_dia[dia]['cantidad'] += 1
-            ventas_por_dia[dia]['valor_total'] += venta['valor_total']
-            ventas_por_dia[dia]['abonado'] += venta['abono']
-        
-        # Ordenar por fecha
-        ventas_por_dia_ordenado = dict(sorted(ventas_por_dia.items()))
+        # Máscaras y sumas agrupadas sobre las columnas del libro: totales,
+        # rubros, series por día / semana / mes y mejores clientes
+        _, periodo = consultar_periodo(inicio, fin)
         
         return {
             'fecha_inicio': fecha_inicio,
             'fecha_fin': fecha_fin,
-            'total_ventas': total_ventas,
-            'total_valor': total_valor,
-            'total_abonado': total_abonado,
-            'total_pendiente': total_pendiente,
-            'ventas_activas': len(ventas_activas),
-            'ventas_cerradas': len(ventas_cerradas),
-            'por_rubro': estadisticas_rubros,
-            'por_dia': ventas_por_dia_ordenado,
-            'ventas_detalle': ventas_periodo
+            **periodo
         }
         
     except Exception as e:
-        print(f"❌ Error en estadísticas por período: {e}")
+        app.logger.warning("Error en estadísticas por período %s a %s: %s", fecha_inicio, fecha_fin, e)
         return None
 
+def leer_periodo_caja(args):
+    """
+    Lee desde / hasta (YYYY-MM-DD) de las rutas de caja; sin desde empieza
+    en el primer pago y sin hasta llega hasta hoy (o al último pago)
+    Returns:
+        tuple: (ordinal del primer día, ordinal del último día)
+    Raises:
+        ValueError: Si alguna fecha no es válida
+    """
+    hoy = date.today().toordinal()
+    limites = {'desde': libro_caja.primer_dia() or hoy, 'hasta': max(libro_caja.ultimo_dia() or hoy, hoy)}
+    for clave in limites:
+        fecha = args.get(clave, '').strip()
+        if fecha:
+            ordinal = ordinal_de_fecha(fecha)
+            if ordinal is None:
+                raise ValueError(f"{clave} debe tener formato YYYY-MM-DD")
+            limites[clave] = ordinal
+    return limites['desde'], limites['hasta']
+
+def obtener_caja(inicio, fin, por_dia=False):
+    """
+    Plata cobrada en un período según la fecha de cada PAGO (no la de la
+    venta), incluidos los pagos de ventas archivadas
+    Args:
+        inicio (int): Ordinal del primer día
+        fin (int): Ordinal del último día
+        por_dia (bool): Agregar la serie 'dias' con lo cobrado cada día
+    Returns:
+        dict: {'desde', 'hasta', 'cobrado', 'pagos'} (+ 'dias')
+    """
+    caja = {
+        'desde': date.fromordinal(inicio).isoformat(),
+        'hasta': date.fromordinal(fin).isoformat(),
+        **libro_caja.cobrado(inicio, fin)
+    }
+    if por_dia:
+        caja['dias'] = libro_caja.serie(inicio, fin)
+    return caja
+
+def obtener_cartera():
+    """
+    Cuentas por cobrar de todas las ventas activas, con la antigüedad
+    contada desde hoy
+    Returns:
+        dict: {'fecha', 'total_pendiente', 'ventas_abiertas', 'clientes', 'antiguedad'}
+    """
+    hoy = date.today()
+    return {'fecha': hoy.isoformat(), **cartera.resumen(hoy.toordinal())}
+
+def bloques_archivo_periodo(inicio, fin):
+    """
+    Columnas de las particiones del archivo que pueden tener ventas en el
+    período (las demás particiones ni se leen)
+    Args:
+        inicio (int): Ordinal del primer día
+        fin (int): Ordinal del último día
+    Returns:
+        list: Bloques para LibroColumnar.consultar()
+    """
+    if archivo is None or fin < inicio:
+        return []
+    return [
+        bloques_archivados.obtener_o_calcular(archivo.clave(mes),
+                                              lambda mes=mes: libro_columnar.bloque(archivo.cargar(mes)))
+        for mes in archivo.meses_en_rango(date.fromordinal(inicio).isoformat(), date.fromordinal(fin).isoformat())
+    ]
+
+def fragmento(plantilla, clave, contexto):
+    """
+    Renderiza una plantilla parcial, o la toma del caché si el libro no
+    cambió desde la última vez
+    Args:
+        plantilla (str): Plantilla a renderizar
+        clave (tuple): Lo que además de la versión cambia el resultado (ej. la búsqueda)
+        contexto (callable): Arma las variables de la plantilla (solo si hay que renderizar)
+    Returns:
+        Markup: HTML listo para insertar en la página
+    """
+    return cache_fragmentos.obtener_o_calcular(
+        (plantilla, ventas.version) + tuple(clave),
+        lambda: Markup(render_template(plantilla,
+                                       formatear_fecha=formatear_fecha,
+                                       formatear_moneda=formatear_moneda,
+                                       **contexto())))
+
+def etiqueta_version(*extra):
+    """
+    ETag de lo que depende solo del libro (más lo que se pase en extra)
+    """
+    return '-'.join([INSTANCIA, str(ventas.version), *map(str, extra)])
+
+def leer_orden_tabla(args):
+    """
+    Lee orden, dir, pagina y por_pagina de la tabla de ventas activas
+    Returns:
+        tuple: (orden, dirección, página, por página)
+    Raises:
+        ValueError: Si algún parámetro no es válido
+    """
+    orden = args.get('orden', 'id')
+    if orden not in CAMPOS_ORDEN:
+        raise ValueError(f"orden debe ser uno de: {', '.join(CAMPOS_ORDEN)}")
+    direccion = args.get('dir', 'asc')
+    if direccion not in ('asc', 'desc'):
+        raise ValueError("dir debe ser 'asc' o 'desc'")
+    pagina = args.get('pagina', 1, type=int)
+    por_pagina = args.get('por_pagina', POR_PAGINA_TABLA, type=int)
+    if pagina is None or por_pagina is None:
+        raise ValueError("pagina y por_pagina deben ser números")
+    return orden, direccion, max(1, pagina), max(1, min(por_pagina, POR_PAGINA_TABLA_MAXIMO))
+
+def tabla_ventas_activas(orden, direccion, pagina, por_pagina):
+    """
+    Returns:
+        tuple: (fragmento HTML de la tabla con su navegación, datos de la página)
+    """
+    datos = pagina_ventas_activas(orden, direccion, pagina, por_pagina)
+    html = fragmento('_tabla_ventas.html', (orden, direccion, datos['pagina'], por_pagina),
+                     lambda: {'ventas': datos['ventas'], 'paginacion': datos,
+                              'por_pagina_url': por_pagina if por_pagina != POR_PAGINA_TABLA else None})
+    return html, datos
+
+def fila_venta(id):
+    """
+    Returns:
+        str: La fila de la venta en la tabla de activas, o None si ya no
+             está en esa tabla (pagada, eliminada o archivada)
+    """
+    venta = ventas.obtener(id)
+    if venta is None or venta['estado'] != 'Activa':
+        return None
+    return render_template('_filas_ventas.html', ventas=[venta],
+                           formatear_fecha=formatear_fecha, formatear_moneda=formatear_moneda)
+
+def id_evento(secuencia):
+    return f"{INSTANCIA}-{secuencia}"
+
+def leer_id_evento(valor):
+    """
+    Lee el Last-Event-ID de un cliente que se reconecta
+    Returns:
+        int: Secuencia del último aviso (-1 si es de otro proceso: hay que
+             recargar todo), o None si el cliente empieza de cero
+    """
+    if not valor:
+        return None
+    instancia, _, secuencia = valor.partition('-')
+    return int(secuencia) if instancia == INSTANCIA and secuencia.isdigit() else -1
+
+def mensaje_evento(tipo, datos, id=None):
+    """
+    Un mensaje de Server-Sent Events (el JSON va en una sola línea)
+    """
+    lineas = [f"event: {tipo}", f"data: {json.dumps(datos, ensure_ascii=False)}"]
+    if id is not None:
+        lineas.append(f"id: {id}")
+    return '\n'.join(lineas) + '\n\n'
+
+def mensajes_eventos(avisos, atrasada, secuencia):
+    """
+    Arma lo que se le manda a un cliente por un grupo de avisos: una fila
+    por venta que cambió (aunque haya varios avisos de la misma) y las
+    tarjetas de estadísticas una sola vez
+    Args:
+        avisos (list): (secuencia, tipo, id) que devolvió DifusorEventos.esperar
+        atrasada (bool): El cliente perdió avisos y tiene que recargar la tabla
+        secuencia (int): Último aviso incluido (va como id del mensaje)
+    Returns:
+        str: Los mensajes SSE
+    """
+    partes = []
+    if atrasada or any(tipo == 'tabla' for _, tipo, _ in avisos):
+        partes.append(mensaje_evento('tabla', {}))
+    else:
+        for id in dict.fromkeys(id for _, tipo, id in avisos if tipo == 'venta'):
+            partes.append(mensaje_evento('venta', {'id': id, 'fila': fila_venta(id)}))
+    partes.append(mensaje_evento('estadisticas', {
+        'tarjetas': fragmento('_tarjetas_estadisticas.html', (), lambda: {'estadisticas': obtener_estadisticas()}),
+        'rubros': fragmento('_rubros_estadisticas.html', (), lambda: {'estadisticas': obtener_estadisticas()})
+    }, id=id_evento(secuencia)))
+    return ''.join(partes)
+
+def respuesta_condicional(etiqueta, generar):
+    """
+    Responde 304 si el cliente ya tiene esta versión (If-None-Match);
+    si no, arma la respuesta con generar() y le pone el ETag
+    Args:
+        etiqueta (str): ETag de la versión actual
+        generar (callable): Arma la respuesta completa
+    """
+    if request.if_none_match.contains_weak(etiqueta):
+        respuesta = Response(status=304)
+    else:
+        respuesta = make_response(generar())
+    respuesta.set_etag(etiqueta, weak=True)
+    # Que el navegador pregunte siempre (con el ETag) antes de usar su copia
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    return respuesta
+
+# Ventas excluidas que quedaron en el libro (de antes del archivo o de un
+# cierre que se cortó antes de archivar): pasan al archivo una sola vez
+migradas = archivar_excluidas()
+if migradas:
+    app.logger.info("%s ventas excluidas pasadas al archivo", migradas)
+
 # ========================================
 # RUTAS DE LA APLICACIÓN
 # ========================================
 
+@app.before_request
+def ponerse_al_dia():
+    """
+    Con varios workers sobre SQLite, cada request arranca con lo que
+    registraron los demás procesos
+    """
+    sincronizar_ventas()
+
 @app.route('/')
+@solo_lectura
 def index():
     """
     Página principal con formulario de registro y lista de ventas
     """
-    estadisticas = obtener_estadisticas()
-    # Solo mostrar ventas activas en la lista principal
-    ventas_activas = [venta for venta in ventas if venta['estado'] == 'Activa']
-    return render_template('index.html', 
-                         ventas=ventas_activas, 
+    # Tabla paginada y ordenable (?orden=fecha&dir=desc&pagina=2); si los
+    # parámetros no sirven se muestra la primera página por ID
+    try:
+        orden_tabla = leer_orden_tabla(request.args)
+    except ValueError:
+        orden_tabla = ('id', 'asc', 1, POR_PAGINA_TABLA)
+    # El formulario trae la fecha de hoy, por eso el ETag cambia cada día
+    return respuesta_condicional(etiqueta_version(date.today().isoformat()),
+                                 lambda: pagina_principal('', orden_tabla))
+
+def pagina_principal(query, orden_tabla=None):
+    """
+    Arma index.html con los fragmentos cacheados por versión del libro
+    Args:
+        query (str): Búsqueda por cliente ('' = tabla paginada de activas)
+        orden_tabla (tuple): (orden, dirección, página, por página) de la tabla
+    """
+    if query:
+        # Solo busco entre las ventas activas, con el índice de n-gramas
+        ventas_filtradas, total = buscar_ventas_activas(query)
+        tabla = fragmento('_tabla_ventas.html', (query,), lambda: {'ventas': ventas_filtradas})
+    else:
+        # Solo mostrar ventas activas en la lista principal, de a una página
+        tabla, datos = tabla_ventas_activas(*orden_tabla)
+        total = datos['total']
+    return render_template('index.html',
                          rubros=RUBROS,
-                         estadisticas=estadisticas,
-                         formatear_fecha=formatear_fecha,
-                         formatear_moneda=formatear_moneda,
-                         datetime=datetime)
+                         tarjetas_estadisticas=fragmento('_tarjetas_estadisticas.html', (),
+                                                         lambda: {'estadisticas': obtener_estadisticas()}),
+                         tabla_ventas=tabla,
+                         rubros_estadisticas=fragmento('_rubros_estadisticas.html', (),
+                                                       lambda: {'estadisticas': obtener_estadisticas()}),
+                         total_resultados=total,
+                         datetime=datetime,
+                         busqueda=query,
+                         ultimo_evento=id_evento(difusor.secuencia))
 
 @app.route('/agregar', methods=['POST'])
 def agregar():
     """
     Ruta para agregar una nueva venta
+    Con ?formato=json (el formulario enviado por script.js) no redirige:
+    devuelve la venta o el error, y la tabla se actualiza por /api/eventos
     """
+    como_json = request.args.get('formato') == 'json'
+    
+    def rechazar(motivo, estado=400):
+        return (jsonify({'error': motivo}), estado) if como_json else redirect('/')
+    
     try:
-        cliente = request.form.get('cliente', '').strip()
-        valor_total = request.form.get('valor_total', 0)
-        abono = request.form.get('abono', 0)
-        fecha = request.form.get('fecha', '').strip()
-        rubros = request.form.getlist('rubros')
-        
-        # Validaciones
-        if not cliente:
-            print("❌ Error: Cliente vacío")
-            return redirect('/')
-        
-        # Validación obligatoria de rubros
-        if not rubros:
-            print("❌ Error: Debe seleccionar al menos un rubro")
-            return redirect('/')
-        
-        try:
-            valor_total = float(valor_total) if valor_total else 0
-            abono = float(abono) if abono else 0
-        except ValueError as e:
-            print(f"❌ Error al convertir valores numéricos: {e}")
-            return redirect('/')
-        
-        if valor_total < 0 or abono < 0:
-            print("❌ Error: Valores negativos no permitidos")
-            return redirect('/')
-        
-        if not fecha:
-            fecha = datetime.now().strftime("%Y-%m-%d")
+        # Validaciones (las mismas de la API, ver leer_venta_nueva)
+        cliente, valor_total, abono, rubros, fecha = leer_venta_nueva(
+            request.form.get('cliente', ''),
+            request.form.get('valor_total', 0),
+            request.form.get('abono', 0),
+            request.form.getlist('rubros'),
+            request.form.get('fecha', '')
+        )
         
         nueva_venta = agregar_venta(cliente, valor_total, abono, rubros, fecha)
-        print(f"✅ Venta agregada: ID={nueva_venta['id']}, Cliente='{nueva_venta['cliente']}', Valor=${nueva_venta['valor_total']}, Rubros: {', '.join(rubros)}")
+        app.logger.info("Venta agregada: ID=%s, cliente=%r, valor=%s, rubros=%s",
+                        nueva_venta['id'], nueva_venta['cliente'], nueva_venta['valor_total'], ', '.join(nueva_venta['rubros']))
         
+        if como_json:
+            return jsonify({campo: nueva_venta[campo] for campo in CAMPOS_FILA}), 201
         return redirect('/')
         
-    except Exception as e:
-        print(f"❌ Error inesperado en agregar venta: {e}")
-        return redirect('/')
+    except ValueError as e:
+        app.logger.info("Venta rechazada: %s", e)
+        return rechazar(str(e))
+    except Exception:
+        app.logger.exception("Error inesperado en agregar venta")
+        return rechazar("Error inesperado al guardar la venta", 500)
 
 @app.route('/eliminar/<int:id>')
 def eliminar(id):
@@ -421,63 +1312,684 @@ def eliminar(id):
     Ruta para eliminar una venta
     """
     if eliminar_venta(id):
-        print(f"🗑️ Venta {id} eliminada")
+        app.logger.info("Venta %s eliminada", id)
     else:
-        print(f"❌ Venta {id} no encontrada")
+        app.logger.info("Venta %s no encontrada", id)
     
     return redirect('/')
 
+@app.route('/api/eventos')
+def api_eventos():
+    """
+    Cambios del libro en vivo (Server-Sent Events) para index.html:
+    'venta' con la fila nueva de una venta (o null si salió de la tabla),
+    'estadisticas' con las tarjetas y 'tabla' cuando hay que recargarla
+    Al reconectarse se manda Last-Event-ID (o ?ultimo=) y llega lo perdido
+    """
+    suscripcion = difusor.suscribir(leer_id_evento(request.headers.get('Last-Event-ID') or request.args.get('ultimo')))
+    if suscripcion is None:
+        # Sin hilos para otra conexión larga: el navegador reintenta más
+        # tarde (script.js vuelve a conectar cuando EventSource se rinde)
+        respuesta = Response(f"retry: {LATIDO_EVENTOS * 1000}\n\n", status=503, mimetype='text/event-stream')
+        respuesta.headers['Retry-After'] = str(LATIDO_EVENTOS)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        return respuesta
+
+    def generar():
+        try:
+            yield f"retry: {REINTENTO_EVENTOS_MS}\n\n"
+            fin = time.monotonic() + DURACION_EVENTOS
+            latido = time.monotonic() + LATIDO_EVENTOS
+            while time.monotonic() < fin:
+                avisos, atrasada, secuencia = difusor.esperar(suscripcion, ESPERA_EVENTOS)
+                if avisos or atrasada:
+                    with cerrojo_ventas.leyendo():
+                        mensajes = mensajes_eventos(avisos, atrasada, secuencia)
+                    yield mensajes
+                    latido = time.monotonic() + LATIDO_EVENTOS
+                    continue
+                # Con SQLite lo que escriben otros workers llega al sincronizar
+                # (y aplicar_cambio publica sus avisos)
+                sincronizar_ventas()
+                if time.monotonic() >= latido:
+                    # Un comentario: mantiene viva la conexión y detecta clientes idos
+                    yield ": latido\n\n"
+                    latido = time.monotonic() + LATIDO_EVENTOS
+        finally:
+            difusor.cancelar(suscripcion)
+
+    respuesta = Response(stream_with_context(generar()), mimetype='text/event-stream')
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    # Que un proxy (nginx) no junte los mensajes
+    respuesta.headers['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+@app.route('/api/cambios')
+def api_cambios():
+    """
+    Ventas y pagos que cambiaron desde una versión, para quien guarda una
+    copia local del libro (la app en el celular)
+    
+    Parámetros: desde (la 'version' de la respuesta anterior), limite
+    Devuelve {version, completo, ventas, eliminadas, hay_mas}: cada venta
+    cambiada con su historial de pagos e IDs de las eliminadas (o pasadas
+    al archivo). completo=true (sin desde, o de otro proceso o de antes de
+    una recarga) quiere decir que la copia local se reemplaza; con hay_mas
+    se pide otra vez desde la nueva versión
+    """
+    # Mismo formato que los IDs de /api/eventos: INSTANCIA-versión
+    desde = leer_id_evento(request.args.get('desde'))
+    limite = max(1, min(request.args.get('limite', LIMITE_CAMBIOS, type=int), LIMITE_CAMBIOS_MAXIMO))
+    
+    # Con el cerrojo: la versión devuelta corresponde exactamente a lo enviado
+    with cerrojo_ventas.leyendo():
+        completo = desde is None or not registro_cambios.base <= desde <= registro_cambios.version
+        if completo:
+            desde = registro_cambios.base
+        cambios, hay_mas = registro_cambios.recorrer(desde, limite)
+        
+        ventas_cambiadas = []
+        eliminadas = []
+        for _, id, eliminada in cambios:
+            if eliminada:
+                eliminadas.append(id)
+            else:
+                ventas_cambiadas.append(proyectar_venta(ventas.obtener(id), CAMPOS_CAMBIO))
+        hasta = cambios[-1][0] if hay_mas else registro_cambios.version
+    
+    return jsonify({
+        'version': id_evento(hasta),
+        'completo': completo,
+        'ventas': ventas_cambiadas,
+        'eliminadas': eliminadas,
+        'hay_mas': hay_mas
+    })
+
+@app.route('/sw.js')
+def service_worker():
+    """
+    El service worker (static/js/sw.js) se sirve desde la raíz para que
+    controle todas las páginas, y sin caché para que sus cambios lleguen
+    La base de la app va con los nombres con hash: al reconstruir los
+    estáticos cambia el service worker y el navegador instala el nuevo
+    """
+    with open(os.path.join(app.static_folder, 'js', 'sw.js'), encoding='utf-8') as f:
+        codigo = f.read()
+    for original in estaticos_con_hash:
+        codigo = codigo.replace(f"'/static/{original}'", f"'{url_for('static', filename=original)}'")
+    respuesta = Response(codigo, mimetype='text/javascript')
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    return respuesta
+
 @app.route('/api/estadisticas')
+@solo_lectura
 def api_estadisticas():
     """
     API para obtener estadísticas en formato JSON
     """
-    return jsonify(obtener_estadisticas())
+    return respuesta_condicional(etiqueta_version(), lambda: jsonify(obtener_estadisticas()))
+
+@app.route('/api/estadisticas/verificar')
+def api_verificar_estadisticas():
+    """
+    API para comprobar que las estadísticas incrementales cuadran
+    con un recálculo completo (?reparar=1 las reconstruye si no)
+    """
+    reparar = request.args.get('reparar', '') in ('1', 'true', 'si')
+    diferencias = verificar_estadisticas(reparar=reparar)
+    return jsonify({
+        'consistente': not diferencias,
+        'diferencias': diferencias,
+        'reparado': bool(diferencias) and reparar
+    })
+
+def leer_filtros_ventas(args):
+    """
+    Lee y valida los filtros de /api/ventas
+    Args:
+        args: request.args
+    Returns:
+        dict: Filtros normalizados
+    Raises:
+        ValueError: Si algún filtro no es válido
+    """
+    filtros = {'estado': None, 'incluida': None, 'rubro': None, 'desde': None, 'hasta': None}
+    
+    estado = args.get('estado', '').strip()
+    if estado:
+        if estado not in ('Activa', 'Cerrada'):
+            raise ValueError("estado debe ser 'Activa' o 'Cerrada'")
+        filtros['estado'] = estado
+    
+    incluida = args.get('incluida', '').strip().lower()
+    if incluida:
+        if incluida not in ('1', '0', 'true', 'false', 'si', 'no'):
+            raise ValueError("incluida debe ser 1 o 0")
+        filtros['incluida'] = incluida in ('1', 'true', 'si')
+    
+    rubro = args.get('rubro', '').strip()
+    if rubro:
+        if rubro not in RUBROS:
+            raise ValueError(f"Rubro no válido: {rubro}")
+        filtros['rubro'] = rubro
+    
+    for clave in ('desde', 'hasta'):
+        fecha = args.get(clave, '').strip()
+        if fecha:
+            ordinal = ordinal_de_fecha(fecha)
+            if ordinal is None:
+                raise ValueError(f"{clave} debe tener formato YYYY-MM-DD")
+            filtros[clave] = ordinal
+    
+    return filtros
+
+def leer_campos_ventas(args):
+    """
+    Lee la proyección de campos de /api/ventas (?campos=... o ?excluir=...)
+    Returns:
+        tuple: Campos a devolver, en el orden de CAMPOS_VENTA
+    Raises:
+        ValueError: Si se pide un campo que no existe
+    """
+    campos = [c.strip() for c in args.get('campos', '').split(',') if c.strip()]
+    excluir = [c.strip() for c in args.get('excluir', '').split(',') if c.strip()]
+    
+    desconocidos = [c for c in campos + excluir if c not in CAMPOS_VENTA]
+    if desconocidos:
+        raise ValueError(f"Campos desconocidos: {', '.join(desconocidos)}")
+    
+    return tuple(c for c in CAMPOS_VENTA if (not campos or c in campos) and c not in excluir)
+
+def recorrer_ventas(filtros, despues_de=None):
+    """
+    Genera las ventas que cumplen los filtros, en orden de ID
+    Args:
+        filtros (dict): Resultado de leer_filtros_ventas()
+        despues_de (int): Cursor - solo ventas con ID mayor
+    Yields:
+        dict: Cada venta que cumple los filtros
+    """
+    candidatas = ventas.recorrer(despues_de, estado=filtros['estado'], incluida=filtros['incluida'])
+    if incluye_archivo(filtros):
+        candidatas = merge(candidatas, filtrar_archivadas(archivo.recorrer(despues_de), filtros),
+                           key=lambda venta: venta['id'])
+    for venta in candidatas:
+        if filtros['rubro'] and filtros['rubro'] not in venta['rubros']:
+            continue
+        if filtros['desde'] is not None or filtros['hasta'] is not None:
+            dia = ordinal_de_fecha(venta['fecha'])
+            if dia is None:
+                continue
+            if filtros['desde'] is not None and dia < filtros['desde']:
+                continue
+            if filtros['hasta'] is not None and dia > filtros['hasta']:
+                continue
+        yield venta
+
+def incluye_archivo(filtros):
+    """
+    Returns:
+        bool: Si las ventas archivadas (cerradas y excluidas) pueden
+              cumplir los filtros
+    """
+    return (archivo is not None and len(archivo) > 0 and filtros['incluida'] is not True
+            and filtros['estado'] in (None, 'Cerrada'))
+
+def filtrar_archivadas(archivadas, filtros):
+    """
+    Yields:
+        dict: Las ventas archivadas con el estado e inclusión pedidos
+    """
+    for venta in archivadas:
+        if filtros['estado'] is not None and venta['estado'] != filtros['estado']:
+            continue
+        if filtros['incluida'] is not None and bool(venta['incluida_en_estadisticas']) != filtros['incluida']:
+            continue
+        yield venta
+
+def proyectar_venta(venta, campos):
+    """
+    Returns:
+        dict: Solo los campos pedidos de la venta
+    """
+    return {campo: venta.get(campo) for campo in campos}
 
 @app.route('/api/ventas')
+@solo_lectura
 def api_ventas():
     """
-    API para obtener todas las ventas en formato JSON
+    API para obtener las ventas en formato JSON
+    
+    Filtros: estado, rubro, desde, hasta (YYYY-MM-DD), incluida (1/0)
+    Proyección: campos=id,cliente,... o excluir=historial_pagos
+    Modos:
+    - Sin limite ni cursor: la lista completa, generada en streaming
+    - limite / cursor: una página {ventas, siguiente_cursor}
+    - formato=ndjson: una venta por línea en streaming (acepta cursor y limite)
+    """
+    try:
+        filtros = leer_filtros_ventas(request.args)
+        campos = leer_campos_ventas(request.args)
+        cursor = request.args.get('cursor', type=int)
+        limite = request.args.get('limite', type=int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    formato = request.args.get('formato', 'json')
+    
+    if formato == 'ndjson':
+        def generar_lineas():
+            for numero, venta in enumerate(recorrer_ventas(filtros, cursor)):
+                if limite is not None and numero >= limite:
+                    return
+                yield json.dumps(proyectar_venta(venta, campos), ensure_ascii=False) + '\n'
+        
+        return Response(stream_with_context(leyendo_por_bloques(generar_lineas(), VENTAS_POR_BLOQUE)),
+                        mimetype='application/x-ndjson')
+    
+    if limite is None and cursor is None:
+        # Misma respuesta de siempre (una lista), pero sin armarla en memoria
+        def generar_lista():
+            yield '['
+            for numero, venta in enumerate(recorrer_ventas(filtros)):
+                yield (',' if numero else '') + json.dumps(proyectar_venta(venta, campos), ensure_ascii=False)
+            yield ']'
+        
+        return Response(stream_with_context(leyendo_por_bloques(generar_lista(), VENTAS_POR_BLOQUE)),
+                        mimetype='application/json')
+    
+    # Página: pido una venta de más para saber si hay siguiente
+    limite = max(1, min(limite or LIMITE_PAGINA, LIMITE_PAGINA_MAXIMO))
+    pagina = []
+    for venta in recorrer_ventas(filtros, cursor):
+        pagina.append(venta)
+        if len(pagina) > limite:
+            break
+    
+    hay_mas = len(pagina) > limite
+    pagina = pagina[:limite]
+    
+    return jsonify({
+        'ventas': [proyectar_venta(venta, campos) for venta in pagina],
+        'limite': limite,
+        'siguiente_cursor': pagina[-1]['id'] if hay_mas else None
+    })
+
+def recorrer_ventas_periodo(filtros):
+    """
+    Como recorrer_ventas, pero si hay período recorre solo los días del
+    rango con las columnas del libro (en orden de fecha y luego de ID)
+    Yields:
+        dict: Cada venta que cumple los filtros
+    """
+    if filtros['desde'] is None and filtros['hasta'] is None:
+        yield from recorrer_ventas(filtros)
+        return
+    
+    inicio = filtros['desde'] if filtros['desde'] is not None else 1
+    fin = filtros['hasta'] if filtros['hasta'] is not None else date.max.toordinal()
+    candidatas = libro_columnar.recorrer(inicio, fin)
+    if incluye_archivo(filtros) and fin >= inicio:
+        # Solo las particiones cuyo rango de fechas cruza el período
+        meses = archivo.meses_en_rango(date.fromordinal(inicio).isoformat(), date.fromordinal(fin).isoformat())
+        archivadas = sorted(
+            (venta for venta in archivo.recorrer(meses=meses)
+             if inicio <= (ordinal_de_fecha(venta['fecha']) or 0) <= fin),
+            key=lambda venta: (ordinal_de_fecha(venta['fecha']), venta['id'])
+        )
+        candidatas = merge(candidatas, archivadas,
+                           key=lambda venta: (ordinal_de_fecha(venta['fecha']), venta['id']))
+    for venta in candidatas:
+        if filtros['estado'] is not None and venta['estado'] != filtros['estado']:
+            continue
+        if filtros['incluida'] is not None and bool(venta['incluida_en_estadisticas']) != filtros['incluida']:
+            continue
+        if filtros['rubro'] and filtros['rubro'] not in venta['rubros']:
+            continue
+        yield venta
+
+@app.route('/api/exportar/<tipo>')
+@solo_lectura
+def api_exportar(tipo):
+    """
+    Descarga ventas o pagos en CSV o JSON-lines, generado en streaming
+    
+    tipo: 'ventas' o 'pagos' (una fila por pago)
+    Filtros: los de /api/ventas (estado, rubro, desde, hasta, incluida)
+    - En ventas el período es la fecha de la venta
+    - En pagos el período es la fecha de cada pago
+    formato=csv|jsonl, gzip=1 para bajar el archivo comprimido
+    """
+    if tipo not in CAMPOS_EXPORTACION:
+        return jsonify({'error': f"Tipo no válido, usa: {', '.join(CAMPOS_EXPORTACION)}"}), 404
+    
+    try:
+        filtros = leer_filtros_ventas(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS_EXPORTACION:
+        return jsonify({'error': f"Formato no válido, usa: {', '.join(FORMATOS_EXPORTACION)}"}), 400
+    comprimido = request.args.get('gzip', '') in ('1', 'true', 'si')
+    
+    if tipo == 'ventas':
+        filas = filas_ventas(recorrer_ventas_periodo(filtros))
+    else:
+        desde, hasta = filtros['desde'], filtros['hasta']
+        filtro_fecha = None
+        if desde is not None or hasta is not None:
+            def filtro_fecha(fecha):
+                dia = ordinal_de_fecha(str(fecha)[:10])
+                return dia is not None and (desde is None or dia >= desde) and (hasta is None or dia <= hasta)
+        filas = filas_pagos(recorrer_ventas(dict(filtros, desde=None, hasta=None)), filtro_fecha)
+    
+    bloques = generar_csv(filas, CAMPOS_EXPORTACION[tipo]) if formato == 'csv' else generar_jsonl(filas)
+    # Cada bloque ya trae sus filas (exportacion.FILAS_POR_BLOQUE); la
+    # compresión va afuera del cerrojo
+    bloques = leyendo_por_bloques(bloques, 1)
+    nombre = f"{tipo}_{request.args.get('desde') or 'inicio'}_{request.args.get('hasta') or 'hoy'}.{formato}"
+    mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    if comprimido:
+        bloques = comprimir_gzip(bloques)
+        nombre += '.gz'
+        mimetype = 'application/gzip'
+    
+    respuesta = Response(stream_with_context(bloques), mimetype=mimetype)
+    respuesta.headers['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return respuesta
+
+@app.route('/api/ventas/bulk', methods=['POST'])
+def api_importar_ventas():
+    """
+    Importación masiva desde CSV, JSON-lines o un arreglo JSON
+    
+    El archivo va como cuerpo del POST o como campo 'archivo' de un form
+    Parámetros: formato=csv|jsonl|json (si no, se deduce), lote=N,
+    validar=1 para solo revisar sin guardar
+    """
+    archivo = request.files.get('archivo')
+    if archivo is not None:
+        flujo, nombre = archivo.stream, archivo.filename
+    else:
+        flujo, nombre = request.stream, ''
+    
+    formato = request.args.get('formato') or detectar_formato(nombre, request.mimetype if archivo is None else archivo.mimetype)
+    if formato not in FORMATOS_IMPORTACION:
+        return jsonify({'error': f"Formato no válido, usa: {', '.join(FORMATOS_IMPORTACION)}"}), 400
+    
+    lote = max(1, min(request.args.get('lote', LOTE_IMPORTACION, type=int), LOTE_IMPORTACION_MAXIMO))
+    solo_validar = request.args.get('validar', '') in ('1', 'true', 'si')
+    
+    resumen = importar_ventas(leer_filas(abrir_texto(flujo), formato), lote, solo_validar)
+    app.logger.info("Importación %s: %s ventas, %s errores", formato, resumen['importadas'], resumen['total_errores'])
+    return jsonify(resumen), (400 if 'error' in resumen else 200)
+
+def leer_envio_json():
+    """
+    Lee el cuerpo de POST /api/ventas o /api/ventas/<id>/pagos
+    Returns:
+        tuple: (elementos, es_lote): un objeto solo o un arreglo de objetos
+    Raises:
+        ValueError: Si el cuerpo no sirve
+    """
+    datos = request.get_json(silent=True)
+    if isinstance(datos, dict):
+        return [datos], False
+    if not isinstance(datos, list) or not datos:
+        raise ValueError("Se esperaba un objeto JSON o un arreglo de objetos")
+    if len(datos) > LOTE_API_MAXIMO:
+        raise ValueError(f"Máximo {LOTE_API_MAXIMO} por envío (para más usa /api/ventas/bulk)")
+    return datos, True
+
+def leer_clave_idempotencia(datos, indice, es_lote):
+    """
+    La clave de un elemento: su campo 'clave' o, si no trae, el
+    encabezado Idempotency-Key (en un arreglo, seguido de ':' y la posición)
+    Returns:
+        str: La clave, o None si no se mandó ninguna
     """
-    return jsonify(ventas)
+    clave = datos.get('clave')
+    if clave is None:
+        encabezado = request.headers.get('Idempotency-Key')
+        if not encabezado:
+            return None
+        clave = f"{encabezado}:{indice}" if es_lote else encabezado
+    clave = str(clave).strip()
+    if not clave or len(clave) > LARGO_CLAVE:
+        raise ValueError(f"La clave debe tener entre 1 y {LARGO_CLAVE} caracteres")
+    return clave
+
+def registrar_envio(registrar, nombre):
+    """
+    Registra un objeto o un arreglo de la API, todo en una sola escritura
+    Args:
+        registrar (callable): registrar(datos, clave, huella) -> (código HTTP, resultado)
+        nombre (str): Qué se registra, para el log ('ventas', 'pagos')
+    Returns:
+        Respuesta: Con un objeto, su resultado y su código; con un arreglo,
+        {'resultados', 'registrados', 'repetidos', 'errores'} con 200
+        (o 207 si algún elemento falló)
+    """
+    try:
+        elementos, es_lote = leer_envio_json()
+    except ValueError as e:
+        return jsonify({'estado': 'error', 'error': str(e)}), 400
+    
+    resultados = []
+    try:
+        # La clave se busca y se recuerda dentro de la misma escritura: dos
+        # reintentos que llegan juntos no pueden registrar dos veces
+        with escritura():
+            for indice, datos in enumerate(elementos):
+                clave = None
+                try:
+                    if not isinstance(datos, dict):
+                        raise ValueError("Cada elemento debe ser un objeto")
+                    clave = leer_clave_idempotencia(datos, indice, es_lote)
+                    contenido = {campo: valor for campo, valor in datos.items() if campo != 'clave'}
+                    codigo, resultado = registrar(contenido, clave, huella_datos(contenido) if clave else None)
+                except ValueError as e:
+                    codigo, resultado = 400, {'estado': 'error', 'error': str(e)}
+                if es_lote:
+                    resultado = {'indice': indice, 'codigo': codigo, **resultado}
+                    if clave is not None:
+                        resultado['clave'] = clave
+                resultados.append((codigo, resultado))
+    except Exception:
+        # Con SQLite se deshizo todo (y sus claves se olvidaron); con el
+        # diario lo ya registrado con clave se puede reintentar sin duplicar
+        app.logger.exception("Error inesperado al registrar %s por la API", nombre)
+        return jsonify({'estado': 'error', 'error': f"Error inesperado al guardar los {nombre}"}), 500
+    
+    cuenta = {'registrado': 0, 'repetido': 0}
+    for _, resultado in resultados:
+        if resultado['estado'] in cuenta:
+            cuenta[resultado['estado']] += 1
+    errores = len(resultados) - cuenta['registrado'] - cuenta['repetido']
+    app.logger.info("API %s: %s registrados, %s repetidos, %s con error",
+                    nombre, cuenta['registrado'], cuenta['repetido'], errores)
+    
+    if not es_lote:
+        codigo, resultado = resultados[0]
+        return jsonify(resultado), codigo
+    return jsonify({
+        'resultados': [resultado for _, resultado in resultados],
+        'registrados': cuenta['registrado'],
+        'repetidos': cuenta['repetido'],
+        'errores': errores
+    }), (207 if errores else 200)
+
+def repetir_con_clave(clave, huella):
+    """
+    Returns:
+        tuple: (código, resultado) si la clave ya se usó; None si es nueva.
+        El resultado repetido trae 'id' con lo que se creó la primera vez
+    """
+    previo = claves_idempotencia.buscar(clave, huella)
+    if previo is None:
+        return None
+    creado, mismos_datos = previo
+    if not mismos_datos:
+        return 409, {'estado': 'conflicto', 'error': "La clave ya se usó con otros datos"}
+    return 200, {'estado': 'repetido', 'id': creado}
+
+def datos_idempotencia(clave, huella):
+    """
+    Lo que viaja en la operación del diario con la clave de un elemento
+    de la API: la huella y cuándo se creó (el vencimiento sobrevive a un
+    reinicio). None si el elemento no trae clave
+    """
+    if clave is None:
+        return None
+    return {'clave': clave, 'huella': huella, 'creada': claves_idempotencia.reloj()}
+
+def registrar_venta_api(datos, clave, huella):
+    """
+    Una venta de POST /api/ventas (corre dentro de la escritura del envío)
+    """
+    if clave is not None:
+        repetido = repetir_con_clave(('venta', clave), huella)
+        if repetido is not None:
+            codigo, resultado = repetido
+            if codigo == 200:
+                venta = obtener_venta(resultado.pop('id'))
+                resultado['venta'] = proyectar_venta(venta, CAMPOS_FILA) if venta is not None else None
+            return codigo, resultado
+    
+    cliente, valor_total, abono, rubros, fecha = leer_venta_nueva(
+        datos.get('cliente'), datos.get('valor_total'), datos.get('abono'), datos.get('rubros'), datos.get('fecha')
+    )
+    nueva_venta = agregar_venta(cliente, valor_total, abono, rubros, fecha,
+                                idempotencia=datos_idempotencia(clave, huella))
+    return 201, {'estado': 'registrado', 'venta': {campo: nueva_venta[campo] for campo in CAMPOS_FILA}}
+
+def registrar_pago_api(venta_id, datos, clave, huella):
+    """
+    Un pago de POST /api/ventas/<id>/pagos (corre dentro de la escritura del envío)
+    """
+    if clave is not None:
+        repetido = repetir_con_clave(('pago', venta_id, clave), huella)
+        if repetido is not None:
+            codigo, resultado = repetido
+            if codigo == 200:
+                pago_id = resultado.pop('id')
+                venta = obtener_venta(venta_id)
+                pagos = venta['historial_pagos'] if venta is not None else ()
+                resultado['pago'] = next((pago for pago in pagos if pago['id'] == pago_id), None)
+                resultado['venta'] = proyectar_venta(venta, CAMPOS_FILA) if venta is not None else None
+            return codigo, resultado
+    
+    try:
+        monto_pago = float(datos.get('monto'))
+    except (TypeError, ValueError):
+        raise ValueError("El monto del pago debe ser un número")
+    tipo_pago = str(datos.get('tipo') or 'Abono').strip() or 'Abono'
+    
+    venta = registrar_pago(venta_id, monto_pago, tipo_pago, idempotencia=datos_idempotencia(clave, huella))
+    if venta is None:
+        return 404, {'estado': 'error', 'error': "La venta no existe"}
+    return 201, {
+        'estado': 'registrado',
+        'pago': venta['historial_pagos'][-1],
+        'venta': {campo: venta[campo] for campo in CAMPOS_FILA}
+    }
+
+@app.route('/api/ventas', methods=['POST'])
+def api_registrar_ventas():
+    """
+    Registra una venta (objeto) o varias (arreglo) en un solo viaje
+    
+    Cada venta: cliente, valor_total, abono, rubros (lista), fecha
+    (YYYY-MM-DD, por defecto hoy) y opcionalmente 'clave' de idempotencia
+    (o el encabezado Idempotency-Key): un reintento con la misma clave
+    devuelve la venta ya creada en vez de registrarla otra vez
+    """
+    return registrar_envio(registrar_venta_api, 'ventas')
+
+@app.route('/api/ventas/<int:venta_id>/pagos', methods=['POST'])
+def api_registrar_pagos(venta_id):
+    """
+    Registra uno o varios pagos de una venta: monto, tipo (por defecto
+    Abono) y 'clave' de idempotencia como en POST /api/ventas
+    """
+    return registrar_envio(lambda datos, clave, huella: registrar_pago_api(venta_id, datos, clave, huella), 'pagos')
+
+@app.cli.command('importar-ventas')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(FORMATOS_IMPORTACION), help='Si no se indica, se deduce de la extensión')
+@click.option('--lote', default=LOTE_IMPORTACION, show_default=True, help='Filas por transacción')
+@click.option('--validar', is_flag=True, help='Solo revisar el archivo, sin guardar')
+@click.option('--reporte', type=click.Path(dir_okay=False), help='Guardar todos los errores (JSON-lines)')
+def comando_importar_ventas(archivo, formato, lote, validar, reporte):
+    """
+    Importa ventas históricas: flask --app app importar-ventas ventas.csv
+    """
+    formato = formato or detectar_formato(archivo)
+    if formato is None:
+        raise click.BadParameter("No se pudo deducir el formato, usa --formato", param_hint='--formato')
+    
+    salida_reporte = open(reporte, 'w', encoding='utf-8') if reporte else None
+    al_fallar = (lambda error: salida_reporte.write(json.dumps(error, ensure_ascii=False) + '\n')) if salida_reporte else None
+    try:
+        with open(archivo, 'rb') as f:
+            resumen = importar_ventas(leer_filas(abrir_texto(f), formato), lote, validar, al_fallar)
+    finally:
+        if salida_reporte:
+            salida_reporte.close()
+    
+    accion = 'válidas' if validar else 'importadas'
+    click.echo(f"✅ {resumen['validas' if validar else 'importadas']} ventas {accion}, {resumen['total_errores']} filas con error")
+    if resumen['primer_id'] is not None:
+        click.echo(f"   IDs {resumen['primer_id']} a {resumen['ultimo_id']}")
+    for error in resumen['errores'][:20]:
+        click.echo(f"   fila {error['fila']}: {error['error']}")
+    if resumen['total_errores'] > 20 and not reporte:
+        click.echo("   ... usa --reporte errores.jsonl para verlos todos")
+    if 'error' in resumen:
+        raise click.ClickException(resumen['error'])
 
 @app.route('/pago/<int:venta_id>', methods=['GET', 'POST'])
 def gestionar_pago(venta_id):
     """
     Ruta para gestionar pagos de una venta específica
     """
-    venta = obtener_venta(venta_id)
-    if not venta:
-        return redirect('/')
+    with cerrojo_ventas.leyendo():
+        venta = obtener_venta(venta_id)
+        if not venta:
+            return redirect('/')
+        
+        if request.method == 'GET':
+            # GET: Mostrar formulario de pago
+            return render_template('pago.html', venta=venta, formatear_moneda=formatear_moneda, formatear_fecha=formatear_fecha)
     
-    if request.method == 'POST':
-        try:
-            monto_pago = float(request.form.get('monto_pago', 0))
-            tipo_pago = request.form.get('tipo_pago', 'Abono')
-            
-            if monto_pago <= 0:
-                print("❌ Error: Monto de pago inválido")
-                return redirect(f'/pago/{venta_id}')
-            
-            venta_actualizada = registrar_pago(venta_id, monto_pago, tipo_pago)
-            if venta_actualizada:
-                print(f"✅ Pago registrado: Venta {venta_id}, Monto: ${monto_pago}")
-                if venta_actualizada['estado'] == 'Cerrada':
-                    print(f"🎉 Venta {venta_id} cerrada completamente")
-            else:
-                print(f"❌ Error al registrar pago en venta {venta_id}")
-                
-        except ValueError as e:
-            print(f"❌ Error de validación: {e}")
-        except Exception as e:
-            print(f"❌ Error inesperado: {e}")
+    # POST: el pago se registra fuera de la lectura (registrar_pago toma la
+    # escritura y vuelve a buscar la venta)
+    try:
+        monto_pago = float(request.form.get('monto_pago', 0))
+        tipo_pago = request.form.get('tipo_pago', 'Abono')
         
-        return redirect('/')
+        if monto_pago <= 0:
+            app.logger.info("Pago rechazado en venta %s: monto inválido", venta_id)
+            return redirect(f'/pago/{venta_id}')
+        
+        venta_actualizada = registrar_pago(venta_id, monto_pago, tipo_pago)
+        if venta_actualizada:
+            app.logger.info("Pago registrado: venta %s, monto %s", venta_id, monto_pago)
+            if venta_actualizada['estado'] == 'Cerrada':
+                app.logger.info("Venta %s cerrada completamente", venta_id)
+        else:
+            app.logger.warning("Error al registrar pago en venta %s", venta_id)
+            
+    except ValueError as e:
+        app.logger.info("Pago rechazado en venta %s: %s", venta_id, e)
+    except Exception:
+        app.logger.exception("Error inesperado al registrar pago en venta %s", venta_id)
     
-    # GET: Mostrar formulario de pago
-    return render_template('pago.html', venta=venta, formatear_moneda=formatear_moneda, formatear_fecha=formatear_fecha)
+    return redirect('/')
 
 @app.route('/historial/<int:venta_id>')
+@solo_lectura
 def ver_historial(venta_id):
     """
     Ruta para ver el historial de pagos de una venta
@@ -489,32 +2001,72 @@ def ver_historial(venta_id):
     return render_template('historial.html', venta=venta, formatear_moneda=formatear_moneda, formatear_fecha=formatear_fecha)
 
 @app.route('/buscar')
+@solo_lectura
 def buscar_ventas():
     """
     Ruta para buscar ventas por nombre de cliente
     """
     query = request.args.get('q', '').strip().lower()
-    
     if not query:
-        # Si no hay búsqueda, mostrar todas las ventas activas
-        ventas_filtradas = [venta for venta in ventas if venta['estado'] == 'Activa']
-    else:
-        # Filtrar ventas activas que contengan el nombre del cliente
-        ventas_filtradas = [
-            venta for venta in ventas 
-            if venta['estado'] == 'Activa' and query in venta['cliente'].lower()
-        ]
+        return redirect(url_for('index'))
+    return respuesta_condicional(etiqueta_version(date.today().isoformat()),
+                                 lambda: pagina_principal(query))
+
+@app.route('/api/buscar')
+@solo_lectura
+def api_buscar():
+    """
+    Búsqueda liviana para el buscador en vivo del celular
+    Parámetros: q, limite (máx. 200) y formato ('json' o 'html')
+    Con formato=html devuelve solo el fragmento de la tabla de ventas
+    """
+    query = request.args.get('q', '').strip()
+    limite = request.args.get('limite', LIMITE_BUSQUEDA, type=int)
+    limite = max(1, min(limite, LIMITE_BUSQUEDA_MAXIMO))
+    formato = request.args.get('formato', 'json')
     
-    estadisticas = obtener_estadisticas()
+    resultados, total = buscar_ventas_activas(query, limite)
     
-    return render_template('index.html', 
-                         ventas=ventas_filtradas, 
-                         rubros=RUBROS,
-                         estadisticas=estadisticas,
-                         formatear_fecha=formatear_fecha,
-                         formatear_moneda=formatear_moneda,
-                         datetime=datetime,
-                         busqueda=query)
+    if formato == 'html':
+        respuesta = make_response(fragmento('_tabla_ventas.html', (query, limite), lambda: {'ventas': resultados}))
+        respuesta.headers['X-Total-Resultados'] = str(total)
+        return respuesta
+    
+    return jsonify({
+        'q': query,
+        'total': total,
+        'limite': limite,
+        'ventas': [{campo: venta[campo] for campo in CAMPOS_FILA} for venta in resultados]
+    })
+
+@app.route('/api/ventas/activas')
+@solo_lectura
+def api_ventas_activas():
+    """
+    Tabla de ventas activas paginada y ordenada (la misma de index.html)
+    Parámetros: orden (id, fecha, saldo_pendiente, cliente, valor_total),
+    dir (asc/desc), pagina, por_pagina (máx. 200) y formato ('json' o 'html')
+    Con formato=html devuelve el fragmento de la tabla con su navegación
+    """
+    try:
+        orden, direccion, pagina, por_pagina = leer_orden_tabla(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if request.args.get('formato', 'json') == 'html':
+        def generar():
+            html, datos = tabla_ventas_activas(orden, direccion, pagina, por_pagina)
+            respuesta = make_response(html)
+            respuesta.headers['X-Total-Resultados'] = str(datos['total'])
+            respuesta.headers['X-Pagina'] = str(datos['pagina'])
+            return respuesta
+        return respuesta_condicional(etiqueta_version('html'), generar)
+    
+    def generar_json():
+        datos = pagina_ventas_activas(orden, direccion, pagina, por_pagina)
+        datos['ventas'] = [{campo: venta[campo] for campo in CAMPOS_FILA} for venta in datos['ventas']]
+        return jsonify(datos)
+    return respuesta_condicional(etiqueta_version('json'), generar_json)
 
 @app.route('/cierre-mensual', methods=['GET', 'POST'])
 def cierre_mensual():
@@ -526,18 +2078,18 @@ def cierre_mensual():
             mes = int(request.form.get('mes', datetime.now().month))
             año = int(request.form.get('año', datetime.now().year))
             
-            resumen = cerrar_mes_estadisticas(mes, año)
-            print(f"✅ Cierre mensual realizado: {resumen['ventas_excluidas']} ventas excluidas")
+            cerrar_mes_estadisticas(mes, año)
             
             return redirect('/')
             
-        except Exception as e:
-            print(f"❌ Error en cierre mensual: {e}")
+        except Exception:
+            app.logger.exception("Error en cierre mensual")
             return redirect('/')
     
     # GET: Mostrar formulario de cierre mensual
-    ventas_pendientes = obtener_ventas_cerradas_pendientes()
-    estadisticas = obtener_estadisticas()
+    with cerrojo_ventas.leyendo():
+        ventas_pendientes = obtener_ventas_cerradas_pendientes()
+        estadisticas = obtener_estadisticas()
     
     return render_template('cierre_mensual.html', 
                          ventas_pendientes=ventas_pendientes,
@@ -546,22 +2098,46 @@ def cierre_mensual():
                          formatear_moneda=formatear_moneda,
                          datetime=datetime)
 
+@app.route('/api/cierres')
+@solo_lectura
+def api_cierres():
+    """
+    API con el resumen congelado de cada mes cerrado (del más reciente al más viejo)
+    """
+    return jsonify(obtener_cierres_mensuales())
+
+@app.route('/api/cierres/<int:anio>/<int:mes>')
+@solo_lectura
+def api_cierre_mensual(anio, mes):
+    """
+    API con el resumen congelado de un mes cerrado
+    """
+    cierre = obtener_cierre_mensual(mes, anio)
+    if cierre is None:
+        return jsonify({'error': 'El mes no tiene cierres'}), 404
+    return jsonify(cierre)
+
 @app.route('/ventas-excluidas')
+@solo_lectura
 def ventas_excluidas():
     """
     Ruta para ver las ventas excluidas de estadísticas
     """
-    ventas_excluidas = [venta for venta in ventas if not venta.get('incluida_en_estadisticas', True)]
-    estadisticas = obtener_estadisticas()
+    # ?mes=YYYY-MM muestra solo ese mes de cierre (y del archivo lee solo
+    # esa partición)
+    mes = request.args.get('mes', '').strip() or None
     
-    return render_template('ventas_excluidas.html', 
-                         ventas=ventas_excluidas,
-                         estadisticas=estadisticas,
-                         formatear_fecha=formatear_fecha,
-                         formatear_moneda=formatear_moneda,
-                         datetime=datetime)
+    # La página entera depende solo del libro: se cachea completa
+    return respuesta_condicional(etiqueta_version(mes or ''), lambda: fragmento('ventas_excluidas.html', (mes,), lambda: {
+        'ventas': obtener_ventas_excluidas(mes),
+        'mes': mes,
+        'estadisticas': obtener_estadisticas(),
+        'cierres': obtener_cierres_mensuales(),
+        'rubros': RUBROS
+    }))
 
 @app.route('/estadisticas-periodo', methods=['GET', 'POST'])
+@solo_lectura
 def estadisticas_periodo():
     """
     Ruta para ver estadísticas por período de tiempo
@@ -580,7 +2156,7 @@ def estadisticas_periodo():
                                      datetime=datetime,
                                      rubros=RUBROS)
             else:
-                print("❌ Error al obtener estadísticas del período")
+                app.logger.info("No se pudieron obtener las estadísticas del período %s a %s", fecha_inicio, fecha_fin)
                 return redirect('/estadisticas-periodo')
     
     # GET: Mostrar formulario de selección de período
@@ -596,6 +2172,7 @@ def estadisticas_periodo():
                          datetime=datetime)
 
 @app.route('/api/estadisticas-periodo')
+@solo_lectura
 def api_estadisticas_periodo():
     """
     API para obtener estadísticas por período en formato JSON
@@ -603,13 +2180,151 @@ def api_estadisticas_periodo():
     fecha_inicio = request.args.get('fecha_inicio', '')
     fecha_fin = request.args.get('fecha_fin', '')
     
-    if fecha_inicio and fecha_fin:
-        estadisticas = obtener_estadisticas_por_periodo(fecha_inicio, fecha_fin)
-        if estadisticas:
-            return jsonify(estadisticas)
+    inicio, fin = ordinal_de_fecha(fecha_inicio), ordinal_de_fecha(fecha_fin)
+    if inicio is not None and fin is not None:
+        # El ETag lleva la versión con que se calculó el reporte: sigue
+        # valiendo mientras ningún cambio toque el rango
+        version, periodo = consultar_periodo(inicio, fin)
+        return respuesta_condicional(
+            '-'.join([INSTANCIA, str(version), 'periodo', fecha_inicio, fecha_fin]),
+            lambda: jsonify({'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin, **periodo}))
     
     return jsonify({'error': 'Fechas requeridas'}), 400
 
+@app.route('/api/caja')
+@solo_lectura
+def api_caja():
+    """
+    API con lo cobrado en un período (por fecha de pago): ?desde=&hasta=
+    """
+    try:
+        inicio, fin = leer_periodo_caja(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return respuesta_condicional(etiqueta_version('caja', inicio, fin),
+                                 lambda: jsonify(obtener_caja(inicio, fin)))
+
+@app.route('/api/caja/diaria')
+@solo_lectura
+def api_caja_diaria():
+    """
+    API con lo cobrado cada día de un período (solo días con pagos)
+    """
+    try:
+        inicio, fin = leer_periodo_caja(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return respuesta_condicional(etiqueta_version('caja-diaria', inicio, fin),
+                                 lambda: jsonify(obtener_caja(inicio, fin, por_dia=True)))
+
+@app.route('/api/cartera')
+@solo_lectura
+def api_cartera():
+    """
+    API con el total por cobrar y su antigüedad (0-30, 31-60, 61-90, 90+ días)
+    """
+    return respuesta_condicional(etiqueta_version('cartera', date.today().isoformat()),
+                                 lambda: jsonify(obtener_cartera()))
+
+@app.route('/api/cartera/deudores')
+@solo_lectura
+def api_cartera_deudores():
+    """
+    API con los clientes que más deben: ?limite=
+    """
+    limite = max(1, min(request.args.get('limite', LIMITE_DEUDORES, type=int), LIMITE_DEUDORES_MAXIMO))
+    hoy = date.today()
+    return respuesta_condicional(etiqueta_version('deudores', hoy.isoformat(), limite),
+                                 lambda: jsonify(cartera.deudores(limite, hoy.toordinal())))
+
+@app.route('/api/cartera/cliente')
+@solo_lectura
+def api_cartera_cliente():
+    """
+    API con lo que deben los clientes cuyo nombre contiene ?nombre= (sin
+    importar acentos ni mayúsculas, como el buscador): primero el que se
+    llama así y después los demás de mayor a menor saldo
+    Parámetros: nombre, limite (máx. 200)
+    """
+    nombre = request.args.get('nombre', '').strip()
+    if not nombre:
+        return jsonify({'error': 'Nombre requerido'}), 400
+    limite = request.args.get('limite', LIMITE_BUSQUEDA, type=int)
+    limite = max(1, min(limite, LIMITE_BUSQUEDA_MAXIMO))
+    hoy = date.today().toordinal()
+    
+    exacto = cartera.cliente(nombre, hoy)
+    plegado = plegar_texto(nombre)
+    otros, total = cartera.clientes(
+        (encontrado for encontrado in indice_busqueda.nombres(nombre) if encontrado != plegado),
+        hoy, limite - (exacto is not None))
+    if exacto is None and not total:
+        return jsonify({'error': 'Ningún cliente con ese nombre tiene saldo pendiente'}), 404
+    return jsonify({
+        'nombre': nombre,
+        'total': total + (exacto is not None),
+        'limite': limite,
+        'clientes': ([exacto] if exacto is not None else []) + otros
+    })
+
+# Medidores del libro: se leen cada vez que se consulta /metrics
+metricas.registrar_medidor('ventas_libro_ventas', 'Ventas en el libro', lambda: len(ventas))
+metricas.registrar_medidor('ventas_libro_pagos', 'Pagos en el libro de pagos', lambda: len(libro_pagos))
+metricas.registrar_medidor('ventas_activas', 'Ventas con saldo pendiente',
+                           lambda: estadisticas_incrementales.total_ventas_activas)
+metricas.registrar_medidor('ventas_saldo_pendiente', 'Saldo pendiente total de las ventas activas',
+                           lambda: obtener_estadisticas()['total_pendiente'])
+metricas.registrar_medidor('ventas_pendientes_cierre', 'Ventas cerradas que esperan el cierre mensual',
+                           lambda: len(pendientes_cierre))
+metricas.registrar_medidor('ventas_clientes_con_saldo', 'Clientes con alguna venta activa por cobrar',
+                           lambda: len(cartera))
+metricas.registrar_medidor('ventas_archivadas', 'Ventas excluidas guardadas en el archivo por mes',
+                           lambda: len(archivo) if archivo is not None else 0)
+metricas.registrar_medidor('ventas_eventos_clientes', 'Clientes conectados a /api/eventos', lambda: len(difusor))
+metricas.registrar_medidor('ventas_eventos_avisos_total', 'Avisos de cambios publicados a /api/eventos',
+                           lambda: difusor.publicados, tipo='counter')
+metricas.registrar_medidor('ventas_eventos_desbordes_total',
+                           'Veces que un cliente lento perdió avisos y tuvo que recargar la tabla',
+                           lambda: difusor.desbordes, tipo='counter')
+metricas.registrar_medidor('ventas_idempotencia_claves', 'Claves de idempotencia de la API recordadas',
+                           lambda: len(claves_idempotencia))
+metricas.registrar_medidor('ventas_idempotencia_repetidas_total',
+                           'Envíos de la API repetidos con la misma clave (no se registraron de nuevo)',
+                           lambda: claves_idempotencia.repetidas, tipo='counter')
+metricas.registrar_medidor('ventas_idempotencia_conflictos_total',
+                           'Envíos de la API con una clave ya usada para otros datos',
+                           lambda: claves_idempotencia.conflictos, tipo='counter')
+metricas.registrar_medidor('ventas_cambios_version', 'Versión del registro de cambios de /api/cambios',
+                           lambda: registro_cambios.version)
+metricas.registrar_medidor('ventas_libro_version', 'Versión del libro (sube con cada cambio)', lambda: ventas.version)
+metricas.registrar_medidor('ventas_cache_fragmentos_aciertos_total', 'Fragmentos HTML servidos desde el caché',
+                           lambda: cache_fragmentos.aciertos, tipo='counter')
+metricas.registrar_medidor('ventas_cache_fragmentos_fallos_total', 'Fragmentos HTML que hubo que renderizar',
+                           lambda: cache_fragmentos.fallos, tipo='counter')
+metricas.registrar_medidor('ventas_cache_periodos_aciertos_total', 'Reportes por período servidos desde el caché',
+                           lambda: cache_periodos.aciertos, tipo='counter')
+metricas.registrar_medidor('ventas_cache_periodos_fallos_total', 'Reportes por período que hubo que calcular',
+                           lambda: cache_periodos.fallos, tipo='counter')
+metricas.registrar_medidor('ventas_cache_periodos_invalidaciones_total',
+                           'Reportes por período descartados porque un cambio tocó su rango',
+                           lambda: cache_periodos.invalidaciones, tipo='counter')
+metricas.registrar_medidor('ventas_cerrojo_esperas_lectura_total',
+                           'Lecturas que esperaron a que terminara una escritura',
+                           lambda: cerrojo_ventas.esperas_lectura, tipo='counter')
+metricas.registrar_medidor('ventas_cerrojo_esperas_escritura_total',
+                           'Escrituras que esperaron a otra escritura o a lecturas en curso',
+                           lambda: cerrojo_ventas.esperas_escritura, tipo='counter')
+metricas.registrar_medidor('ventas_cache_fragmentos_caracteres', 'Tamaño del caché de fragmentos',
+                           lambda: cache_fragmentos.tamano)
+
+@app.route('/metrics')
+@solo_lectura
+def metrics():
+    """
+    Métricas en formato de texto de Prometheus (de este proceso)
+    """
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
 # ========================================
 # EJECUCIÓN PRINCIPAL
 # ========================================
@@ -0,0 +1,274 @@
+# ========================================
+# ARCHIVO DE VENTAS EXCLUIDAS - Carloszerpav
+# ========================================
+# Las ventas que excluye el cierre mensual ya no cambian, pero quedaban en
+# el libro en memoria para siempre: años de historia pagando en cada
+# recorrido del libro caliente
+#
+# - Cada mes de cierre es una partición en disco (archivo/AAAA-MM.jsonl,
+#   una venta por línea) y el libro en memoria se queda con lo abierto
+# - particiones.json guarda por partición cuántas ventas tiene, sus IDs y
+#   fechas mínimas y máximas: así se sabe qué meses abrir sin leerlos
+# - Una partición se lee con mmap solo cuando alguien la pide (ventas
+#   excluidas, reportes por período, historial) y queda en un caché LRU
+#   de pocas particiones
+# - Las ventas archivadas se devuelven como dicts (la forma de a_dict()):
+#   son de solo lectura y no cargan el libro de pagos compartido
+# - Cada partición guarda también su caja por día de pago (caja.py), así
+#   el libro de caja cuenta lo cobrado en ventas archivadas sin leerlas
+
+import json
+import mmap
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from heapq import merge
+
+from cache_lru import CacheLRU
+from caja import resumir_caja
+
+CARPETA_ARCHIVO = 'archivo'
+ARCHIVO_PARTICIONES = 'particiones.json'
+
+# Particiones leídas que se guardan en memoria
+PARTICIONES_EN_MEMORIA = 12
+
+
+def _id_de(venta):
+    return venta['id']
+
+
+def _lineas(ventas):
+    return b''.join(
+        json.dumps(venta, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        for venta in ventas
+    )
+
+
+def _es_fecha(fecha):
+    return isinstance(fecha, str) and len(fecha) == 10 and fecha[4] == '-' and fecha[7] == '-'
+
+
+def _escribir_atomico(ruta, contenido):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+class ArchivoVentas:
+    """
+    Ventas excluidas en particiones por mes de cierre, con carga perezosa
+    """
+
+    def __init__(self, directorio, particiones_en_memoria=PARTICIONES_EN_MEMORIA):
+        """
+        Args:
+            directorio (str): Carpeta del archivo (se crea si no existe)
+            particiones_en_memoria (int): Particiones leídas que se guardan en el caché
+        """
+        self.directorio = directorio
+        self.ruta_particiones = os.path.join(directorio, ARCHIVO_PARTICIONES)
+        # mes_cierre -> {'ventas', 'id_min', 'id_max', 'fecha_min', 'fecha_max', 'revision', 'caja'}
+        self.particiones = {}
+        self.revision = 0
+        self._cache = CacheLRU(particiones_en_memoria)
+        self._cerrojo = threading.RLock()
+
+        os.makedirs(directorio, exist_ok=True)
+        if os.path.exists(self.ruta_particiones):
+            with open(self.ruta_particiones, encoding='utf-8') as f:
+                datos = json.load(f)
+            self.particiones = datos['particiones']
+            self.revision = datos['revision']
+
+        # Particiones guardadas antes de que llevaran su caja
+        sin_caja = [mes for mes, particion in self.particiones.items() if 'caja' not in particion]
+        for mes in sin_caja:
+            self.particiones[mes]['caja'] = resumir_caja(self.cargar(mes))
+        if sin_caja:
+            self._guardar_particiones()
+
+    def __len__(self):
+        return sum(particion['ventas'] for particion in self.particiones.values())
+
+    def _ruta(self, mes_cierre):
+        return os.path.join(self.directorio, f"{mes_cierre}.jsonl")
+
+    def _guardar_particiones(self):
+        contenido = json.dumps({'revision': self.revision, 'particiones': self.particiones},
+                               ensure_ascii=False, sort_keys=True).encode('utf-8')
+        _escribir_atomico(self.ruta_particiones, contenido)
+
+    def _describir(self, ventas_mes):
+        fechas = [venta['fecha'] for venta in ventas_mes if _es_fecha(venta['fecha'])]
+        self.revision += 1
+        return {
+            'ventas': len(ventas_mes),
+            'id_min': ventas_mes[0]['id'],
+            'id_max': ventas_mes[-1]['id'],
+            'fecha_min': min(fechas) if fechas else None,
+            'fecha_max': max(fechas) if fechas else None,
+            'revision': self.revision,
+            'caja': resumir_caja(ventas_mes)
+        }
+
+    def clave(self, mes_cierre):
+        """
+        Returns:
+            tuple: Identifica el contenido actual de la partición (cambia si
+                   se le agregan o quitan ventas), para cachear lo derivado
+        """
+        return (mes_cierre, self.particiones[mes_cierre]['revision'])
+
+    def archivar(self, mes_cierre, ventas_mes):
+        """
+        Agrega ventas a la partición de su mes y deja todo en disco
+        (las que ya estaban archivadas se ignoran)
+        Args:
+            mes_cierre (str): 'YYYY-MM'
+            ventas_mes (list): Ventas en forma de dict (a_dict())
+        Returns:
+            list: Las ventas que se agregaron
+        """
+        with self._cerrojo:
+            existentes = self.cargar(mes_cierre)
+            ids = {venta['id'] for venta in existentes}
+            nuevas = [venta for venta in ventas_mes if venta['id'] not in ids]
+            if not nuevas:
+                return []
+
+            with open(self._ruta(mes_cierre), 'ab') as f:
+                f.write(_lineas(nuevas))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._guardar_particion(mes_cierre, sorted(existentes + nuevas, key=_id_de))
+            return nuevas
+
+    def _guardar_particion(self, mes_cierre, ventas_mes):
+        self.particiones[mes_cierre] = self._describir(ventas_mes)
+        self._guardar_particiones()
+        self._cache.guardar(self.clave(mes_cierre), ([venta['id'] for venta in ventas_mes], ventas_mes))
+
+    def cargar(self, mes_cierre):
+        """
+        Ventas de una partición, ordenadas por ID (del caché o leídas con mmap)
+        Returns:
+            list: Ventas como dicts (vacía si el mes no tiene partición)
+        """
+        return self._particion(mes_cierre)[1]
+
+    def _particion(self, mes_cierre):
+        # (IDs, ventas) de la partición; los IDs aparte para buscar con bisect
+        if mes_cierre not in self.particiones:
+            return [], []
+        return self._cache.obtener_o_calcular(self.clave(mes_cierre), lambda: self._leer(mes_cierre))
+
+    def _leer(self, mes_cierre):
+        por_id = {}
+        with open(self._ruta(mes_cierre), 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                    for linea in iter(mapa.readline, b''):
+                        venta = json.loads(linea)
+                        # Si una venta quedó dos veces (caída a mitad de archivar) vale la última
+                        por_id[venta['id']] = venta
+        ids = sorted(por_id)
+        return ids, [por_id[id] for id in ids]
+
+    def caja(self, mes_cierre):
+        """
+        Returns:
+            dict: Cobrado por día de pago en la partición ('YYYY-MM-DD' ->
+                  [monto, cantidad de pagos]), sin leerla
+        """
+        return self.particiones[mes_cierre]['caja']
+
+    def meses(self):
+        """
+        Returns:
+            list: Meses con partición, del más viejo al más reciente
+        """
+        return sorted(self.particiones)
+
+    def meses_en_rango(self, fecha_inicio, fecha_fin):
+        """
+        Meses cuyas ventas pueden caer en un rango de fechas
+        Args:
+            fecha_inicio (str): 'YYYY-MM-DD'
+            fecha_fin (str): 'YYYY-MM-DD'
+        Returns:
+            list: Meses de cierre (según fecha_min / fecha_max de cada partición)
+        """
+        return [
+            mes for mes, particion in sorted(self.particiones.items())
+            if particion['fecha_min'] is not None
+            and particion['fecha_min'] <= fecha_fin and particion['fecha_max'] >= fecha_inicio
+        ]
+
+    def obtener(self, id):
+        """
+        Busca una venta archivada por ID; solo abre las particiones cuyo
+        rango de IDs la puede contener
+        Returns:
+            dict: La venta o None
+        """
+        mes, i = self._ubicar(id)
+        return None if mes is None else self.cargar(mes)[i]
+
+    def _ubicar(self, id):
+        # (mes, posición) de una venta archivada o (None, None)
+        for mes, particion in sorted(self.particiones.items()):
+            if particion['id_min'] <= id <= particion['id_max']:
+                ids = self._particion(mes)[0]
+                i = bisect_left(ids, id)
+                if i < len(ids) and ids[i] == id:
+                    return mes, i
+        return None, None
+
+    def recorrer(self, despues_de=None, meses=None):
+        """
+        Recorre las ventas archivadas en orden de ID
+        Args:
+            despues_de (int): Solo ventas con ID mayor
+            meses (list): Solo estas particiones (None = todas)
+        Yields:
+            dict: Cada venta archivada
+        """
+        meses = self.meses() if meses is None else [mes for mes in meses if mes in self.particiones]
+        if despues_de is not None:
+            meses = [mes for mes in meses if self.particiones[mes]['id_max'] > despues_de]
+
+        def de_la_particion(mes):
+            ids, ventas_mes = self._particion(mes)
+            desde = 0 if despues_de is None else bisect_right(ids, despues_de)
+            return iter(ventas_mes[desde:])
+
+        yield from merge(*(de_la_particion(mes) for mes in meses), key=_id_de)
+
+    def eliminar(self, id):
+        """
+        Quita una venta archivada reescribiendo su partición
+        Returns:
+            dict: La venta quitada o None si no estaba archivada
+        """
+        with self._cerrojo:
+            mes, i = self._ubicar(id)
+            if mes is None:
+                return None
+            ventas_mes = self.cargar(mes)
+            venta = ventas_mes[i]
+            restantes = ventas_mes[:i] + ventas_mes[i + 1:]
+
+            if restantes:
+                _escribir_atomico(self._ruta(mes), _lineas(restantes))
+                self._guardar_particion(mes, restantes)
+            else:
+                os.remove(self._ruta(mes))
+                del self.particiones[mes]
+                self.revision += 1
+                self._guardar_particiones()
+            return venta
@@ -0,0 +1,129 @@
+# ========================================
+# BENCHMARK DEL ARCHIVO POR MES - Carloszerpav
+# ========================================
+# Compara el mismo libro con y sin archivo de ventas excluidas (archivo.py):
+# memoria y tiempo del arranque, y cuánto cuesta consultar un mes cerrado
+# que hay que leer del disco frente a uno abierto
+#
+# - Se siembra un libro con el diario, un mes a la vez, cerrando cada mes
+#   al terminar (las ventas pagadas quedan excluidas en su mes)
+# - Se copia el directorio: uno arranca con VENTAS_ARCHIVAR=0 y el otro
+#   con el archivo (el primer arranque migra las excluidas)
+# - Cada medición corre en su propio proceso
+#
+# Uso:
+#   python benchmarks/bench_archivo.py 100000
+#   python benchmarks/bench_archivo.py 100000 500000 --muestras 20
+
+import argparse
+import gc
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from itertools import groupby
+
+from bench_suite import RAIZ, generar_libro, medir, memoria_residente
+
+
+def sembrar(total, directorio):
+    os.environ.update(VENTAS_ALMACEN='diario', VENTAS_DATOS=directorio, VENTAS_SYNC='nunca',
+                      VENTAS_ARCHIVAR='0', VENTAS_LOG='ERROR')
+    sys.path.insert(0, RAIZ)
+    import app
+
+    filas = sorted(generar_libro(total), key=lambda fila: fila['fecha'])
+    numero = 1
+    for mes, filas_mes in groupby(filas, key=lambda fila: fila['fecha'][:7]):
+        filas_mes = list(filas_mes)
+        app.importar_ventas(enumerate(filas_mes, numero))
+        numero += len(filas_mes)
+        año, mes = map(int, mes.split('-'))
+        app.cerrar_mes_estadisticas(mes, año)
+    app.almacen.compactar((venta.a_dict() for venta in app.ventas), app.contador_id)
+    app.almacen.cerrar()
+
+
+def arrancar(directorio, archivar, muestras, cola):
+    os.environ.update(VENTAS_ALMACEN='diario', VENTAS_DATOS=directorio, VENTAS_SYNC='nunca',
+                      VENTAS_ARCHIVAR='1' if archivar else '0', VENTAS_LOG='ERROR')
+    sys.path.insert(0, RAIZ)
+    gc.collect()
+    antes = memoria_residente()
+    inicio = time.perf_counter()
+    import app
+    tiempo_arranque = time.perf_counter() - inicio
+    gc.collect()
+    memoria = memoria_residente() - antes
+
+    cliente = app.app.test_client()
+    mes_viejo = ('2024-03-01', '2024-03-31')
+    mes_abierto = ('2025-12-01', '2025-12-31')
+
+    def una_vez(funcion):
+        inicio = time.perf_counter()
+        funcion()
+        return (time.perf_counter() - inicio) * 1e6
+
+    mediciones = {
+        # La primera consulta de un mes cerrado lee su partición del disco
+        'periodo mes cerrado (frío)': una_vez(lambda: app.obtener_estadisticas_por_periodo(*mes_viejo)),
+        'periodo mes cerrado': medir(muestras, lambda: app.obtener_estadisticas_por_periodo(*mes_viejo))['p50'],
+        'periodo mes abierto': medir(muestras, lambda: app.obtener_estadisticas_por_periodo(*mes_abierto))['p50'],
+        'periodo año': medir(max(3, muestras // 5), lambda: app.obtener_estadisticas_por_periodo('2024-01-01', '2024-12-31'))['p50'],
+        'GET /ventas-excluidas?mes (frío)': una_vez(lambda: cliente.get('/ventas-excluidas?mes=2024-03')),
+        'agregar_venta': medir(muestras, lambda: app.agregar_venta("Cliente bench", 120.0, 20.0, ['Zapatos'], '2025-12-10'))['p50']
+    }
+    app.almacen.cerrar()
+    cola.put({
+        'en_libro': len(app.ventas),
+        'archivadas': len(app.archivo) if app.archivo is not None else 0,
+        'tiempo_arranque': tiempo_arranque,
+        'memoria': memoria,
+        'mediciones': mediciones
+    })
+
+
+def en_proceso(contexto, objetivo, *args):
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=objetivo, args=(*args, cola))
+    proceso.start()
+    resultado = cola.get()
+    proceso.join()
+    return resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark del archivo de ventas excluidas')
+    parser.add_argument('totales', nargs='*', type=int, default=[100000])
+    parser.add_argument('--muestras', type=int, default=20, help='Muestras por medición')
+    args = parser.parse_args()
+
+    contexto = multiprocessing.get_context('spawn')
+    for total in args.totales:
+        base = tempfile.mkdtemp(prefix='ventas-archivo-')
+        sin_archivo = os.path.join(base, 'sin')
+        con_archivo = os.path.join(base, 'con')
+        proceso = contexto.Process(target=sembrar, args=(total, sin_archivo))
+        proceso.start()
+        proceso.join()
+        shutil.copytree(sin_archivo, con_archivo)
+
+        # Primer arranque con archivo: migra las excluidas (no se mide)
+        en_proceso(contexto, arrancar, con_archivo, True, 1)
+
+        resultados = {
+            'sin archivo': en_proceso(contexto, arrancar, sin_archivo, False, args.muestras),
+            'con archivo': en_proceso(contexto, arrancar, con_archivo, True, args.muestras)
+        }
+
+        print(f"\n📊 {total:,} ventas")
+        for nombre, resultado in resultados.items():
+            print(f"   {nombre}: {resultado['en_libro']:,} en el libro, {resultado['archivadas']:,} archivadas, "
+                  f"arranque {resultado['tiempo_arranque']:.2f}s, {resultado['memoria'] / 1e6:.0f} MB")
+            for medicion, us in resultado['mediciones'].items():
+                print(f"      {medicion:<34} {us:10.1f}µs")
+
+        shutil.rmtree(base, ignore_errors=True)
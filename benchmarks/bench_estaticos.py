@@ -0,0 +1,80 @@
+# ========================================
+# BENCHMARK DE ARCHIVOS ESTÁTICOS - Carloszerpav
+# ========================================
+# Compara servir los estáticos como antes (originales, sin comprimir y
+# revalidados en cada página) con los construidos por estaticos.py
+# (reducidos, con hash, .gz ya hecho y Cache-Control immutable)
+#
+# - Bytes de cada archivo: original, reducido y gzip
+# - Tiempo del servidor con el test client: original, con hash y con gzip
+# - Latencia estimada en el celular: primera visita (se bajan los archivos)
+#   y visitas siguientes (antes un 304 por archivo, ahora nada) con el RTT
+#   y el ancho de banda que se indiquen
+#
+# Uso (construye static/dist/ igual que el deploy):
+#   python benchmarks/bench_estaticos.py
+#   python benchmarks/bench_estaticos.py --rtt 300 --kbps 400 --muestras 500
+
+import argparse
+import os
+import sys
+
+from bench_suite import RAIZ, medir
+
+
+def bajar(total_bytes, rtt_ms, kbps):
+    # Los archivos van en paralelo: un RTT y todos los bytes por el mismo caño
+    return rtt_ms + total_bytes * 8 / kbps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de archivos estáticos")
+    parser.add_argument('--muestras', type=int, default=200, help="Pedidos por medición")
+    parser.add_argument('--rtt', type=float, default=150.0, help="Ida y vuelta de la red en ms")
+    parser.add_argument('--kbps', type=float, default=1600.0, help="Ancho de banda en kbit/s")
+    args = parser.parse_args()
+
+    os.environ['VENTAS_ALMACEN'] = 'memoria'
+    os.environ['VENTAS_LOG'] = 'ERROR'
+    sys.path.insert(0, RAIZ)
+    import estaticos
+    manifiesto = estaticos.construir(os.path.join(RAIZ, 'static'))
+    import app
+    cliente = app.app.test_client()
+
+    def pedir(url, **cabeceras):
+        def pedido():
+            respuesta = cliente.get(url, headers=cabeceras)
+            assert respuesta.status_code == 200, (url, respuesta.status_code)
+        return pedido
+
+    print("\n📦 Bytes por archivo")
+    totales = {'bytes': 0, 'reducido': 0, 'gzip': 0}
+    for archivo, datos in manifiesto.items():
+        for clave in totales:
+            totales[clave] += datos[clave]
+        print(f"   {archivo:<16} original {datos['bytes']:>8,} B   reducido {datos['reducido']:>8,} B   "
+              f"gzip {datos['gzip']:>7,} B  ({datos['gzip'] / datos['bytes']:.0%})")
+    print(f"   {'total':<16} original {totales['bytes']:>8,} B   reducido {totales['reducido']:>8,} B   "
+          f"gzip {totales['gzip']:>7,} B  ({totales['gzip'] / totales['bytes']:.0%})")
+
+    print(f"\n⏱️  Servidor (test client, {args.muestras} pedidos)")
+    for archivo, datos in manifiesto.items():
+        construido = f"/static/{datos['archivo']}"
+        for nombre, medicion in (
+                ('original', medir(args.muestras, pedir(f"/static/{archivo}"))),
+                ('con hash', medir(args.muestras, pedir(construido))),
+                ('con hash + gzip', medir(args.muestras, pedir(construido, **{'Accept-Encoding': 'gzip'})))):
+            print(f"   {archivo:<16} {nombre:<16} p50={medicion['p50']:>8.1f}µs  p99={medicion['p99']:>8.1f}µs")
+
+    archivos = len(manifiesto)
+    print(f"\n📱 Celular estimado (RTT {args.rtt:.0f} ms, {args.kbps:,.0f} kbit/s, {archivos} archivos)")
+    print(f"   primera visita   antes {bajar(totales['bytes'], args.rtt, args.kbps):>7.0f} ms   "
+          f"ahora {bajar(totales['gzip'], args.rtt, args.kbps):>7.0f} ms")
+    # Antes: Cache-Control no-cache, cada página revalida (304 sin cuerpo)
+    print(f"   cada visita más  antes {args.rtt:>7.0f} ms   ahora {0:>7.0f} ms "
+          f"(immutable: no se pregunta)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# ========================================
+# BENCHMARK DE MEMORIA POR VENTA - Carloszerpav
+# ========================================
+# Compara cuántos bytes ocupa cada venta en memoria:
+# - Antes: un dict de 13 claves con listas de rubros y de pagos
+# - Ahora: modelo.Venta (__slots__) + libro de pagos en arreglos
+#
+# Uso:
+#   python benchmarks/bench_memoria.py            (1.000.000 ventas)
+#   python benchmarks/bench_memoria.py 100000
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import random
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUBROS = ["Renacer", "Zapatos", "Cosméticos", "Ropa"]
+
+
+def generar_datos(total):
+    """
+    Genera ventas sintéticas en su forma dict (como las guardaba la app)
+    La mitad con un segundo pago y un cuarto ya cerradas
+    """
+    azar = random.Random(7)
+    for i in range(1, total + 1):
+        valor = round(azar.uniform(10, 500), 2)
+        abono = round(valor * 0.3, 2)
+        pagos = [{'id': 1, 'monto': abono, 'fecha': '2025-01-15 10:30', 'tipo': 'Pago inicial'}]
+        if i % 2 == 0:
+            pagos.append({'id': 2, 'monto': round(valor * 0.2, 2), 'fecha': '2025-02-01 18:05', 'tipo': 'Abono'})
+        abonado = round(sum(p['monto'] for p in pagos), 2)
+        cerrada = i % 4 == 0
+        yield {
+            'id': i,
+            'cliente': f"Cliente {i % 5000}",
+            'valor_total': valor,
+            'abono': valor if cerrada else abonado,
+            'saldo_pendiente': 0 if cerrada else round(valor - abonado, 2),
+            'rubros': azar.sample(RUBROS, azar.randint(1, 2)),
+            'fecha': f"2025-{azar.randint(1, 12):02d}-{azar.randint(1, 28):02d}",
+            'fecha_registro': '2025-01-15 10:30',
+            'estado': 'Cerrada' if cerrada else 'Activa',
+            'historial_pagos': pagos,
+            'total_pagos': len(pagos),
+            'incluida_en_estadisticas': True,
+            'mes_cierre': None
+        }
+
+
+def memoria_residente():
+    # RSS del proceso en bytes (Linux); tracemalloc pesa demasiado con 1M ventas
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def medir(total, variante, cola):
+    # Cada variante corre en su propio proceso para no heredar memoria de la otra
+    construir = construir_dicts if variante == 'dicts' else construir_compacto
+    gc.collect()
+    antes = memoria_residente()
+    libro = construir(total)
+    gc.collect()
+    despues = memoria_residente()
+    cola.put((despues - antes, len(libro)))
+
+
+def ejecutar(nombre, total, variante):
+    cola = multiprocessing.Queue()
+    proceso = multiprocessing.Process(target=medir, args=(total, variante, cola))
+    proceso.start()
+    usados, cantidad = cola.get()
+    proceso.join()
+    assert cantidad == total
+    bytes_por_venta = usados / total
+    print(f"   {nombre:<28} {bytes_por_venta:8.0f} bytes/venta  ({usados / 1e6:8.1f} MB)")
+    return bytes_por_venta
+
+
+def construir_dicts(total):
+    # Paso por JSON para tener cadenas propias por venta, como al leer de disco
+    return [json.loads(json.dumps(datos)) for datos in generar_datos(total)]
+
+
+def construir_compacto(total):
+    from modelo import LibroPagos, Venta, configurar_rubros
+    configurar_rubros(RUBROS)
+    libro = LibroPagos()
+    return [Venta.desde_dict(datos, libro) for datos in generar_datos(total)]
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, RAIZ)
+    parser = argparse.ArgumentParser(description='Memoria por venta: dicts vs modelo compacto')
+    parser.add_argument('total', nargs='?', type=int, default=1000000)
+    args = parser.parse_args()
+
+    print(f"\n📊 {args.total:,} ventas")
+    antes = ejecutar('dicts (antes)', args.total, 'dicts')
+    ahora = ejecutar('Venta + libro de pagos', args.total, 'compacto')
+    print(f"   reducción: {antes / ahora:.1f}x")
@@ -0,0 +1,92 @@
+# ========================================
+# BENCHMARK DEL DIARIO DE VENTAS - Carloszerpav
+# ========================================
+# Mide cuánto tarda cada escritura (agregar_venta / registrar_pago) con el
+# diario activo y cuánto tarda el arranque en frío (instantánea + cola)
+#
+# Uso:
+#   python benchmarks/bench_persistencia.py 100000 1000000
+#   python benchmarks/bench_persistencia.py 100000 --sync siempre
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(total, modo_sync):
+    directorio = tempfile.mkdtemp(prefix='ventas-bench-')
+    os.environ['VENTAS_ALMACEN'] = 'diario'
+    os.environ['VENTAS_DATOS'] = directorio
+    os.environ['VENTAS_SYNC'] = modo_sync
+
+    # Importo la app de cero para que arranque con el directorio temporal
+    sys.modules.pop('app', None)
+    sys.modules.pop('modelo', None)
+    import app
+
+    RUBROS = list(app.RUBROS)
+    azar = random.Random(42)
+    latencias_venta = []
+    latencias_pago = []
+
+    for i in range(total):
+        rubros = azar.sample(RUBROS, azar.randint(1, 2))
+        valor = round(azar.uniform(10, 500), 2)
+        inicio = time.perf_counter()
+        venta = app.agregar_venta(f"Cliente {i % 5000}", valor, round(valor * 0.3, 2), rubros, '2025-01-15')
+        latencias_venta.append(time.perf_counter() - inicio)
+
+        if i % 2 == 0:
+            inicio = time.perf_counter()
+            app.registrar_pago(venta['id'], round(venta['saldo_pendiente'] / 2, 2))
+            latencias_pago.append(time.perf_counter() - inicio)
+
+    app.almacen.cerrar()
+    tamano_diario = os.path.getsize(app.almacen.ruta_diario) if os.path.exists(app.almacen.ruta_diario) else 0
+    tamano_instantanea = os.path.getsize(app.almacen.ruta_instantanea) if os.path.exists(app.almacen.ruta_instantanea) else 0
+
+    # Libero el libro en memoria antes de medir el arranque
+    del venta, app
+    sys.modules.pop('app', None)
+    sys.modules.pop('modelo', None)
+
+    from modelo import LibroPagos, Venta, configurar_rubros
+    from persistencia import AlmacenDiario
+    configurar_rubros(RUBROS)
+    arranque = AlmacenDiario(directorio, modo_sync=modo_sync)
+    inicio = time.perf_counter()
+    libro = LibroPagos()
+    ventas, contador_id = arranque.cargar(lambda datos: Venta.desde_dict(datos, libro))
+    tiempo_arranque = time.perf_counter() - inicio
+    arranque.cerrar()
+    assert len(ventas) == total and contador_id == total + 1
+
+    print(f"\n📊 {total:,} ventas (sync={modo_sync})")
+    print(f"   agregar_venta   p50={percentil(latencias_venta, 0.5) * 1e6:8.1f}µs  p99={percentil(latencias_venta, 0.99) * 1e6:8.1f}µs")
+    print(f"   registrar_pago  p50={percentil(latencias_pago, 0.5) * 1e6:8.1f}µs  p99={percentil(latencias_pago, 0.99) * 1e6:8.1f}µs")
+    print(f"   instantánea {tamano_instantanea / 1e6:.1f} MB, cola del diario {tamano_diario / 1e6:.1f} MB ({arranque.operaciones_repetidas:,} operaciones)")
+    print(f"   arranque en frío {tiempo_arranque:.2f}s")
+
+    shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, RAIZ)
+    parser = argparse.ArgumentParser(description='Benchmark del diario de ventas')
+    parser.add_argument('totales', nargs='*', type=int, default=[100000, 1000000])
+    parser.add_argument('--sync', default='lote', choices=['siempre', 'lote', 'nunca'])
+    args = parser.parse_args()
+
+    for total in args.totales:
+        medir(total, args.sync)
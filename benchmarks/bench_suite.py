@@ -0,0 +1,278 @@
+# ========================================
+# SUITE DE BENCHMARKS - Carloszerpav
+# ========================================
+# Mide cómo escalan las funciones principales y las rutas con libros de
+# distintos tamaños, y compara contra una línea base guardada
+#
+# - Cada tamaño corre en su propio proceso con un libro sintético
+#   reproducible (misma semilla = mismas ventas)
+# - Rubros con pesos realistas, 1 a 3 por venta; historial de 0 a 4 pagos;
+#   parte de las ventas cerradas y parte ya excluidas por cierres anteriores
+# - Funciones directas y rutas de Flask con el test client: p50 / p99
+# - Memoria: RSS del proceso por venta después de sembrar el libro
+#
+# Uso:
+#   python benchmarks/bench_suite.py                       (1k, 10k, 100k)
+#   python benchmarks/bench_suite.py 1000 10000 100000 1000000
+#   python benchmarks/bench_suite.py --guardar             (nueva línea base)
+#   python benchmarks/bench_suite.py --comparar            (falla si hay regresiones)
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linea_base.json')
+
+# Peso de cada rubro en el libro sintético
+PESOS_RUBROS = {'Maquillaje': 35, 'Renacer': 15, 'Tendencia': 20, 'Accesorios': 18, 'Zapatos': 12}
+
+# Una medición es regresión si su p50 supera la base por este factor y
+# además por un margen absoluto (para no fallar por ruido en tiempos chicos)
+UMBRAL = 1.5
+MARGEN_US = 50.0
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def memoria_residente():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def generar_libro(total, semilla=2024):
+    """
+    Filas sintéticas en el formato de importacion.py
+    """
+    azar = random.Random(semilla)
+    rubros = list(PESOS_RUBROS)
+    pesos = list(PESOS_RUBROS.values())
+    clientes = [f"Cliente {i}" for i in range(max(50, total // 20))]
+    inicio = date(2024, 1, 1)
+
+    for _ in range(total):
+        elegidos = set(azar.choices(rubros, pesos, k=azar.choice((1, 1, 1, 2, 2, 3))))
+        valor = round(azar.lognormvariate(4.5, 0.6), 2)
+        fecha = inicio + timedelta(days=azar.randint(0, 729))
+        pagos = []
+        restante = valor
+        for numero in range(azar.choice((0, 1, 1, 2, 2, 3, 4))):
+            # Un cuarto de las ventas termina de pagarse
+            if numero and azar.random() < 0.25:
+                monto = round(restante, 2)
+            else:
+                monto = round(restante * azar.uniform(0.1, 0.5), 2)
+            if monto <= 0:
+                break
+            restante = round(restante - monto, 2)
+            pagos.append({'monto': monto, 'fecha': f"{fecha + timedelta(days=numero * 15)} 10:00"})
+            if restante <= 0:
+                break
+        yield {
+            'cliente': azar.choice(clientes),
+            'valor_total': valor,
+            'rubros': sorted(elegidos),
+            'fecha': fecha.isoformat(),
+            'pagos': pagos
+        }
+
+
+def medir(muestras, funcion):
+    tiempos = []
+    for _ in range(muestras):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1e6)
+    return {'p50': percentil(tiempos, 0.5), 'p99': percentil(tiempos, 0.99), 'muestras': muestras}
+
+
+def correr_tamano(total, muestras, cola):
+    os.environ['VENTAS_ALMACEN'] = 'memoria'
+    sys.path.insert(0, RAIZ)
+    # El log de la app (y el de requests lentas) no es parte de la medición
+    os.environ['VENTAS_LOG'] = 'ERROR'
+    import app
+
+    gc.collect()
+    antes = memoria_residente()
+    inicio = time.perf_counter()
+    resumen = app.importar_ventas(enumerate(generar_libro(total), 1))
+    tiempo_siembra = time.perf_counter() - inicio
+    assert resumen['importadas'] == total, resumen
+    # Un cierre en el medio: parte de las cerradas ya quedan excluidas
+    app.cerrar_mes_estadisticas(6, 2025)
+    gc.collect()
+    bytes_por_venta = (memoria_residente() - antes) / total
+
+    azar = random.Random(7)
+    cliente = app.app.test_client()
+    resultados = {}
+
+    def activa_al_azar():
+        while True:
+            venta = app.obtener_venta(azar.randint(1, app.contador_id - 1))
+            if venta is not None and venta['estado'] == 'Activa' and venta['saldo_pendiente'] > 1:
+                return venta
+
+    def agregar():
+        app.agregar_venta("Cliente bench", 120.0, 20.0, ['Maquillaje', 'Zapatos'], '2025-03-10')
+
+    def pagar():
+        venta = activa_al_azar()
+        app.registrar_pago(venta['id'], round(venta['saldo_pendiente'] / 4, 2))
+
+    def medir_cierre():
+        tiempos = []
+        for _ in range(max(5, muestras // 20)):
+            # Antes de cada cierre termino de pagar algunas ventas (fuera del tiempo)
+            for _ in range(20):
+                venta = activa_al_azar()
+                app.registrar_pago(venta['id'], venta['saldo_pendiente'])
+            inicio = time.perf_counter()
+            app.cerrar_mes_estadisticas(7, 2025)
+            tiempos.append((time.perf_counter() - inicio) * 1e6)
+        return {'p50': percentil(tiempos, 0.5), 'p99': percentil(tiempos, 0.99), 'muestras': len(tiempos)}
+
+    def ruta(url, metodo='get', **datos):
+        def pedir():
+            respuesta = getattr(cliente, metodo)(url, **datos)
+            assert respuesta.status_code < 400, (url, respuesta.status_code)
+        return pedir
+
+    venta_historial = activa_al_azar()['id']
+
+    resultados['agregar_venta'] = medir(muestras, agregar)
+    resultados['registrar_pago'] = medir(muestras, pagar)
+    resultados['obtener_estadisticas'] = medir(muestras, app.obtener_estadisticas)
+
+    def periodo_sin_cache(fecha_inicio, fecha_fin):
+        def calcular():
+            app.cache_periodos.limpiar()
+            app.obtener_estadisticas_por_periodo(fecha_inicio, fecha_fin)
+        return calcular
+
+    def periodo_tras_cambio():
+        # Una venta en otro mes no descarta el reporte de mayo
+        app.agregar_venta("Cliente bench", 120.0, 20.0, ['Zapatos'], '2025-07-10')
+        inicio = time.perf_counter()
+        app.obtener_estadisticas_por_periodo('2024-05-01', '2024-05-31')
+        return (time.perf_counter() - inicio) * 1e6
+
+    resultados['estadisticas_periodo_dia'] = medir(muestras, periodo_sin_cache('2024-05-15', '2024-05-15'))
+    resultados['estadisticas_periodo_mes'] = medir(muestras, periodo_sin_cache('2024-05-01', '2024-05-31'))
+    resultados['estadisticas_periodo_anio'] = medir(max(5, muestras // 10), periodo_sin_cache('2024-01-01', '2024-12-31'))
+    resultados['estadisticas_periodo_cache'] = medir(muestras, lambda: app.obtener_estadisticas_por_periodo('2024-05-01', '2024-05-31'))
+    tiempos = [periodo_tras_cambio() for _ in range(muestras)]
+    resultados['estadisticas_periodo_otro_cambio'] = {
+        'p50': percentil(tiempos, 0.5), 'p99': percentil(tiempos, 0.99), 'muestras': len(tiempos)}
+    resultados['cerrar_mes_estadisticas'] = medir_cierre()
+    resultados['buscar_ventas_activas'] = medir(muestras, lambda: app.buscar_ventas_activas('cliente 12', app.LIMITE_BUSQUEDA))
+    anio = (date(2024, 1, 1).toordinal(), date(2024, 12, 31).toordinal())
+    resultados['caja_periodo_anio'] = medir(muestras, lambda: app.obtener_caja(*anio))
+
+    pocas = max(5, muestras // 10)
+    resultados['GET /'] = medir(pocas, ruta('/'))
+    resultados['GET /buscar'] = medir(pocas, ruta('/buscar?q=cliente 12'))
+    resultados['GET /api/buscar'] = medir(muestras, ruta('/api/buscar?q=cliente 12'))
+    resultados['GET /api/estadisticas'] = medir(muestras, ruta('/api/estadisticas'))
+    resultados['GET /api/ventas?limite=100'] = medir(muestras, ruta('/api/ventas?limite=100&excluir=historial_pagos'))
+    resultados['GET /historial/<id>'] = medir(muestras, ruta(f'/historial/{venta_historial}'))
+    resultados['GET /api/caja/diaria'] = medir(muestras, ruta('/api/caja/diaria?desde=2024-05-01&hasta=2024-05-31'))
+    resultados['POST /estadisticas-periodo'] = medir(pocas, ruta('/estadisticas-periodo', 'post', data={
+        'fecha_inicio': '2024-05-01', 'fecha_fin': '2024-05-31'}))
+
+    cola.put({
+        'total': total,
+        'tiempo_siembra': tiempo_siembra,
+        'bytes_por_venta': bytes_por_venta,
+        'mediciones': resultados
+    })
+
+
+def imprimir(resultado):
+    print(f"\n📊 {resultado['total']:,} ventas  (siembra {resultado['tiempo_siembra']:.1f}s, "
+          f"{resultado['bytes_por_venta']:.0f} bytes/venta)")
+    for nombre, medicion in resultado['mediciones'].items():
+        print(f"   {nombre:<32} p50={medicion['p50']:10.1f}µs  p99={medicion['p99']:10.1f}µs")
+
+
+def comparar(resultados, base, umbral):
+    regresiones = []
+    for resultado in resultados:
+        base_tamano = base.get(str(resultado['total']))
+        if not base_tamano:
+            print(f"   (sin línea base para {resultado['total']:,} ventas)")
+            continue
+        for nombre, medicion in resultado['mediciones'].items():
+            anterior = base_tamano['mediciones'].get(nombre)
+            if anterior is None:
+                continue
+            if medicion['p50'] > anterior['p50'] * umbral and medicion['p50'] - anterior['p50'] > MARGEN_US:
+                regresiones.append(f"{resultado['total']:,} / {nombre}: p50 {anterior['p50']:.1f}µs -> {medicion['p50']:.1f}µs")
+        if resultado['bytes_por_venta'] > base_tamano['bytes_por_venta'] * umbral:
+            regresiones.append(f"{resultado['total']:,} / memoria: {base_tamano['bytes_por_venta']:.0f} -> "
+                               f"{resultado['bytes_por_venta']:.0f} bytes/venta")
+    return regresiones
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Suite de benchmarks del registro de ventas')
+    parser.add_argument('totales', nargs='*', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--muestras', type=int, default=200, help='Muestras por medición')
+    parser.add_argument('--guardar', action='store_true', help='Guardar los resultados como línea base')
+    parser.add_argument('--comparar', action='store_true', help='Fallar si hay regresiones contra la línea base')
+    parser.add_argument('--umbral', type=float, default=UMBRAL, help='Factor de tolerancia sobre el p50 base')
+    parser.add_argument('--linea-base', default=LINEA_BASE)
+    args = parser.parse_args()
+
+    contexto = multiprocessing.get_context('spawn')
+    resultados = []
+    for total in args.totales:
+        cola = contexto.Queue()
+        proceso = contexto.Process(target=correr_tamano, args=(total, args.muestras, cola))
+        proceso.start()
+        resultado = cola.get()
+        proceso.join()
+        imprimir(resultado)
+        resultados.append(resultado)
+
+    if args.guardar:
+        base = {}
+        if os.path.exists(args.linea_base):
+            with open(args.linea_base, encoding='utf-8') as f:
+                base = json.load(f)
+        for resultado in resultados:
+            base[str(resultado['total'])] = {
+                'bytes_por_venta': round(resultado['bytes_por_venta'], 1),
+                'mediciones': {
+                    nombre: {'p50': round(m['p50'], 1), 'p99': round(m['p99'], 1)}
+                    for nombre, m in resultado['mediciones'].items()
+                }
+            }
+        with open(args.linea_base, 'w', encoding='utf-8') as f:
+            json.dump(base, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\n💾 Línea base guardada en {os.path.relpath(args.linea_base)}")
+
+    if args.comparar:
+        if not os.path.exists(args.linea_base):
+            print("\n❌ No hay línea base, corre primero con --guardar")
+            sys.exit(1)
+        with open(args.linea_base, encoding='utf-8') as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresiones (umbral x{args.umbral}):")
+            for regresion in regresiones:
+                print(f"   - {regresion}")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones contra la línea base (umbral x{args.umbral})")
@@ -0,0 +1,217 @@
+# ========================================
+# PRUEBA DE CARGA CON GUNICORN - Carloszerpav
+# ========================================
+# Levanta la app con gunicorn de verdad y le manda requests desde varios
+# clientes a la vez, con cada perfil de servidor, sobre el mismo libro
+#
+# - sync: un worker sync, un request a la vez (lo único seguro antes del
+#   cerrojo de lectura y escritura)
+# - gthread: gunicorn.conf.py (hilos, ver cerrojos.py)
+# - Mezcla de lo que hace el celular: página principal, tabla, buscador,
+#   estadísticas, reportes, alguna exportación completa (lenta) y ventas
+#   y pagos por la API JSON
+# - Reporta requests por segundo, p50 / p99 de todo y de las lecturas
+#   rápidas (lo que se traba detrás de una página lenta), errores y si
+#   las estadísticas siguen cuadrando al final
+# - --pestanas N deja N pestañas abiertas en / (conectadas a /api/eventos)
+#   durante la prueba: con sync cada una ocupa el único worker
+#
+# Uso:
+#   python benchmarks/carga_gunicorn.py
+#   python benchmarks/carga_gunicorn.py --ventas 50000 --clientes 32 --segundos 30
+#   python benchmarks/carga_gunicorn.py --perfiles gthread --pestanas 4
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_suite import RAIZ, generar_libro, percentil
+
+# gunicorn lee ./gunicorn.conf.py aunque no se indique: sync lleva
+# --threads 1 para que no lo cambie a gthread
+PERFILES = {
+    'sync': ['-w', '1', '--worker-class', 'sync', '--threads', '1'],
+    'gthread': ['-c', os.path.join(RAIZ, 'gunicorn.conf.py')],
+}
+
+# (peso, nombre, método, ruta); {id} es una venta activa al azar
+MEZCLA = [
+    (20, 'pagina', 'GET', '/'),
+    (15, 'tabla', 'GET', '/api/ventas/activas?orden=saldo_pendiente&dir=desc&formato=html&pagina={pagina}'),
+    (15, 'buscar', 'GET', '/api/buscar?q={cliente}'),
+    (10, 'estadisticas', 'GET', '/api/estadisticas'),
+    (5, 'periodo', 'GET', '/api/estadisticas-periodo?fecha_inicio=2024-{mes}-01&fecha_fin=2025-06-30'),
+    (5, 'historial', 'GET', '/historial/{id}'),
+    (1, 'exportar', 'GET', '/api/exportar/ventas?formato=csv'),
+    (15, 'venta', 'POST', '/api/ventas'),
+    (14, 'pago', 'POST', '/api/ventas/{id}/pagos'),
+]
+LECTURAS_RAPIDAS = ('tabla', 'buscar', 'estadisticas', 'historial')
+
+# Segundos que un cliente espera una respuesta (después cuenta como error)
+TIEMPO_LIMITE = 30
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def pedir(conexion, metodo, ruta, cuerpo=None):
+    cabeceras = {'Content-Type': 'application/json'} if cuerpo is not None else {}
+    conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+    respuesta = conexion.getresponse()
+    datos = respuesta.read()
+    return respuesta.status, datos
+
+
+def esperar_servidor(puerto, proceso, limite=120):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if proceso.poll() is not None:
+            raise RuntimeError("gunicorn terminó al arrancar")
+        try:
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=5)
+            estado, _ = pedir(conexion, 'GET', '/api/estadisticas')
+            conexion.close()
+            if estado == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn no respondió a tiempo")
+
+
+def sembrar(puerto, total):
+    """
+    Carga el libro por /api/ventas/bulk y devuelve los IDs activos
+    """
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=600)
+    filas = list(generar_libro(total))
+    for inicio in range(0, total, 10000):
+        estado, datos = pedir(conexion, 'POST', '/api/ventas/bulk?formato=json',
+                              json.dumps(filas[inicio:inicio + 10000]))
+        assert estado == 200, (estado, datos[:200])
+    estado, datos = pedir(conexion, 'GET', '/api/ventas?estado=Activa&campos=id')
+    conexion.close()
+    return [venta['id'] for venta in json.loads(datos)], sorted({fila['cliente'] for fila in filas})
+
+
+def cliente(puerto, fin, activas, clientes, semilla, resultados):
+    azar = random.Random(semilla)
+    pesos = [peso for peso, *_ in MEZCLA]
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=TIEMPO_LIMITE)
+    while time.monotonic() < fin:
+        _, nombre, metodo, ruta = azar.choices(MEZCLA, pesos)[0]
+        ruta = ruta.format(id=azar.choice(activas), cliente=azar.choice(clientes)[:9].replace(' ', '+'),
+                           pagina=azar.randint(1, 20), mes=f"{azar.randint(1, 12):02d}")
+        cuerpo = None
+        if nombre == 'venta':
+            cuerpo = json.dumps({'cliente': azar.choice(clientes), 'valor_total': 120, 'abono': 20,
+                                 'rubros': ['Maquillaje'], 'fecha': '2025-06-15'})
+        elif nombre == 'pago':
+            cuerpo = json.dumps({'monto': 1})
+        inicio = time.perf_counter()
+        try:
+            estado, _ = pedir(conexion, metodo, ruta, cuerpo)
+        except (OSError, http.client.HTTPException):
+            conexion.close()
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=TIEMPO_LIMITE)
+            estado = None
+        resultados.append((nombre, estado, (time.perf_counter() - inicio) * 1000))
+    conexion.close()
+
+
+def pestana(puerto, fin):
+    # Una pestaña con / abierto: escucha /api/eventos hasta el final
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=TIEMPO_LIMITE)
+    try:
+        conexion.request('GET', '/api/eventos')
+        respuesta = conexion.getresponse()
+        while time.monotonic() < fin and respuesta.fp.readline():
+            pass
+    except (OSError, http.client.HTTPException):
+        pass
+    finally:
+        conexion.close()
+
+
+def correr_perfil(perfil, args):
+    directorio = tempfile.mkdtemp(prefix='carga_')
+    puerto = puerto_libre()
+    entorno = dict(os.environ, VENTAS_DATOS=directorio, VENTAS_ALMACEN=args.almacen, VENTAS_LOG='ERROR', PORT=str(puerto))
+    comando = [sys.executable, '-m', 'gunicorn', *PERFILES[perfil], '-b', f'127.0.0.1:{puerto}', 'app:app']
+    proceso = subprocess.Popen(comando, cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL)
+    try:
+        esperar_servidor(puerto, proceso)
+        activas, clientes = sembrar(puerto, args.ventas)
+
+        resultados = []
+        fin = time.monotonic() + args.segundos
+        hilos = [threading.Thread(target=cliente, args=(puerto, fin, activas, clientes, numero, resultados))
+                 for numero in range(args.clientes)]
+        for _ in range(args.pestanas):
+            threading.Thread(target=pestana, args=(puerto, fin), daemon=True).start()
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=600)
+        _, datos = pedir(conexion, 'GET', '/api/estadisticas/verificar')
+        conexion.close()
+        consistente = json.loads(datos)['consistente']
+    finally:
+        proceso.terminate()
+        proceso.wait()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    tiempos = [ms for _, _, ms in resultados]
+    rapidas = [ms for nombre, _, ms in resultados if nombre in LECTURAS_RAPIDAS]
+    errores = sum(1 for _, estado, _ in resultados if estado is None or estado >= 500)
+    return {
+        'requests': len(resultados),
+        'por_segundo': len(resultados) / duracion,
+        'p50': percentil(tiempos, 0.5),
+        'p99': percentil(tiempos, 0.99),
+        'rapidas_p50': percentil(rapidas, 0.5) if rapidas else 0.0,
+        'rapidas_p99': percentil(rapidas, 0.99) if rapidas else 0.0,
+        'errores': errores,
+        'consistente': consistente
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con gunicorn")
+    parser.add_argument('--perfiles', nargs='+', choices=list(PERFILES), default=list(PERFILES))
+    parser.add_argument('--ventas', type=int, default=20000, help="Ventas del libro inicial")
+    parser.add_argument('--clientes', type=int, default=16, help="Clientes a la vez")
+    parser.add_argument('--segundos', type=float, default=15.0, help="Duración de cada perfil")
+    parser.add_argument('--pestanas', type=int, default=0, help="Pestañas abiertas con /api/eventos")
+    parser.add_argument('--almacen', default='diario', choices=('diario', 'sqlite'))
+    args = parser.parse_args()
+
+    print(f"\n🔥 {args.ventas:,} ventas, {args.clientes} clientes, {args.pestanas} pestañas, "
+          f"{args.segundos:.0f} s por perfil ({args.almacen})")
+    for perfil in args.perfiles:
+        r = correr_perfil(perfil, args)
+        print(f"   {perfil:<8} {r['por_segundo']:>8.1f} req/s  ({r['requests']:,} requests)  "
+              f"p50={r['p50']:>7.1f}ms  p99={r['p99']:>8.1f}ms  "
+              f"lecturas rápidas p50={r['rapidas_p50']:>7.1f}ms  p99={r['rapidas_p99']:>8.1f}ms  "
+              f"errores={r['errores']}  {'✅ cuadra' if r['consistente'] else '❌ NO cuadra'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# ========================================
+# PRUEBA DE ESTRÉS DEL ALMACÉN SQLITE - Carloszerpav
+# ========================================
+# Simula varios workers de gunicorn (procesos) con varios hilos cada uno,
+# todos agregando ventas y registrando pagos sobre la misma base
+#
+# Al final comprueba que:
+# - No se repitió ni se perdió ningún ID
+# - Cada venta cuadra: abono = suma de pagos, saldo = valor - abono
+# - Ningún pago dejó un saldo negativo
+# - Cada proceso terminó con el mismo libro que la base
+#
+# Uso:
+#   python benchmarks/estres_sqlite.py
+#   python benchmarks/estres_sqlite.py --procesos 4 --hilos 8 --operaciones 500
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def trabajador(numero, directorio, hilos, operaciones, barrera, cola):
+    os.environ['VENTAS_ALMACEN'] = 'sqlite'
+    os.environ['VENTAS_DATOS'] = directorio
+    sys.path.insert(0, RAIZ)
+    import app
+
+    agregadas = []
+    pagos = []
+    rechazados = []
+    fallas = []
+
+    def hilo(semilla):
+        try:
+            operar(semilla)
+        except Exception as e:
+            fallas.append(f"{type(e).__name__}: {e}")
+
+    def operar(semilla):
+        azar = random.Random(semilla)
+        for _ in range(operaciones):
+            if azar.random() < 0.5 or app.contador_id == 1:
+                valor = round(azar.uniform(10, 500), 2)
+                venta = app.agregar_venta(f"Cliente {azar.randint(1, 300)}", valor, round(valor * 0.2, 2),
+                                          azar.sample(app.RUBROS, azar.randint(1, 2)), '2025-01-15')
+                agregadas.append(venta['id'])
+            else:
+                # Pago sobre una venta cualquiera, puede ser de otro proceso;
+                # el saldo se lee antes de la escritura a propósito para
+                # provocar carreras que el almacén tiene que rechazar
+                app.sincronizar_ventas()
+                venta = app.obtener_venta(azar.randint(1, app.contador_id - 1))
+                if venta is None or venta['estado'] == 'Cerrada':
+                    continue
+                monto = round(venta['saldo_pendiente'] * azar.choice((0.3, 0.5, 1.0)), 2) or venta['saldo_pendiente']
+                try:
+                    app.registrar_pago(venta['id'], monto)
+                    pagos.append(venta['id'])
+                except ValueError:
+                    rechazados.append(venta['id'])
+
+    inicio = time.perf_counter()
+    grupo = [threading.Thread(target=hilo, args=(numero * 1000 + i,)) for i in range(hilos)]
+    for t in grupo:
+        t.start()
+    for t in grupo:
+        t.join()
+    duracion = time.perf_counter() - inicio
+
+    # Espero a que todos terminen de escribir y me pongo al día
+    barrera.wait()
+    app.sincronizar_ventas()
+    libro = (len(app.ventas), round(sum(venta['abono'] for venta in app.ventas), 2), app.verificar_estadisticas())
+    cola.put((numero, agregadas, len(pagos), len(rechazados), duracion, libro, fallas))
+
+
+def resumen_proceso(directorio, cola_resumen):
+    # Proceso nuevo que arranca con la base final: su libro debe cuadrar
+    os.environ['VENTAS_ALMACEN'] = 'sqlite'
+    os.environ['VENTAS_DATOS'] = directorio
+    sys.path.insert(0, RAIZ)
+    import app
+    cola_resumen.put((len(app.ventas), app.contador_id, app.verificar_estadisticas(),
+                      round(sum(venta['abono'] for venta in app.ventas), 2)))
+
+
+def comprobar_base(ruta):
+    conexion = sqlite3.connect(ruta)
+    errores = []
+
+    ids = [fila[0] for fila in conexion.execute("SELECT id FROM ventas ORDER BY id")]
+    if ids != list(range(1, len(ids) + 1)):
+        errores.append("Los IDs no son consecutivos")
+
+    consulta = """
+        SELECT v.id, v.valor_total, v.abono, v.saldo_pendiente, v.estado,
+               COALESCE(SUM(p.monto), 0), COUNT(p.numero), COALESCE(MAX(p.numero), 0)
+        FROM ventas v LEFT JOIN pagos p ON p.venta_id = v.id
+        GROUP BY v.id
+    """
+    for id, valor, abono, saldo, estado, suma, cantidad, maximo in conexion.execute(consulta):
+        if abs(abono - suma) > 1e-6:
+            errores.append(f"Venta {id}: abono {abono} != suma de pagos {suma}")
+        if saldo < -1e-9:
+            errores.append(f"Venta {id}: saldo negativo {saldo}")
+        if estado == 'Activa' and abs(valor - abono - saldo) > 1e-6:
+            errores.append(f"Venta {id}: valor - abono != saldo")
+        if estado == 'Cerrada' and saldo != 0:
+            errores.append(f"Venta {id}: cerrada con saldo {saldo}")
+        if cantidad != maximo:
+            errores.append(f"Venta {id}: números de pago repetidos o salteados")
+
+    total_abonado = conexion.execute("SELECT ROUND(SUM(abono), 2) FROM ventas").fetchone()[0] or 0
+    conexion.close()
+    return ids, errores, total_abonado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Estrés de agregar/pago con varios procesos e hilos sobre SQLite')
+    parser.add_argument('--procesos', type=int, default=4)
+    parser.add_argument('--hilos', type=int, default=4)
+    parser.add_argument('--operaciones', type=int, default=300, help='Operaciones por hilo')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='ventas-estres-')
+    contexto = multiprocessing.get_context('spawn')
+    cola = contexto.Queue()
+    barrera = contexto.Barrier(args.procesos)
+
+    inicio = time.perf_counter()
+    procesos = [
+        contexto.Process(target=trabajador, args=(n, directorio, args.hilos, args.operaciones, barrera, cola))
+        for n in range(args.procesos)
+    ]
+    for proceso in procesos:
+        proceso.start()
+
+    resultados = [cola.get() for _ in procesos]
+    for proceso in procesos:
+        proceso.join()
+    duracion = time.perf_counter() - inicio
+
+    ids, errores, total_abonado = comprobar_base(os.path.join(directorio, 'ventas.db'))
+    agregadas = [id for _, ids_proceso, *_ in resultados for id in ids_proceso]
+    if sorted(agregadas) != ids:
+        errores.append(f"IDs devueltos ({len(agregadas)}) != IDs en la base ({len(ids)})")
+    for numero, _, _, _, _, (cantidad, abonado, diferencias), fallas in resultados:
+        errores.extend(f"Proceso {numero}: {falla}" for falla in fallas)
+        if cantidad != len(ids) or abs(abonado - total_abonado) > 0.01 or diferencias:
+            errores.append(f"Proceso {numero}: {cantidad} ventas, abonado {abonado} (base: {len(ids)}, {total_abonado})")
+
+    cola_resumen = contexto.Queue()
+    arranque = contexto.Process(target=resumen_proceso, args=(directorio, cola_resumen))
+    arranque.start()
+    cantidad, contador_id, diferencias, abonado = cola_resumen.get()
+    arranque.join()
+    if cantidad != len(ids) or contador_id != len(ids) + 1:
+        errores.append(f"Proceso nuevo ve {cantidad} ventas (contador {contador_id}), la base tiene {len(ids)}")
+    if diferencias:
+        errores.append(f"Estadísticas incrementales no cuadran: {diferencias[:3]}")
+    if abs(abonado - total_abonado) > 0.01:
+        errores.append(f"Abonado en memoria {abonado} != abonado en la base {total_abonado}")
+
+    total_pagos = sum(r[2] for r in resultados)
+    total_rechazados = sum(r[3] for r in resultados)
+    operaciones = len(agregadas) + total_pagos
+    print(f"\n📊 {args.procesos} procesos × {args.hilos} hilos × {args.operaciones} operaciones")
+    print(f"   {len(agregadas):,} ventas, {total_pagos:,} pagos, {total_rechazados:,} pagos rechazados por saldo")
+    print(f"   {operaciones / duracion:,.0f} escrituras/s ({duracion:.1f}s)")
+
+    shutil.rmtree(directorio, ignore_errors=True)
+
+    if errores:
+        print(f"❌ {len(errores)} problemas:")
+        for error in errores[:20]:
+            print(f"   - {error}")
+        sys.exit(1)
+    print("✅ Libro consistente en todos los procesos")
@@ -0,0 +1,138 @@
+# ========================================
+# BÚSQUEDA DE CLIENTES - Carloszerpav
+# ========================================
+# Índice invertido de n-gramas sobre el nombre del cliente para que el
+# buscador no recorra todas las ventas en cada tecla
+#
+# - Sin acentos y sin mayúsculas: "Maria" encuentra "María"
+# - Guardo bigramas y trigramas de cada nombre distinto (los clientes se
+#   repiten mucho, así el índice crece con los nombres y no con las ventas)
+# - Se registra como índice derivado del VentaStore, solo con las ventas
+#   activas (que es lo que muestra el buscador)
+
+import unicodedata
+from functools import lru_cache
+
+
+# Los nombres de clientes se repiten mucho: guardo los ya plegados
+@lru_cache(maxsize=8192)
+def plegar_texto(texto):
+    """
+    Quita acentos y pasa a minúsculas para comparar nombres
+    Args:
+        texto (str): Texto original (ej. 'José Núñez')
+    Returns:
+        str: Texto plegado (ej. 'jose nunez')
+    """
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_acentos.casefold().split())
+
+
+def ngramas(texto, n):
+    return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+
+class IndiceBusqueda:
+    """
+    Índice de n-gramas del cliente -> ventas
+
+    Una búsqueda de 3+ letras intersecta las listas de sus trigramas y
+    solo confirma la subcadena en los nombres candidatos; con 2 letras
+    usa bigramas. Con 1 letra se recorren los nombres distintos.
+    """
+
+    def __init__(self, estado='Activa'):
+        self.estado = estado
+        # Campos de los que depende (ver VentaStore.actualizar)
+        self.campos = frozenset(('estado', 'cliente'))
+        self._ventas_por_nombre = {}
+        self._nombres_por_gramo = {}
+
+    def __len__(self):
+        return sum(len(ventas) for ventas in self._ventas_por_nombre.values())
+
+    def _gramos(self, nombre):
+        return ngramas(nombre, 2) | ngramas(nombre, 3)
+
+    def agregar(self, venta):
+        if self.estado is not None and venta['estado'] != self.estado:
+            return
+        nombre = plegar_texto(venta['cliente'])
+        ventas = self._ventas_por_nombre.get(nombre)
+        if ventas is None:
+            ventas = self._ventas_por_nombre[nombre] = {}
+            for gramo in self._gramos(nombre):
+                self._nombres_por_gramo.setdefault(gramo, set()).add(nombre)
+        ventas[venta['id']] = venta
+
+    def quitar(self, venta):
+        nombre = plegar_texto(venta['cliente'])
+        ventas = self._ventas_por_nombre.get(nombre)
+        if ventas is None or ventas.pop(venta['id'], None) is None:
+            return
+        if not ventas:
+            del self._ventas_por_nombre[nombre]
+            for gramo in self._gramos(nombre):
+                nombres = self._nombres_por_gramo.get(gramo)
+                if nombres is not None:
+                    nombres.discard(nombre)
+                    if not nombres:
+                        del self._nombres_por_gramo[gramo]
+
+    def _nombres_candidatos(self, consulta):
+        if len(consulta) == 1:
+            return list(self._ventas_por_nombre)
+
+        gramos = ngramas(consulta, 3) if len(consulta) >= 3 else {consulta}
+        listas = []
+        for gramo in gramos:
+            nombres = self._nombres_por_gramo.get(gramo)
+            if not nombres:
+                return []
+            listas.append(nombres)
+        # Intersecto empezando por la lista más corta
+        listas.sort(key=len)
+        candidatos = set(listas[0])
+        for nombres in listas[1:]:
+            candidatos &= nombres
+            if not candidatos:
+                break
+        return candidatos
+
+    def nombres(self, consulta):
+        """
+        Clientes distintos cuyo nombre contiene la consulta
+        Args:
+            consulta (str): Texto a buscar (sin importar acentos ni mayúsculas)
+        Returns:
+            list: Nombres plegados encontrados, en orden alfabético
+        """
+        consulta = plegar_texto(consulta)
+        if not consulta:
+            return []
+        return sorted(nombre for nombre in self._nombres_candidatos(consulta) if consulta in nombre)
+
+    def buscar(self, consulta, limite=None):
+        """
+        Busca ventas cuyo cliente contenga la consulta
+        Args:
+            consulta (str): Texto a buscar (sin importar acentos ni mayúsculas)
+            limite (int): Máximo de ventas a devolver (None = todas)
+        Returns:
+            tuple: (ventas encontradas ordenadas por ID, total de coincidencias)
+        """
+        consulta = plegar_texto(consulta)
+        if not consulta:
+            return [], 0
+
+        encontradas = []
+        for nombre in self._nombres_candidatos(consulta):
+            if consulta in nombre:
+                encontradas.extend(self._ventas_por_nombre[nombre].values())
+
+        encontradas.sort(key=lambda venta: venta['id'])
+        total = len(encontradas)
+        if limite is not None:
+            encontradas = encontradas[:limite]
+        return encontradas, total
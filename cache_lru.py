@@ -0,0 +1,105 @@
+# ========================================
+# CACHÉ LRU ACOTADO - Carloszerpav
+# ========================================
+# Guarda resultados ya calculados (HTML renderizado, reportes) para no
+# rehacerlos mientras el libro no cambie
+#
+# - Las claves llevan la versión del VentaStore: cuando el libro cambia,
+#   las entradas viejas ya no se piden y salen solas por LRU
+# - Acotado por cantidad de entradas y, si se indica, por tamaño total
+#   (una tabla de 100.000 ventas renderizada pesa varios MB)
+# - Seguro entre hilos; cuenta aciertos y fallos para /metrics
+# - descartar() quita entradas por clave cuando lo que cambió se sabe
+#   (ej. los reportes de los períodos que incluyen un día modificado)
+
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Diccionario acotado que descarta primero lo usado hace más tiempo
+    """
+
+    def __init__(self, maximo_entradas, maximo_tamano=None, medir=len):
+        """
+        Args:
+            maximo_entradas (int): Entradas como máximo
+            maximo_tamano (int): Suma máxima de medir(valor) (None = sin límite)
+            medir (callable): Tamaño de un valor (por defecto len)
+        """
+        self.maximo_entradas = maximo_entradas
+        self.maximo_tamano = maximo_tamano
+        self.medir = medir
+        self.tamano = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()   # clave -> (valor, tamaño)
+        self._cerrojo = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obtener(self, clave):
+        """
+        Returns:
+            El valor guardado o None si no está
+        """
+        with self._cerrojo:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, clave, valor):
+        """
+        Guarda un valor; si no entra en el límite de tamaño no se guarda
+        """
+        tamano = self.medir(valor) if self.maximo_tamano is not None else 0
+        if self.maximo_tamano is not None and tamano > self.maximo_tamano:
+            return
+        with self._cerrojo:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.tamano -= anterior[1]
+            self._entradas[clave] = (valor, tamano)
+            self.tamano += tamano
+            while len(self._entradas) > self.maximo_entradas or (
+                    self.maximo_tamano is not None and self.tamano > self.maximo_tamano):
+                _, (_, tamano_viejo) = self._entradas.popitem(last=False)
+                self.tamano -= tamano_viejo
+
+    def obtener_o_calcular(self, clave, calcular):
+        """
+        Devuelve el valor guardado o lo calcula y lo guarda
+        Args:
+            clave: Clave (debe incluir todo lo que cambia el resultado)
+            calcular (callable): Función sin argumentos que arma el valor
+        """
+        valor = self.obtener(clave)
+        if valor is None:
+            valor = calcular()
+            self.guardar(clave, valor)
+        return valor
+
+    def descartar(self, condicion):
+        """
+        Quita las entradas cuya clave cumple una condición
+        Args:
+            condicion (callable): Recibe la clave; True = quitarla
+        Returns:
+            int: Cuántas entradas se quitaron
+        """
+        with self._cerrojo:
+            claves = [clave for clave in self._entradas if condicion(clave)]
+            for clave in claves:
+                self.tamano -= self._entradas.pop(clave)[1]
+            return len(claves)
+
+    def limpiar(self):
+        with self._cerrojo:
+            self._entradas.clear()
+            self.tamano = 0
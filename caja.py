@@ -0,0 +1,131 @@
+# ========================================
+# LIBRO DE CAJA - Carloszerpav
+# ========================================
+# Los pagos solo existían dentro del historial de cada venta, y el reporte
+# por período suma el abono a la fecha de la VENTA: para saber cuánta plata
+# entró esta semana había que recorrer todas las ventas y todos sus pagos
+#
+# - El libro de pagos (modelo.LibroPagos) ya es un registro append-only
+#   de cada pago: venta_id, monto, fecha y tipo, con su posición como ID
+# - LibroCaja es el índice por fecha de PAGO encima de ese libro: total
+#   cobrado y cantidad de pagos por día, con un Fenwick para sumar
+#   cualquier rango en O(log n) y los días ordenados para la serie diaria
+# - Las ventas archivadas (archivo.py) no están en el libro de pagos:
+#   cada partición guarda su caja por día (resumir_caja) y se suma aparte
+
+from datetime import date
+
+from estadisticas import SumasPorDia, limpiar_total, ordinal_de_fecha
+
+# Medidas por día: monto cobrado y cantidad de pagos
+MONTO, CANTIDAD = 0, 1
+
+
+def resumir_caja(ventas):
+    """
+    Caja por día de pago de ventas en forma de dict (las del archivo)
+    Args:
+        ventas (iterable): Ventas con 'historial_pagos'
+    Returns:
+        dict: 'YYYY-MM-DD' -> [monto, cantidad de pagos]
+    """
+    caja = {}
+    for venta in ventas:
+        for pago in venta['historial_pagos']:
+            fecha = str(pago['fecha'])[:10]
+            if ordinal_de_fecha(fecha) is None:
+                continue
+            dia = caja.setdefault(fecha, [0.0, 0])
+            dia[MONTO] += pago['monto']
+            dia[CANTIDAD] += 1
+    return caja
+
+
+class LibroCaja:
+    """
+    Cobrado por día de pago, sobre las posiciones del libro de pagos
+
+    Se registra como índice derivado del VentaStore: una venta nueva suma
+    sus pagos y una eliminada los resta. Un pago nuevo de una venta que ya
+    está llega por agregar_pago() (actualizar() no lo toca: campos vacío)
+    """
+
+    # Ningún cambio de campos mueve la caja (ver VentaStore.actualizar)
+    campos = frozenset()
+
+    def __init__(self, libro):
+        """
+        Args:
+            libro (LibroPagos): El libro de pagos de las ventas del almacén
+        """
+        self._libro = libro
+        # día -> [monto, cantidad]
+        self._sumas = SumasPorDia(2, CANTIDAD)
+
+    def _sumar_posicion(self, posicion, signo):
+        dia = self._libro.dia(posicion)
+        if dia is not None:
+            self._sumas.sumar(dia, (self._libro.monto[posicion] * signo, signo))
+
+    def agregar(self, venta):
+        for posicion in venta.posiciones_pagos:
+            self._sumar_posicion(posicion, 1)
+
+    def quitar(self, venta):
+        for posicion in venta.posiciones_pagos:
+            self._sumar_posicion(posicion, -1)
+
+    def agregar_pago(self, posicion):
+        """
+        Suma un pago recién registrado en el libro de pagos
+        Args:
+            posicion (int): Lo que devolvió Venta.agregar_pago()
+        """
+        self._sumar_posicion(posicion, 1)
+
+    def sumar_caja(self, caja, signo=1):
+        """
+        Suma (o resta) la caja de ventas que no están en el libro
+        Args:
+            caja (dict): Lo que devuelve resumir_caja()
+            signo (int): 1 para sumar, -1 para restar
+        """
+        for fecha, (monto, cantidad) in caja.items():
+            self._sumas.sumar(ordinal_de_fecha(fecha), (monto * signo, cantidad * signo))
+
+    def cobrado(self, inicio, fin):
+        """
+        Total cobrado en un rango de días (ambos incluidos), en O(log n)
+        Args:
+            inicio (int): Ordinal del primer día
+            fin (int): Ordinal del último día
+        Returns:
+            dict: {'cobrado', 'pagos'}
+        """
+        total = self._sumas.total(inicio, fin)
+        return {'cobrado': limpiar_total(total[MONTO]), 'pagos': int(round(total[CANTIDAD]))}
+
+    def serie(self, inicio, fin):
+        """
+        Cobrado por día en un rango (solo los días con pagos)
+        Returns:
+            list: [{'fecha', 'cobrado', 'pagos'}] en orden de fecha
+        """
+        return [
+            {'fecha': date.fromordinal(dia).isoformat(), 'cobrado': limpiar_total(vector[MONTO]), 'pagos': vector[CANTIDAD]}
+            for dia, vector in self._sumas.dias(inicio, fin)
+        ]
+
+    def primer_dia(self):
+        """
+        Returns:
+            int: Primer día con pagos (None si no hay)
+        """
+        return self._sumas.primer_dia()
+
+    def ultimo_dia(self):
+        """
+        Returns:
+            int: Último día con pagos (None si no hay)
+        """
+        return self._sumas.ultimo_dia()
@@ -0,0 +1,87 @@
+# ========================================
+# REGISTRO DE CAMBIOS - Carloszerpav
+# ========================================
+# Desde el celular cada vista bajaba la página completa aunque no hubiera
+# cambiado nada, y sin señal no se podía trabajar
+#
+# - RegistroCambios: índice derivado del VentaStore que anota la versión
+#   del último cambio de cada venta (agregada, pagada, cerrada, eliminada)
+# - Las eliminadas quedan como lápida (solo el ID), así quien tiene una
+#   copia local sabe qué borrar
+# - /api/cambios?desde=<versión> devuelve solo lo que cambió después de
+#   esa versión, por páginas y en orden de versión
+# - Las versiones son de este índice y de este proceso: al reiniciar o
+#   recargar el libro empiezan una base nueva y quien venga con una
+#   versión anterior recibe el libro completo
+
+from bisect import bisect_right
+
+
+class RegistroCambios:
+    """
+    Versión del último cambio de cada venta, recorrible desde una versión
+    """
+
+    def __init__(self, base=0):
+        """
+        Args:
+            base (int): Versión de arranque; lo que ya estaba en el libro
+                queda después de ella (al recargar se sigue desde la anterior)
+        """
+        self.base = base
+        self.version = base
+        # ID -> versión de su último cambio (también las eliminadas)
+        self._versiones = {}
+        self._eliminadas = set()
+        # (versión, ID) de cada cambio en orden; los que ya tienen un cambio
+        # más nuevo quedan como huecos y se limpian cuando son la mitad
+        self._log_versiones = []
+        self._log_ids = []
+        self._huecos = 0
+
+    def __len__(self):
+        return len(self._versiones)
+
+    def _anotar(self, id):
+        self.version += 1
+        if id in self._versiones:
+            self._huecos += 1
+        self._versiones[id] = self.version
+        self._log_versiones.append(self.version)
+        self._log_ids.append(id)
+        if self._huecos > len(self._log_ids) // 2:
+            vigentes = [(version, id) for version, id in zip(self._log_versiones, self._log_ids)
+                        if self._versiones[id] == version]
+            # Listas nuevas: quien esté recorriendo las viejas no se entera
+            self._log_versiones = [version for version, _ in vigentes]
+            self._log_ids = [id for _, id in vigentes]
+            self._huecos = 0
+
+    def agregar(self, venta):
+        self._eliminadas.discard(venta['id'])
+        self._anotar(venta['id'])
+
+    def quitar(self, venta):
+        # En actualizar() viene seguido de agregar(): la lápida dura poco
+        self._eliminadas.add(venta['id'])
+        self._anotar(venta['id'])
+
+    def recorrer(self, desde, limite):
+        """
+        Cambios posteriores a una versión, en orden de versión
+        Args:
+            desde (int): Versión que ya tiene el cliente
+            limite (int): Cambios como máximo
+        Returns:
+            tuple: ([(versión, ID, eliminada)], hay_mas)
+        """
+        versiones, ids = self._log_versiones, self._log_ids
+        cambios = []
+        for posicion in range(bisect_right(versiones, desde), len(versiones)):
+            version, id = versiones[posicion], ids[posicion]
+            if self._versiones.get(id) != version:
+                continue
+            if len(cambios) == limite:
+                return cambios, True
+            cambios.append((version, id, id in self._eliminadas))
+        return cambios, False
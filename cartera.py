@@ -0,0 +1,204 @@
+# ========================================
+# CUENTAS POR COBRAR - Carloszerpav
+# ========================================
+# Para cobrar necesito saber cuánto me debe cada cliente y desde cuándo,
+# y lo único que tenía era el buscador sobre las ventas activas
+#
+# - CarteraClientes: índice derivado del VentaStore con las ventas activas
+#   con saldo, agrupadas por cliente (nombre sin acentos ni mayúsculas)
+# - Por cliente: saldo, ventas abiertas y la fecha de la más vieja
+# - Los clientes ordenados por saldo (ListaOrdenada): los mayores deudores
+#   salen en O(log n + cantidad)
+# - Saldo por día de venta (SumasPorDia): la antigüedad de toda la cartera
+#   (0-30, 31-60, 61-90 y más de 90 días) son cuatro sumas de rango
+
+from bisect import bisect_left, insort
+from datetime import date
+
+from busqueda import plegar_texto
+from estadisticas import SumasPorDia, limpiar_total, ordinal_de_fecha
+from indice_orden import BITS_ID, ListaOrdenada
+
+# Tramos de antigüedad: (nombre, días desde, días hasta); None = sin límite
+TRAMOS_ANTIGUEDAD = (('0-30', None, 30), ('31-60', 31, 60), ('61-90', 61, 90), ('90+', 91, None))
+
+# Una venta con fecha inválida cuenta como la más vieja (en el último tramo)
+DIA_SIN_FECHA = 0
+
+# Medidas por día: saldo y cantidad de ventas
+SALDO, CANTIDAD = 0, 1
+
+
+def _centavos(valor):
+    return round(float(valor or 0) * 100)
+
+
+def _tramo(dias):
+    for nombre, desde, hasta in TRAMOS_ANTIGUEDAD:
+        if hasta is None or dias <= hasta:
+            return nombre
+
+
+class CarteraClientes:
+    """
+    Saldo pendiente por cliente y por antigüedad de las ventas activas
+    """
+
+    # Campos de los que depende (ver VentaStore.actualizar)
+    campos = frozenset(('cliente', 'saldo_pendiente', 'estado', 'fecha'))
+
+    def __init__(self):
+        # nombre plegado -> {'cliente', 'saldo', 'ventas': {id: (día, saldo)}, 'orden': [día<<BITS_ID | id]}
+        self._clientes = {}
+        # (saldo en centavos, nombre plegado) de cada cliente con deuda
+        self._por_saldo = ListaOrdenada()
+        self._por_dia = SumasPorDia(2, CANTIDAD)
+        # [saldo, ventas] de las ventas sin fecha válida (fuera del Fenwick)
+        self._sin_fecha = [0.0, 0]
+        self.total_pendiente = 0.0
+        self.ventas_abiertas = 0
+
+    def __len__(self):
+        return len(self._clientes)
+
+    def _abierta(self, venta):
+        return venta['estado'] == 'Activa' and venta['saldo_pendiente'] > 0
+
+    def _cambiar(self, venta, signo):
+        clave = plegar_texto(venta['cliente'])
+        dia = ordinal_de_fecha(venta['fecha']) or DIA_SIN_FECHA
+        saldo = venta['saldo_pendiente']
+
+        cliente = self._clientes.get(clave)
+        if cliente is None:
+            if signo < 0:
+                return
+            cliente = self._clientes[clave] = {'cliente': venta['cliente'], 'saldo': 0.0, 'ventas': {}, 'orden': []}
+        else:
+            self._por_saldo.quitar((_centavos(cliente['saldo']), clave))
+
+        entrada = (dia << BITS_ID) | venta['id']
+        if signo > 0:
+            cliente['ventas'][venta['id']] = (dia, saldo)
+            insort(cliente['orden'], entrada)
+        else:
+            cliente['ventas'].pop(venta['id'], None)
+            del cliente['orden'][bisect_left(cliente['orden'], entrada)]
+        cliente['saldo'] += saldo * signo
+
+        if cliente['ventas']:
+            self._por_saldo.agregar((_centavos(cliente['saldo']), clave))
+        else:
+            del self._clientes[clave]
+
+        if dia == DIA_SIN_FECHA:
+            self._sin_fecha[SALDO] += saldo * signo
+            self._sin_fecha[CANTIDAD] += signo
+        else:
+            self._por_dia.sumar(dia, (saldo * signo, signo))
+        self.total_pendiente += saldo * signo
+        self.ventas_abiertas += signo
+
+    def agregar(self, venta):
+        if self._abierta(venta):
+            self._cambiar(venta, 1)
+
+    def quitar(self, venta):
+        if self._abierta(venta):
+            self._cambiar(venta, -1)
+
+    def resumen(self, hoy):
+        """
+        Args:
+            hoy (int): Ordinal del día desde el que se cuenta la antigüedad
+        Returns:
+            dict: {'total_pendiente', 'ventas_abiertas', 'clientes', 'antiguedad'}
+        """
+        return {
+            'total_pendiente': limpiar_total(self.total_pendiente),
+            'ventas_abiertas': self.ventas_abiertas,
+            'clientes': len(self._clientes),
+            'antiguedad': self.antiguedad(hoy)
+        }
+
+    def antiguedad(self, hoy):
+        """
+        Saldo de toda la cartera por tramo de antigüedad, en O(log n)
+        Args:
+            hoy (int): Ordinal del día desde el que se cuenta
+        Returns:
+            dict: tramo -> {'saldo', 'ventas'}
+        """
+        tramos = {}
+        for nombre, desde, hasta in TRAMOS_ANTIGUEDAD:
+            # Las ventas con fecha futura cuentan en el primer tramo
+            fin = hoy - desde if desde is not None else self._por_dia.ultimo_dia() or hoy
+            inicio = hoy - hasta if hasta is not None else self._por_dia.primer_dia() or hoy
+            total = self._por_dia.total(inicio, fin)
+            if hasta is None:
+                total = [a + b for a, b in zip(total, self._sin_fecha)]
+            tramos[nombre] = {'saldo': limpiar_total(total[SALDO]), 'ventas': int(round(total[CANTIDAD]))}
+        return tramos
+
+    def _resumen_cliente(self, cliente, hoy):
+        tramos = {nombre: {'saldo': 0.0, 'ventas': 0} for nombre, _, _ in TRAMOS_ANTIGUEDAD}
+        for dia, saldo in cliente['ventas'].values():
+            tramo = tramos[_tramo(hoy - dia) if dia != DIA_SIN_FECHA else TRAMOS_ANTIGUEDAD[-1][0]]
+            tramo['saldo'] += saldo
+            tramo['ventas'] += 1
+        for tramo in tramos.values():
+            tramo['saldo'] = limpiar_total(tramo['saldo'])
+
+        mas_vieja = cliente['orden'][0] >> BITS_ID
+        return {
+            'cliente': cliente['cliente'],
+            'saldo_pendiente': limpiar_total(cliente['saldo']),
+            'ventas_abiertas': len(cliente['ventas']),
+            'venta_mas_antigua': date.fromordinal(mas_vieja).isoformat() if mas_vieja != DIA_SIN_FECHA else None,
+            'dias_mas_antigua': hoy - mas_vieja if mas_vieja != DIA_SIN_FECHA else None,
+            'antiguedad': tramos
+        }
+
+    def deudores(self, cantidad, hoy):
+        """
+        Los clientes que más deben, de mayor a menor saldo
+        Args:
+            cantidad (int): Cuántos clientes
+            hoy (int): Ordinal del día para la antigüedad
+        Returns:
+            list: Resumen de cada cliente (ver cliente())
+        """
+        return [self._resumen_cliente(self._clientes[clave], hoy)
+                for _, clave in self._por_saldo.rebanada(0, cantidad, descendente=True)]
+
+    def cliente(self, nombre, hoy):
+        """
+        Args:
+            nombre (str): Nombre del cliente (sin importar acentos ni mayúsculas)
+            hoy (int): Ordinal del día para la antigüedad
+        Returns:
+            dict: {'cliente', 'saldo_pendiente', 'ventas_abiertas',
+                   'venta_mas_antigua', 'dias_mas_antigua', 'antiguedad'}
+                  o None si el cliente no debe nada
+        """
+        cliente = self._clientes.get(plegar_texto(nombre))
+        return self._resumen_cliente(cliente, hoy) if cliente is not None else None
+
+    def clientes(self, nombres, hoy, limite=None):
+        """
+        Lo que deben varios clientes (ej. los que encontró el buscador), de
+        mayor a menor saldo; solo arma el resumen de los que se devuelven
+        Args:
+            nombres (iterable): Nombres de clientes (sin importar acentos ni mayúsculas)
+            hoy (int): Ordinal del día para la antigüedad
+            limite (int): Máximo de clientes a devolver (None = todos)
+        Returns:
+            tuple: (resumen de cada cliente (ver cliente()), total de los
+                    que deben algo)
+        """
+        claves = {plegar_texto(nombre) for nombre in nombres}
+        con_saldo = sorted(
+            ((-_centavos(self._clientes[clave]['saldo']), clave) for clave in claves if clave in self._clientes))
+        if limite is not None:
+            con_saldo = con_saldo[:limite]
+        return [self._resumen_cliente(self._clientes[clave], hoy) for _, clave in con_saldo], len(claves & self._clientes.keys())
@@ -0,0 +1,105 @@
+# ========================================
+# CERROJO DE LECTURA Y ESCRITURA - Carloszerpav
+# ========================================
+# Con gthread cada worker atiende varios requests en hilos a la vez. Las
+# escrituras ya iban de a una, pero las lecturas no esperaban a nadie:
+# una página podía armarse con un pago a medio aplicar (el VentaStore
+# quita la venta de sus índices y la vuelve a agregar) o recorrer un
+# diccionario mientras otro hilo le agregaba una venta
+#
+# - Muchos lectores a la vez; un escritor solo, sin lectores en curso
+# - Cuando un escritor espera, los lectores nuevos esperan detrás de él
+#   (una ráfaga de lecturas no deja sin escribir)
+# - Reentrante: el escritor puede volver a escribir o leer lo suyo, y un
+#   lector puede volver a leer aunque haya un escritor esperando
+# - Escribir dentro de una lectura se bloquearía para siempre (dos hilos
+#   esperando que el otro suelte su lectura): falla con RuntimeError
+
+import threading
+from contextlib import contextmanager
+
+
+class CerrojoLecturaEscritura:
+    """
+    Muchos lectores o un solo escritor, con preferencia para el escritor
+    """
+
+    def __init__(self):
+        self._condicion = threading.Condition(threading.Lock())
+        self._lectores = 0       # lecturas en curso (con las reentradas)
+        self._escritor = None    # ID del hilo que escribe
+        self._escrituras = 0     # reentradas del escritor
+        self._esperando = 0      # escritores esperando su turno
+        self._local = threading.local()
+        # Veces que alguien tuvo que esperar (para /metrics)
+        self.esperas_lectura = 0
+        self.esperas_escritura = 0
+
+    def _mis_lecturas(self):
+        return getattr(self._local, 'lecturas', 0)
+
+    def adquirir_lectura(self):
+        hilo = threading.get_ident()
+        with self._condicion:
+            if self._escritor != hilo and not self._mis_lecturas() and (self._escritor is not None or self._esperando):
+                self.esperas_lectura += 1
+                while self._escritor is not None or self._esperando:
+                    self._condicion.wait()
+            self._lectores += 1
+            self._local.lecturas = self._mis_lecturas() + 1
+
+    def soltar_lectura(self):
+        with self._condicion:
+            self._lectores -= 1
+            self._local.lecturas -= 1
+            if not self._lectores:
+                self._condicion.notify_all()
+
+    def adquirir_escritura(self):
+        hilo = threading.get_ident()
+        with self._condicion:
+            if self._escritor == hilo:
+                self._escrituras += 1
+                return
+            if self._mis_lecturas():
+                raise RuntimeError("No se puede escribir dentro de una lectura")
+            if self._escritor is not None or self._lectores:
+                self.esperas_escritura += 1
+                self._esperando += 1
+                try:
+                    while self._escritor is not None or self._lectores:
+                        self._condicion.wait()
+                finally:
+                    self._esperando -= 1
+            self._escritor = hilo
+            self._escrituras = 1
+
+    def soltar_escritura(self):
+        with self._condicion:
+            self._escrituras -= 1
+            if not self._escrituras:
+                self._escritor = None
+                self._condicion.notify_all()
+
+    @contextmanager
+    def leyendo(self):
+        """
+        Sección de lectura: corre a la par de otras lecturas, nunca en
+        medio de una escritura
+        """
+        self.adquirir_lectura()
+        try:
+            yield
+        finally:
+            self.soltar_lectura()
+
+    @contextmanager
+    def escribiendo(self):
+        """
+        Sección de escritura: un hilo a la vez y sin lecturas en curso
+        """
+        self.adquirir_escritura()
+        try:
+            yield
+        finally:
+            self.soltar_escritura()
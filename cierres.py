@@ -0,0 +1,143 @@
+# ========================================
+# CIERRES MENSUALES - Carloszerpav
+# ========================================
+# El cierre mensual buscaba en todo el libro las ventas cerradas que seguían
+# en las estadísticas, y de un mes ya cerrado solo quedaba la etiqueta
+# mes_cierre en cada venta
+#
+# - PendientesCierre: índice derivado del VentaStore con las ventas
+#   cerradas que todavía están incluidas; una venta entra apenas el pago
+#   la cierra, así el cierre solo toca esas
+# - Cada cierre guarda un resumen congelado del mes (ventas, valor, abonado
+#   y desglose por rubro) que el almacén persiste: consultar un mes cerrado
+#   es buscar una clave, sin recorrer ventas
+
+from estadisticas import limpiar_total
+
+
+class PendientesCierre:
+    """
+    Ventas cerradas que aún están incluidas en estadísticas, por ID
+    """
+
+    # Campos de los que depende (ver VentaStore.actualizar)
+    campos = frozenset(('estado', 'incluida_en_estadisticas'))
+
+    def __init__(self):
+        self._ventas = {}
+
+    def __len__(self):
+        return len(self._ventas)
+
+    def agregar(self, venta):
+        if venta['estado'] == 'Cerrada' and venta['incluida_en_estadisticas']:
+            self._ventas[venta['id']] = venta
+
+    def quitar(self, venta):
+        self._ventas.pop(venta['id'], None)
+
+    def ventas(self):
+        """
+        Returns:
+            list: Las ventas pendientes de cierre, ordenadas por ID
+        """
+        return [self._ventas[id] for id in sorted(self._ventas)]
+
+
+def _rubros_vacios(rubros):
+    return {rubro: {'cantidad': 0, 'valor_total': 0.0, 'abonado': 0.0} for rubro in rubros}
+
+
+def resumir_cierre(ventas_cerradas, rubros, mes_cierre, fecha_cierre):
+    """
+    Resumen congelado de las ventas que excluye un cierre
+    Args:
+        ventas_cerradas (list): Ventas que salen de las estadísticas
+        rubros (list): Rubros del catálogo (todos aparecen en el resumen)
+        mes_cierre (str): 'YYYY-MM'
+        fecha_cierre (str): 'YYYY-MM-DD HH:MM'
+    Returns:
+        dict: {'mes_cierre', 'fecha_cierre', 'cierres', 'ventas',
+               'valor_total', 'abonado', 'por_rubro'}
+    """
+    por_rubro = _rubros_vacios(rubros)
+    valor_total = abonado = 0.0
+    for venta in ventas_cerradas:
+        valor_total += venta['valor_total']
+        abonado += venta['abono']
+        for rubro in venta['rubros']:
+            if rubro in por_rubro:
+                por_rubro[rubro]['cantidad'] += 1
+                por_rubro[rubro]['valor_total'] += venta['valor_total']
+                por_rubro[rubro]['abonado'] += venta['abono']
+
+    for datos in por_rubro.values():
+        datos['valor_total'] = limpiar_total(datos['valor_total'])
+        datos['abonado'] = limpiar_total(datos['abonado'])
+
+    return {
+        'mes_cierre': mes_cierre,
+        'fecha_cierre': fecha_cierre,
+        'cierres': 1,
+        'ventas': len(ventas_cerradas),
+        'valor_total': limpiar_total(valor_total),
+        'abonado': limpiar_total(abonado),
+        'por_rubro': por_rubro
+    }
+
+
+def acumular_cierre(cierres, resumen):
+    """
+    Suma el resumen de un cierre al de su mes (un mes se puede cerrar
+    varias veces). No modifica el resumen anterior: lo reemplaza
+    Args:
+        cierres (dict): mes_cierre -> resumen
+        resumen (dict): Lo que devolvió resumir_cierre()
+    Returns:
+        dict: El resumen acumulado del mes
+    """
+    anterior = cierres.get(resumen['mes_cierre'])
+    if anterior is None:
+        cierres[resumen['mes_cierre']] = resumen
+        return resumen
+
+    por_rubro = {rubro: dict(datos) for rubro, datos in anterior['por_rubro'].items()}
+    for rubro, datos in resumen['por_rubro'].items():
+        acumulado = por_rubro.setdefault(rubro, {'cantidad': 0, 'valor_total': 0.0, 'abonado': 0.0})
+        acumulado['cantidad'] += datos['cantidad']
+        acumulado['valor_total'] = limpiar_total(acumulado['valor_total'] + datos['valor_total'])
+        acumulado['abonado'] = limpiar_total(acumulado['abonado'] + datos['abonado'])
+
+    acumulado = dict(
+        anterior,
+        fecha_cierre=resumen['fecha_cierre'],
+        cierres=anterior['cierres'] + resumen['cierres'],
+        ventas=anterior['ventas'] + resumen['ventas'],
+        valor_total=limpiar_total(anterior['valor_total'] + resumen['valor_total']),
+        abonado=limpiar_total(anterior['abonado'] + resumen['abonado']),
+        por_rubro=por_rubro
+    )
+    cierres[resumen['mes_cierre']] = acumulado
+    return acumulado
+
+
+def reconstruir_cierres(cierres, ventas_excluidas, rubros):
+    """
+    Arma el resumen de los meses cerrados que no tienen uno guardado (los
+    que se cerraron antes de que existieran los resúmenes) con sus ventas
+    excluidas. Esos resúmenes llevan 'reconstruido': True
+    Args:
+        cierres (dict): mes_cierre -> resumen (se completa en el lugar)
+        ventas_excluidas (iterable): Ventas con incluida_en_estadisticas False
+        rubros (list): Rubros del catálogo
+    Returns:
+        int: Cuántos meses se reconstruyeron
+    """
+    por_mes = {}
+    for venta in ventas_excluidas:
+        mes_cierre = venta['mes_cierre']
+        if mes_cierre and mes_cierre not in cierres:
+            por_mes.setdefault(mes_cierre, []).append(venta)
+    for mes_cierre, ventas_mes in por_mes.items():
+        cierres[mes_cierre] = dict(resumir_cierre(ventas_mes, rubros, mes_cierre, None), reconstruido=True)
+    return len(por_mes)
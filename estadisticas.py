@@ -0,0 +1,330 @@
+# ========================================
+# ESTADÍSTICAS INCREMENTALES - Carloszerpav
+# ========================================
+# En vez de recorrer todas las ventas cada vez que abro el dashboard,
+# aquí mantengo los contadores y totales al día con cada cambio
+# (se registra como índice derivado en el VentaStore)
+#
+# También dejo el cálculo completo desde cero para poder comparar
+# y detectar si algo se desincronizó
+#
+# Para las sumas por día de un rango (caja, cartera) dejo un árbol de
+# Fenwick que crece solo, así un rango cuesta O(log n + días del rango)
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from functools import lru_cache
+
+# Redondeo de los totales: quita el ruido de sumar y restar floats
+# (ej. 150.00000000000003 o -1e-14) sin tocar los centavos
+DECIMALES_TOTALES = 9
+
+
+def limpiar_total(valor):
+    """
+    Redondea un total acumulado y evita el -0.0
+    """
+    return round(valor, DECIMALES_TOTALES) + 0.0
+
+
+@lru_cache(maxsize=8192)
+def ordinal_de_fecha(fecha):
+    """
+    Convierte 'YYYY-MM-DD' al número de día (date.toordinal)
+    Las fechas se repiten muchísimo, por eso van en caché
+    Returns:
+        int: El ordinal del día o None si la fecha no es válida
+    """
+    try:
+        return datetime.strptime(fecha, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+class EstadisticasIncrementales:
+    """
+    Contadores y totales por rubro mantenidos como deltas
+
+    Cada cambio de una venta llega como quitar(venta_antes) seguido de
+    agregar(venta_despues), así obtener() es O(rubros) sin importar
+    cuántas ventas haya.
+    """
+
+    def __init__(self, rubros):
+        self.rubros = list(rubros)
+        self.reiniciar()
+
+    def reiniciar(self):
+        """
+        Deja todos los contadores en cero
+        """
+        self.total_ventas = 0
+        self.total_ventas_activas = 0
+        self.total_ventas_cerradas = 0
+        self.total_ventas_excluidas = 0
+        self.total_valor = 0.0
+        self.total_abonado = 0.0
+        self.total_pendiente = 0.0
+        self.por_rubro = {
+            rubro: {'cantidad': 0, 'valor_total': 0.0, 'abonado': 0.0, 'pendiente': 0.0}
+            for rubro in self.rubros
+        }
+
+    def agregar(self, venta):
+        self._aplicar(venta, 1)
+
+    def quitar(self, venta):
+        self._aplicar(venta, -1)
+
+    def _aplicar(self, venta, signo):
+        self.total_ventas += signo
+
+        if not venta.get('incluida_en_estadisticas', True):
+            self.total_ventas_excluidas += signo
+            return
+
+        valor = venta['valor_total'] * signo
+        abono = venta['abono'] * signo
+        pendiente = venta['saldo_pendiente'] * signo
+
+        if venta['estado'] == 'Activa':
+            self.total_ventas_activas += signo
+            self.total_valor += valor
+            self.total_abonado += abono
+            self.total_pendiente += pendiente
+            if self.total_ventas_activas == 0:
+                # Sin ventas activas los totales son exactamente cero
+                self.total_valor = self.total_abonado = self.total_pendiente = 0.0
+        elif venta['estado'] == 'Cerrada':
+            self.total_ventas_cerradas += signo
+
+        for rubro in set(venta['rubros']):
+            stats = self.por_rubro.get(rubro)
+            if stats is None:
+                continue
+            stats['cantidad'] += signo
+            if stats['cantidad'] == 0:
+                stats['valor_total'] = stats['abonado'] = stats['pendiente'] = 0.0
+                continue
+            stats['valor_total'] += valor
+            stats['abonado'] += abono
+            stats['pendiente'] += pendiente
+
+    def obtener(self):
+        """
+        Returns:
+            dict: Las estadísticas con la misma forma que obtener_estadisticas()
+        """
+        return {
+            'total_ventas_activas': self.total_ventas_activas,
+            'total_ventas_cerradas': self.total_ventas_cerradas,
+            'total_ventas_excluidas': self.total_ventas_excluidas,
+            'total_ventas': self.total_ventas,
+            'total_valor': limpiar_total(self.total_valor),
+            'total_abonado': limpiar_total(self.total_abonado),
+            'total_pendiente': limpiar_total(self.total_pendiente),
+            'por_rubro': {
+                rubro: {
+                    'cantidad': stats['cantidad'],
+                    'valor_total': limpiar_total(stats['valor_total']),
+                    'abonado': limpiar_total(stats['abonado']),
+                    'pendiente': limpiar_total(stats['pendiente'])
+                }
+                for rubro, stats in self.por_rubro.items()
+            }
+        }
+
+
+def calcular_estadisticas(ventas, rubros):
+    """
+    Calcula las estadísticas desde cero recorriendo todas las ventas
+    (el cálculo original, lo uso como referencia para verificar)
+    Args:
+        ventas (iterable): Todas las ventas
+        rubros (list): Los rubros a desglosar
+    Returns:
+        dict: Las estadísticas con la misma forma que obtener_estadisticas()
+    """
+    ventas = list(ventas)
+    ventas_en_estadisticas = [venta for venta in ventas if venta.get('incluida_en_estadisticas', True)]
+    ventas_activas = [venta for venta in ventas_en_estadisticas if venta['estado'] == 'Activa']
+    ventas_cerradas = [venta for venta in ventas_en_estadisticas if venta['estado'] == 'Cerrada']
+
+    estadisticas_rubros = {}
+    for rubro in rubros:
+        ventas_rubro = [venta for venta in ventas_en_estadisticas if rubro in venta['rubros']]
+        estadisticas_rubros[rubro] = {
+            'cantidad': len(ventas_rubro),
+            'valor_total': sum(venta['valor_total'] for venta in ventas_rubro),
+            'abonado': sum(venta['abono'] for venta in ventas_rubro),
+            'pendiente': sum(venta['saldo_pendiente'] for venta in ventas_rubro)
+        }
+
+    return {
+        'total_ventas_activas': len(ventas_activas),
+        'total_ventas_cerradas': len(ventas_cerradas),
+        'total_ventas_excluidas': len(ventas) - len(ventas_en_estadisticas),
+        'total_ventas': len(ventas),
+        'total_valor': sum(venta['valor_total'] for venta in ventas_activas),
+        'total_abonado': sum(venta['abono'] for venta in ventas_activas),
+        'total_pendiente': sum(venta['saldo_pendiente'] for venta in ventas_activas),
+        'por_rubro': estadisticas_rubros
+    }
+
+
+def comparar_estadisticas(esperadas, obtenidas, tolerancia=1e-6, ruta=''):
+    """
+    Compara dos resultados de estadísticas campo por campo
+    Args:
+        esperadas (dict): Estadísticas calculadas desde cero
+        obtenidas (dict): Estadísticas incrementales
+        tolerancia (float): Diferencia máxima aceptada en montos
+    Returns:
+        list: Diferencias encontradas como dicts {campo, esperado, obtenido}
+    """
+    diferencias = []
+    for clave in sorted(set(esperadas) | set(obtenidas)):
+        campo = f"{ruta}{clave}"
+        esperado = esperadas.get(clave)
+        obtenido = obtenidas.get(clave)
+        if isinstance(esperado, dict) and isinstance(obtenido, dict):
+            diferencias.extend(comparar_estadisticas(esperado, obtenido, tolerancia, campo + '.'))
+        elif isinstance(esperado, (int, float)) and isinstance(obtenido, (int, float)):
+            if abs(esperado - obtenido) > tolerancia:
+                diferencias.append({'campo': campo, 'esperado': esperado, 'obtenido': obtenido})
+        elif esperado != obtenido:
+            diferencias.append({'campo': campo, 'esperado': esperado, 'obtenido': obtenido})
+    return diferencias
+
+
+class FenwickVectorial:
+    """
+    Árbol de Fenwick donde cada posición es un vector de medidas
+    Permite sumar un rango de días en O(log n)
+    """
+
+    def __init__(self, tamano, ancho):
+        self.tamano = tamano
+        self.ancho = ancho
+        self._arbol = [[0.0] * ancho for _ in range(tamano + 1)]
+
+    def sumar(self, posicion, deltas):
+        """
+        Args:
+            posicion (int): Posición 0-based
+            deltas (list): Pares (componente, delta) - solo los que cambian
+        """
+        i = posicion + 1
+        while i <= self.tamano:
+            nodo = self._arbol[i]
+            for componente, delta in deltas:
+                nodo[componente] += delta
+            i += i & -i
+
+    def prefijo(self, posicion):
+        """
+        Returns:
+            list: Suma de las posiciones 0..posicion
+        """
+        total = [0.0] * self.ancho
+        i = min(posicion + 1, self.tamano)
+        while i > 0:
+            nodo = self._arbol[i]
+            for componente in range(self.ancho):
+                total[componente] += nodo[componente]
+            i -= i & -i
+        return total
+
+
+class SumasPorDia:
+    """
+    Vector de medidas por día con la suma de cualquier rango en O(log n)
+
+    Un Fenwick que crece solo cuando llega un día fuera de su rango, más
+    los días con datos ordenados (para recorrer solo los del rango). Un
+    día sale de la lista cuando su componente de cantidad vuelve a cero
+    """
+
+    def __init__(self, ancho, cantidad, dias_iniciales=4096):
+        """
+        Args:
+            ancho (int): Medidas por día
+            cantidad (int): Componente que cuenta las entradas del día
+            dias_iniciales (int): Tamaño inicial del Fenwick
+        """
+        self.ancho = ancho
+        self.cantidad = cantidad
+        self._por_dia = {}
+        self._dias = []
+        self._base = None
+        self._fenwick = FenwickVectorial(dias_iniciales, ancho)
+
+    def __len__(self):
+        return len(self._dias)
+
+    def _asegurar_capacidad(self, dia):
+        if self._base is None:
+            # Dejo margen hacia atrás para datos con fecha anterior
+            self._base = dia - self._fenwick.tamano // 2
+        if self._base <= dia < self._base + self._fenwick.tamano:
+            return
+        inicio = min(self._base, dia)
+        fin = max(self._base + self._fenwick.tamano, dia + 1)
+        tamano = self._fenwick.tamano
+        while tamano < (fin - inicio) * 2:
+            tamano *= 2
+        self._base = inicio - (tamano - (fin - inicio)) // 2
+        self._fenwick = FenwickVectorial(tamano, self.ancho)
+        for dia_existente, vector in self._por_dia.items():
+            self._fenwick.sumar(dia_existente - self._base, [(i, v) for i, v in enumerate(vector) if v])
+
+    def sumar(self, dia, valores):
+        """
+        Args:
+            dia (int): Ordinal del día
+            valores (list): Un delta por medida
+        """
+        self._asegurar_capacidad(dia)
+        vector = self._por_dia.get(dia)
+        if vector is None:
+            vector = self._por_dia[dia] = [0] * self.ancho
+            insort(self._dias, dia)
+        for componente, valor in enumerate(valores):
+            vector[componente] += valor
+        # Al Fenwick solo las medidas que cambian
+        self._fenwick.sumar(dia - self._base, [(i, v) for i, v in enumerate(valores) if v])
+        if not vector[self.cantidad]:
+            del self._por_dia[dia]
+            del self._dias[bisect_left(self._dias, dia)]
+
+    def total(self, inicio, fin):
+        """
+        Returns:
+            list: Suma de cada medida entre dos días (ambos incluidos)
+        """
+        if self._base is None or fin < inicio:
+            return [0.0] * self.ancho
+        fin = min(fin, self._base + self._fenwick.tamano - 1) - self._base
+        inicio = max(inicio, self._base) - self._base
+        if fin < 0 or inicio > fin:
+            return [0.0] * self.ancho
+        hasta_fin = self._fenwick.prefijo(fin)
+        if inicio == 0:
+            return hasta_fin
+        antes = self._fenwick.prefijo(inicio - 1)
+        return [a - b for a, b in zip(hasta_fin, antes)]
+
+    def dias(self, inicio, fin):
+        """
+        Returns:
+            list: (día, vector) de los días con datos en el rango, en orden
+        """
+        desde = bisect_left(self._dias, inicio)
+        hasta = bisect_right(self._dias, fin)
+        return [(dia, self._por_dia[dia]) for dia in self._dias[desde:hasta]]
+
+    def primer_dia(self):
+        return self._dias[0] if self._dias else None
+
+    def ultimo_dia(self):
+        return self._dias[-1] if self._dias else None
@@ -0,0 +1,346 @@
+# ========================================
+# ARCHIVOS ESTÁTICOS CON HASH - Carloszerpav
+# ========================================
+# script.js y style.css pesan 34 KB cada uno y el celular los volvía a
+# pedir (o a revalidar) en cada página, con la señal que haya en el local
+#
+# - construir(): reduce cada .js y .css (sin comentarios ni sangrías),
+#   le pone el hash del contenido en el nombre y guarda además la versión
+#   .gz ya comprimida, todo en static/dist/ con un manifest.json
+# - Como el nombre cambia cuando cambia el contenido, el navegador los
+#   guarda un año sin volver a preguntar (Cache-Control immutable)
+# - La app busca en el manifiesto con url_for('static', ...) (ver
+#   app.estatico_con_hash); si no se construyó, o el original cambió
+#   después, se sirve el archivo original como siempre
+#
+# Uso (en el deploy, antes de arrancar):
+#   python estaticos.py
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+# Carpeta (dentro de static/) donde quedan los archivos construidos
+CARPETA_CONSTRUIDOS = 'dist'
+MANIFIESTO = 'manifest.json'
+
+# Extensiones que se reducen y versionan
+EXTENSIONES = ('.css', '.js')
+
+# El service worker no lleva hash: tiene que estar siempre en la misma URL
+NO_VERSIONAR = ('js/sw.js',)
+
+# Cache-Control de los archivos con hash (un año, no cambian nunca)
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+
+# Palabras después de las cuales una '/' empieza una expresión regular
+_ANTES_DE_REGEX = frozenset(('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new',
+                             'delete', 'void', 'throw', 'yield', 'await', 'instanceof'))
+_SIGNOS_ANTES_DE_REGEX = set('(,=:[!&|?{};+-*%<>~^')
+
+
+def _hash(datos):
+    return hashlib.sha256(datos).hexdigest()[:12]
+
+
+def _fin_de_cadena(texto, inicio, comilla):
+    # Posición después de la comilla que cierra (o del final de la línea)
+    i = inicio + 1
+    while i < len(texto):
+        c = texto[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == comilla or (c == '\n' and comilla != '`'):
+            return i + 1
+        i += 1
+    return len(texto)
+
+
+def minimizar_js(texto):
+    """
+    Quita comentarios, sangrías, líneas vacías y espacios repetidos
+    Los saltos de línea se conservan (el punto y coma automático de JS
+    depende de ellos) y el contenido de cadenas, plantillas `...` y
+    expresiones regulares se copia tal cual
+    Args:
+        texto (str): Código JavaScript
+    Returns:
+        str: El mismo código, más corto
+    """
+    salida = []
+    n = len(texto)
+    i = 0
+    ultimo = ''          # último token, para distinguir '/' de una regex
+    llaves = 0
+    plantillas = []      # llaves abiertas al entrar a cada ${ } de una plantilla
+
+    def espacio(separador):
+        if not salida or salida[-1] == '\n':
+            return
+        if separador == '\n':
+            if salida[-1] == ' ':
+                salida.pop()
+            salida.append('\n')
+        elif salida[-1] != ' ':
+            salida.append(' ')
+
+    def plantilla(desde):
+        # Copia una plantilla hasta su cierre o hasta un ${ (devuelve la posición)
+        j = desde
+        while j < n:
+            if texto[j] == '\\':
+                j += 2
+                continue
+            if texto[j] == '`':
+                salida.append(texto[desde:j + 1])
+                return j + 1, False
+            if texto.startswith('${', j):
+                salida.append(texto[desde:j + 2])
+                return j + 2, True
+            j += 1
+        salida.append(texto[desde:])
+        return n, False
+
+    while i < n:
+        c = texto[i]
+
+        if c.isspace():
+            j = i
+            while j < n and texto[j].isspace():
+                j += 1
+            espacio('\n' if '\n' in texto[i:j] else ' ')
+            i = j
+            continue
+
+        if texto.startswith('//', i):
+            j = texto.find('\n', i)
+            i = n if j < 0 else j
+            continue
+
+        if texto.startswith('/*', i):
+            j = texto.find('*/', i + 2)
+            j = n if j < 0 else j + 2
+            espacio('\n' if '\n' in texto[i:j] else ' ')
+            i = j
+            continue
+
+        if c in '"\'':
+            j = _fin_de_cadena(texto, i, c)
+            salida.append(texto[i:j])
+            i, ultimo = j, 'a'
+            continue
+
+        if c == '`':
+            salida.append('`')
+            i, abierta = plantilla(i + 1)
+            if abierta:
+                plantillas.append(llaves)
+                ultimo = '{'
+            else:
+                ultimo = 'a'
+            continue
+
+        if c == '}' and plantillas and plantillas[-1] == llaves:
+            # Cierra un ${ }: sigue el texto de la plantilla
+            plantillas.pop()
+            salida.append('}')
+            i, abierta = plantilla(i + 1)
+            if abierta:
+                plantillas.append(llaves)
+            ultimo = '{' if abierta else 'a'
+            continue
+
+        if c == '/' and (ultimo == '' or ultimo in _SIGNOS_ANTES_DE_REGEX or ultimo in _ANTES_DE_REGEX):
+            j = i + 1
+            en_clase = False
+            while j < n and texto[j] != '\n':
+                d = texto[j]
+                if d == '\\':
+                    j += 2
+                    continue
+                if d == '[':
+                    en_clase = True
+                elif d == ']':
+                    en_clase = False
+                elif d == '/' and not en_clase:
+                    break
+                j += 1
+            j += 1
+            while j < n and texto[j].isalpha():
+                j += 1
+            salida.append(texto[i:j])
+            i, ultimo = j, 'a'
+            continue
+
+        if c.isalnum() or c in '_$':
+            j = i
+            while j < n and (texto[j].isalnum() or texto[j] in '_$'):
+                j += 1
+            palabra = texto[i:j]
+            salida.append(palabra)
+            i = j
+            ultimo = palabra if palabra in _ANTES_DE_REGEX else 'a'
+            continue
+
+        if c == '{':
+            llaves += 1
+        elif c == '}':
+            llaves -= 1
+        salida.append(c)
+        ultimo = c
+        i += 1
+
+    return ''.join(salida).strip() + '\n'
+
+
+def minimizar_css(texto):
+    """
+    Quita comentarios y espacios que no cambian nada (alrededor de
+    { } ; , y después de :); las cadenas se copian tal cual
+    Args:
+        texto (str): Hoja de estilos
+    Returns:
+        str: La misma hoja, más corta
+    """
+    salida = []
+    n = len(texto)
+    i = 0
+    pendiente = False    # hay un espacio que se escribe solo si hace falta
+
+    while i < n:
+        c = texto[i]
+        if texto.startswith('/*', i):
+            j = texto.find('*/', i + 2)
+            i = n if j < 0 else j + 2
+            pendiente = True
+            continue
+        if c.isspace():
+            pendiente = True
+            i += 1
+            continue
+        if pendiente and salida and salida[-1] not in '{};,:' and c not in '{};,':
+            salida.append(' ')
+        pendiente = False
+        if c in '"\'':
+            j = _fin_de_cadena(texto, i, c)
+            salida.append(texto[i:j])
+            i = j
+            continue
+        if c == '}' and salida and salida[-1] == ';':
+            salida.pop()
+        salida.append(c)
+        i += 1
+
+    return ''.join(salida) + '\n'
+
+
+def reducir(ruta):
+    """
+    Args:
+        ruta (str): Archivo .css o .js
+    Returns:
+        tuple: (original, reducido, comprimido) en bytes
+    """
+    with open(ruta, 'rb') as f:
+        original = f.read()
+    texto = original.decode('utf-8')
+    reducido = (minimizar_css(texto) if ruta.endswith('.css') else minimizar_js(texto)).encode('utf-8')
+    return original, reducido, gzip.compress(reducido, 9, mtime=0)
+
+
+def archivos_versionables(carpeta_static):
+    """
+    Returns:
+        list: Rutas relativas a static/ (con '/') de los archivos a construir
+    """
+    archivos = []
+    for raiz, carpetas, nombres in os.walk(carpeta_static):
+        relativa = os.path.relpath(raiz, carpeta_static).replace(os.sep, '/')
+        if relativa == CARPETA_CONSTRUIDOS or relativa.startswith(CARPETA_CONSTRUIDOS + '/'):
+            continue
+        for nombre in nombres:
+            archivo = nombre if relativa == '.' else f"{relativa}/{nombre}"
+            if archivo.endswith(EXTENSIONES) and archivo not in NO_VERSIONAR:
+                archivos.append(archivo)
+    return sorted(archivos)
+
+
+def construir(carpeta_static):
+    """
+    Construye static/dist/ desde cero: cada archivo reducido con su hash
+    en el nombre, su .gz y el manifiesto
+    Args:
+        carpeta_static (str): La carpeta static/ de la app
+    Returns:
+        dict: El manifiesto {original: {'archivo', 'origen', 'bytes', 'reducido', 'gzip'}}
+    """
+    destino = os.path.join(carpeta_static, CARPETA_CONSTRUIDOS)
+    shutil.rmtree(destino, ignore_errors=True)
+
+    manifiesto = {}
+    for archivo in archivos_versionables(carpeta_static):
+        original, reducido, comprimido = reducir(os.path.join(carpeta_static, archivo))
+        base, extension = os.path.splitext(archivo)
+        construido = f"{CARPETA_CONSTRUIDOS}/{base}.{_hash(reducido)}{extension}"
+
+        ruta = os.path.join(carpeta_static, *construido.split('/'))
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'wb') as f:
+            f.write(reducido)
+        with open(ruta + '.gz', 'wb') as f:
+            f.write(comprimido)
+
+        manifiesto[archivo] = {
+            'archivo': construido,
+            # Hash del original: si se edita sin reconstruir, la app lo nota
+            'origen': _hash(original),
+            'bytes': len(original),
+            'reducido': len(reducido),
+            'gzip': len(comprimido)
+        }
+
+    with open(os.path.join(destino, MANIFIESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+    return manifiesto
+
+
+def cargar_manifiesto(carpeta_static):
+    """
+    Lee el manifiesto y deja solo lo que sigue al día con los originales
+    Args:
+        carpeta_static (str): La carpeta static/ de la app
+    Returns:
+        tuple: ({original: construido}, [originales que cambiaron sin reconstruir])
+               ({} si no se construyó)
+    """
+    try:
+        with open(os.path.join(carpeta_static, CARPETA_CONSTRUIDOS, MANIFIESTO), encoding='utf-8') as f:
+            manifiesto = json.load(f)
+    except (OSError, ValueError):
+        return {}, []
+
+    vigentes = {}
+    viejos = []
+    for archivo, datos in manifiesto.items():
+        try:
+            with open(os.path.join(carpeta_static, *archivo.split('/')), 'rb') as f:
+                al_dia = _hash(f.read()) == datos['origen']
+        except OSError:
+            al_dia = False
+        if al_dia and os.path.exists(os.path.join(carpeta_static, *datos['archivo'].split('/'))):
+            vigentes[archivo] = datos['archivo']
+        else:
+            viejos.append(archivo)
+    return vigentes, viejos
+
+
+if __name__ == '__main__':
+    carpeta = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    resultado = construir(carpeta)
+    for archivo, datos in resultado.items():
+        print(f"✅ {archivo} -> {datos['archivo']}: {datos['bytes']:,} B, "
+              f"reducido {datos['reducido']:,} B, gzip {datos['gzip']:,} B")
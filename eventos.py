@@ -0,0 +1,139 @@
+# ========================================
+# EVENTOS EN VIVO - Carloszerpav
+# ========================================
+# Después de cada venta o pago la página se recargaba completa, y los
+# otros equipos del local no veían nada hasta que alguien recargara
+#
+# - DifusorEventos: cada escritura publica un aviso corto (qué venta
+#   cambió) en la cola de cada cliente conectado a /api/eventos (SSE)
+# - Las colas son acotadas: si un cliente lento se atrasa, su cola se
+#   vacía y se le pide recargar la tabla; quien escribe nunca espera
+# - Los últimos avisos quedan en memoria para que un cliente que se
+#   reconecta (Last-Event-ID) reciba solo lo que se perdió
+# - El contenido (fila, tarjetas) se arma al enviar y desde el estado
+#   actual del libro: varios avisos de la misma venta salen como uno
+
+import os
+import threading
+from collections import deque
+
+# Avisos pendientes por cliente antes de darlo por atrasado
+AVISOS_POR_CLIENTE = 256
+
+# Hilos por worker (los mismos de gunicorn.conf.py)
+HILOS_SERVIDOR = int(os.environ.get('VENTAS_HILOS', 32))
+
+# Clientes conectados a la vez: cada uno ocupa un hilo del servidor
+# durante toda la conexión, así que a lo sumo la mitad de los hilos; el
+# resto queda para las páginas y la API
+MAXIMO_CLIENTES = max(1, HILOS_SERVIDOR // 2)
+
+# Avisos recientes que se guardan para las reconexiones
+AVISOS_RECIENTES = 1024
+
+
+class Suscripcion:
+    """
+    Cola de avisos de un cliente conectado
+    """
+
+    __slots__ = ('avisos', 'atrasada')
+
+    def __init__(self):
+        self.avisos = deque()
+        # Se perdieron avisos: el cliente tiene que recargar la tabla
+        self.atrasada = False
+
+
+class DifusorEventos:
+    """
+    Reparte los avisos de cambios entre los clientes conectados
+    """
+
+    def __init__(self, avisos_por_cliente=AVISOS_POR_CLIENTE, maximo_clientes=MAXIMO_CLIENTES,
+                 avisos_recientes=AVISOS_RECIENTES):
+        self.avisos_por_cliente = avisos_por_cliente
+        self.maximo_clientes = maximo_clientes
+        self._suscripciones = set()
+        # (secuencia, tipo, id) de los últimos avisos
+        self._recientes = deque(maxlen=avisos_recientes)
+        self._condicion = threading.Condition(threading.Lock())
+        self.secuencia = 0
+        self.publicados = 0
+        self.desbordes = 0
+
+    def __len__(self):
+        return len(self._suscripciones)
+
+    def publicar(self, tipo, id=None):
+        """
+        Avisa un cambio a todos los clientes conectados (sin esperar a ninguno)
+        Args:
+            tipo (str): 'venta' (cambió una venta), 'tabla' (cambiaron
+                muchas) o 'estadisticas' (solo los totales)
+            id (int): ID de la venta (para 'venta')
+        """
+        with self._condicion:
+            self.secuencia += 1
+            self.publicados += 1
+            aviso = (self.secuencia, tipo, id)
+            self._recientes.append(aviso)
+            for suscripcion in self._suscripciones:
+                if suscripcion.atrasada:
+                    continue
+                if len(suscripcion.avisos) >= self.avisos_por_cliente:
+                    suscripcion.avisos.clear()
+                    suscripcion.atrasada = True
+                    self.desbordes += 1
+                else:
+                    suscripcion.avisos.append(aviso)
+            if self._suscripciones:
+                self._condicion.notify_all()
+
+    def suscribir(self, ultimo=None):
+        """
+        Conecta un cliente
+        Args:
+            ultimo (int): Secuencia del último aviso que recibió (al
+                reconectarse); None si empieza de cero
+        Returns:
+            Suscripcion: Su cola, o None si ya hay demasiados clientes
+        """
+        with self._condicion:
+            if len(self._suscripciones) >= self.maximo_clientes:
+                return None
+            suscripcion = Suscripcion()
+            if ultimo is not None and ultimo != self.secuencia:
+                perdidos = [aviso for aviso in self._recientes if aviso[0] > ultimo]
+                # Las secuencias son consecutivas: si falta alguno ya salió
+                # de los recientes (o es de otra vida del proceso)
+                if 0 <= ultimo < self.secuencia and len(perdidos) == self.secuencia - ultimo \
+                        and len(perdidos) <= self.avisos_por_cliente:
+                    suscripcion.avisos.extend(perdidos)
+                else:
+                    suscripcion.atrasada = True
+            self._suscripciones.add(suscripcion)
+            return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._condicion:
+            self._suscripciones.discard(suscripcion)
+
+    def esperar(self, suscripcion, espera):
+        """
+        Espera avisos para un cliente y se los lleva todos
+        Args:
+            suscripcion (Suscripcion): Lo que devolvió suscribir()
+            espera (float): Segundos como máximo
+        Returns:
+            tuple: (avisos, atrasada, secuencia actual); avisos vacío y
+                   atrasada False si no pasó nada
+        """
+        with self._condicion:
+            if not suscripcion.avisos and not suscripcion.atrasada:
+                self._condicion.wait(espera)
+            avisos = list(suscripcion.avisos)
+            suscripcion.avisos.clear()
+            atrasada = suscripcion.atrasada
+            suscripcion.atrasada = False
+            return avisos, atrasada, self.secuencia
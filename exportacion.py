@@ -0,0 +1,116 @@
+# ========================================
+# EXPORTACIÓN DE VENTAS Y PAGOS - Carloszerpav
+# ========================================
+# Para bajar el año completo (para la contadora) sin armar todo en memoria
+#
+# - Todo son generadores: se escribe de a bloques de filas y Flask los
+#   va mandando con una respuesta en streaming
+# - CSV (con BOM para que Excel respete los acentos) o JSON-lines
+# - Pagos como tabla plana: una fila por pago con los datos de su venta
+# - gzip opcional, comprimiendo a medida que sale cada bloque
+
+import csv
+import io
+import json
+import zlib
+
+FORMATOS_EXPORTACION = ('csv', 'jsonl')
+
+CAMPOS_EXPORTACION = {
+    'ventas': ('id', 'cliente', 'fecha', 'fecha_registro', 'valor_total', 'abono', 'saldo_pendiente',
+               'estado', 'rubros', 'total_pagos', 'incluida_en_estadisticas', 'mes_cierre'),
+    'pagos': ('venta_id', 'pago_id', 'fecha', 'monto', 'tipo', 'cliente', 'fecha_venta', 'estado_venta', 'rubros')
+}
+
+# Filas por bloque que se manda al cliente
+FILAS_POR_BLOQUE = 500
+
+
+def filas_ventas(ventas):
+    """
+    Yields:
+        dict: Una fila por venta con los campos de exportación
+    """
+    for venta in ventas:
+        yield {campo: venta[campo] for campo in CAMPOS_EXPORTACION['ventas']}
+
+
+def filas_pagos(ventas, filtro_fecha=None):
+    """
+    Aplana historial_pagos: una fila por pago
+    Args:
+        ventas (iterable): Ventas cuyos pagos se exportan
+        filtro_fecha (callable): Recibe la fecha del pago ('YYYY-MM-DD HH:MM')
+            y dice si entra (None = todos)
+    Yields:
+        dict: Una fila por pago
+    """
+    for venta in ventas:
+        if not venta['total_pagos']:
+            continue
+        for pago in venta['historial_pagos']:
+            if filtro_fecha is not None and not filtro_fecha(pago['fecha']):
+                continue
+            yield {
+                'venta_id': venta['id'],
+                'pago_id': pago['id'],
+                'fecha': pago['fecha'],
+                'monto': pago['monto'],
+                'tipo': pago['tipo'],
+                'cliente': venta['cliente'],
+                'fecha_venta': venta['fecha'],
+                'estado_venta': venta['estado'],
+                'rubros': venta['rubros']
+            }
+
+
+def generar_csv(filas, campos):
+    """
+    Yields:
+        str: Bloques de texto CSV (el primero con BOM y encabezado)
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(campos)
+
+    for numero, fila in enumerate(filas, 1):
+        escritor.writerow([
+            ';'.join(valor) if isinstance(valor, list) else ('' if valor is None else valor)
+            for valor in (fila[campo] for campo in campos)
+        ])
+        if numero % FILAS_POR_BLOQUE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def generar_jsonl(filas):
+    """
+    Yields:
+        str: Bloques de líneas JSON (una fila por línea)
+    """
+    bloque = []
+    for fila in filas:
+        bloque.append(json.dumps(fila, ensure_ascii=False))
+        if len(bloque) >= FILAS_POR_BLOQUE:
+            yield '\n'.join(bloque) + '\n'
+            bloque = []
+    if bloque:
+        yield '\n'.join(bloque) + '\n'
+
+
+def comprimir_gzip(bloques, nivel=6):
+    """
+    Comprime en gzip a medida que llegan los bloques de texto
+    Yields:
+        bytes: Pedazos del archivo .gz
+    """
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        datos = compresor.compress(bloque.encode('utf-8'))
+        if datos:
+            yield datos
+    yield compresor.flush()
@@ -0,0 +1,49 @@
+# ========================================
+# CONFIGURACIÓN DE GUNICORN - Carloszerpav
+# ========================================
+# Workers con hilos (gthread): una página lenta ya no frena a las demás y
+# las lecturas corren a la par (ver cerrojos.py)
+#
+# - Con el diario o en memoria el libro es de un solo proceso: 1 worker
+#   y todos los hilos ahí. Con SQLite puede haber varios (WEB_CONCURRENCY)
+# - Cada pestaña abierta en / ocupa un hilo con /api/eventos: solo la
+#   mitad de los hilos puede estar en eso (eventos.MAXIMO_CLIENTES, las
+#   demás pestañas reciben 503 y reintentan), el resto atiende lo demás
+# - Sin max_requests: reiniciar un worker vuelve a cargar el libro entero
+#
+# Uso:
+#   gunicorn -c gunicorn.conf.py app:app
+#   VENTAS_HILOS=64 gunicorn -c gunicorn.conf.py app:app
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = 'gthread'
+
+if os.environ.get('VENTAS_ALMACEN', 'diario').strip().lower() == 'sqlite':
+    workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+else:
+    workers = 1
+
+# Hilos por worker (eventos.py lee la misma variable)
+threads = int(os.environ.get('VENTAS_HILOS', 32))
+
+# Conexiones que esperan un hilo libre (las de más se rechazan)
+backlog = 256
+
+# El celular reusa la conexión entre página y página (TLS incluido)
+keepalive = 15
+
+# Un worker colgado se reinicia; /api/eventos no cuenta (gthread avisa
+# que está vivo aunque haya requests largos en curso)
+timeout = 60
+graceful_timeout = 30
+
+# El aviso de "sigo vivo" de cada worker, en memoria si se puede
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# El log de requests lo lleva la app (ver metricas.py)
+accesslog = None
+errorlog = '-'
+loglevel = os.environ.get('VENTAS_LOG', 'info').lower()
@@ -0,0 +1,119 @@
+# ========================================
+# CLAVES DE IDEMPOTENCIA - Carloszerpav
+# ========================================
+# Los equipos del local mandan ventas y pagos por la API con el wifi que
+# hay: si una respuesta no llega y el envío se repite, la venta quedaba
+# registrada dos veces
+#
+# - Cada venta o pago puede llevar una clave que elige quien lo manda;
+#   la primera vez se registra y se recuerda qué se creó
+# - Si llega otra vez la misma clave con los mismos datos se devuelve lo
+#   ya creado sin tocar el libro; con otros datos es un conflicto
+# - Las claves se recuerdan un tiempo (VIDA_CLAVES) y como mucho
+#   MAXIMO_CLAVES a la vez: sale primero la usada hace más tiempo
+# - Con SQLite la clave viaja en la operación del diario, así el worker
+#   que recibe el reintento también la conoce (ver app.aplicar_cambio)
+# - La operación lleva también cuándo se creó la clave ('creada', hora de
+#   pared): al reiniciar cada clave vence cuando le tocaba, no un día
+#   después de cargarla
+
+import hashlib
+import json
+import time
+
+from cache_lru import CacheLRU
+
+# Claves recordadas a la vez por proceso
+MAXIMO_CLAVES = 10000
+
+# Segundos que se recuerda cada clave (un día de reintentos)
+VIDA_CLAVES = 24 * 3600
+
+# Largo máximo de una clave
+LARGO_CLAVE = 200
+
+
+def huella_datos(datos):
+    """
+    Resumen de lo que se mandó con una clave, para reconocer si un
+    reintento trae otros datos
+    Args:
+        datos (dict): Venta o pago tal como llegó (sin la clave)
+    Returns:
+        str: Huella corta (hexadecimal)
+    """
+    texto = json.dumps(datos, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:16]
+
+
+class ClavesIdempotencia:
+    """
+    Claves ya usadas -> (huella, resultado), acotadas y con vencimiento
+    """
+
+    def __init__(self, maximo_claves=MAXIMO_CLAVES, vida=VIDA_CLAVES, reloj=time.time):
+        """
+        Args:
+            maximo_claves (int): Claves como máximo
+            vida (float): Segundos que dura cada clave
+            reloj (callable): Hora actual en segundos (de pared: las horas
+                guardadas en el diario se comparan después de reiniciar y
+                entre workers)
+        """
+        self.vida = vida
+        self.reloj = reloj
+        self._claves = CacheLRU(maximo_claves)
+        self.repetidas = 0
+        self.conflictos = 0
+
+    def __len__(self):
+        return len(self._claves)
+
+    def buscar(self, clave, huella):
+        """
+        Args:
+            clave (tuple): Clave con su espacio, ej. ('venta', 'abc')
+            huella (str): huella_datos() de lo que llegó ahora
+        Returns:
+            tuple: (resultado, True) si es un reintento con los mismos datos,
+                   (resultado, False) si la clave se usó con otros datos,
+                   o None si la clave es nueva (o ya venció)
+        """
+        entrada = self._claves.obtener(clave)
+        if entrada is None:
+            return None
+        vence, huella_guardada, resultado = entrada
+        if vence <= self.reloj():
+            return None
+        if huella_guardada != huella:
+            self.conflictos += 1
+            return resultado, False
+        self.repetidas += 1
+        return resultado, True
+
+    def recordar(self, clave, huella, resultado, creada=None):
+        """
+        Args:
+            clave (tuple): Clave con su espacio
+            huella (str): huella_datos() de lo que se registró
+            resultado: Lo que se creó (IDs), para repetir la respuesta
+            creada (float): Cuándo se usó la clave por primera vez según
+                reloj (None = ahora); una clave ya vencida no se recuerda
+        """
+        vence = (self.reloj() if creada is None else creada) + self.vida
+        if vence <= self.reloj():
+            return
+        self._claves.guardar(clave, (vence, huella, resultado))
+
+    def olvidar(self, claves):
+        """
+        Olvida claves recordadas (lo que identificaban no llegó a guardarse)
+        Args:
+            claves (iterable): Claves con su espacio
+        """
+        claves = set(claves)
+        if claves:
+            self._claves.descartar(lambda clave: clave in claves)
+
+    def limpiar(self):
+        self._claves.limpiar()
@@ -0,0 +1,360 @@
+# ========================================
+# IMPORTACIÓN MASIVA DE VENTAS - Carloszerpav
+# ========================================
+# Para pasar años de ventas desde las planillas sin cargarlas una por una
+# en el formulario
+#
+# - Lee CSV, JSON-lines o un arreglo JSON de a una fila (memoria acotada)
+# - Valida cada fila: cliente, montos no negativos, rubros del catálogo,
+#   fechas y pagos históricos
+# - Las filas válidas salen listas para modelo.Venta.desde_dict (sin ID:
+#   los IDs los asigna app.importar_ventas en bloques)
+#
+# Columnas / claves reconocidas:
+#   cliente, valor_total, abono, rubros, fecha, fecha_registro, pagos
+#   - rubros: lista JSON o texto separado por ';' / ',' / '|'
+#   - fecha: YYYY-MM-DD o DD/MM/YYYY
+#   - pagos: lista [{monto, fecha, tipo}] (en CSV como texto JSON); si no
+#     viene, el abono se registra como un único 'Pago inicial'
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from itertools import islice
+
+from busqueda import plegar_texto
+
+FORMATOS_IMPORTACION = ('csv', 'jsonl', 'json')
+
+# Tamaño de lectura para el arreglo JSON
+BLOQUE_LECTURA = 64 * 1024
+
+
+class FilaInvalida(ValueError):
+    """
+    Error de validación de una fila (el mensaje va al reporte)
+    """
+
+
+def detectar_formato(nombre='', tipo_contenido=''):
+    """
+    Deduce el formato por la extensión del archivo o el Content-Type
+    Returns:
+        str: 'csv', 'jsonl' o 'json' (None si no se puede saber)
+    """
+    nombre = (nombre or '').lower()
+    tipo_contenido = (tipo_contenido or '').lower()
+    if nombre.endswith('.csv') or 'csv' in tipo_contenido:
+        return 'csv'
+    if nombre.endswith(('.jsonl', '.ndjson')) or 'ndjson' in tipo_contenido or 'jsonl' in tipo_contenido:
+        return 'jsonl'
+    if nombre.endswith('.json') or 'json' in tipo_contenido:
+        return 'json'
+    return None
+
+
+def leer_filas(texto, formato):
+    """
+    Lee las filas de un archivo de a una
+    Args:
+        texto: Archivo de texto abierto (o cualquier objeto con read/iteración)
+        formato (str): 'csv', 'jsonl' o 'json'
+    Yields:
+        tuple: (número de fila, dict con los datos o FilaInvalida si no se pudo leer)
+    """
+    if formato == 'csv':
+        lector = csv.DictReader(texto)
+        for numero, fila in enumerate(lector, 1):
+            yield numero, fila
+        return
+
+    if formato == 'jsonl':
+        numero = 0
+        for linea in texto:
+            if not linea.strip():
+                continue
+            numero += 1
+            try:
+                yield numero, json.loads(linea)
+            except ValueError as e:
+                yield numero, FilaInvalida(f"JSON inválido: {e}")
+        return
+
+    if formato == 'json':
+        yield from _leer_arreglo_json(texto)
+        return
+
+    raise ValueError(f"Formato de importación no válido: {formato}")
+
+
+def _leer_arreglo_json(texto):
+    # Recorre un arreglo JSON grande decodificando un elemento a la vez
+    decodificador = json.JSONDecoder()
+    buffer = ''
+    posicion = 0
+    fin_archivo = False
+
+    def rellenar():
+        nonlocal buffer, posicion, fin_archivo
+        bloque = texto.read(BLOQUE_LECTURA)
+        if not bloque:
+            fin_archivo = True
+        buffer = buffer[posicion:] + bloque
+        posicion = 0
+
+    def saltar_espacios():
+        nonlocal posicion
+        while True:
+            while posicion < len(buffer) and buffer[posicion].isspace():
+                posicion += 1
+            if posicion < len(buffer) or fin_archivo:
+                return
+            rellenar()
+
+    saltar_espacios()
+    if posicion >= len(buffer) or buffer[posicion] != '[':
+        raise ValueError("Se esperaba un arreglo JSON")
+    posicion += 1
+
+    numero = 0
+    while True:
+        saltar_espacios()
+        if posicion >= len(buffer):
+            raise ValueError("Arreglo JSON incompleto")
+        if buffer[posicion] == ']':
+            return
+        if numero and buffer[posicion] == ',':
+            posicion += 1
+            saltar_espacios()
+
+        # Decodifico el siguiente elemento; si quedó cortado leo más
+        while True:
+            try:
+                elemento, fin = decodificador.raw_decode(buffer, posicion)
+                break
+            except ValueError:
+                if fin_archivo:
+                    raise ValueError(f"JSON inválido cerca del elemento {numero + 1}")
+                rellenar()
+        posicion = fin
+        numero += 1
+        yield numero, elemento
+
+
+def en_lotes(filas, tamano):
+    """
+    Agrupa un iterable en listas de `tamano` elementos
+    """
+    filas = iter(filas)
+    while True:
+        lote = list(islice(filas, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+def _numero(valor, campo, defecto=None):
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        if defecto is None:
+            raise FilaInvalida(f"Falta '{campo}'")
+        return defecto
+    try:
+        numero = float(str(valor).replace('$', '').replace(',', '').strip()) if isinstance(valor, str) else float(valor)
+    except (TypeError, ValueError):
+        raise FilaInvalida(f"'{campo}' no es un número: {valor!r}")
+    if numero != numero or numero in (float('inf'), float('-inf')):
+        raise FilaInvalida(f"'{campo}' no es un número: {valor!r}")
+    if numero < 0:
+        raise FilaInvalida(f"'{campo}' no puede ser negativo")
+    return numero
+
+
+def _fecha(valor, campo):
+    texto = str(valor or '').strip()
+    if not texto:
+        raise FilaInvalida(f"Falta '{campo}'")
+    try:
+        if len(texto) == 10 and texto[4] == '-':
+            return date.fromisoformat(texto).isoformat()
+        return datetime.strptime(texto, "%d/%m/%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        pass
+    raise FilaInvalida(f"'{campo}' no es una fecha válida (YYYY-MM-DD o DD/MM/YYYY): {texto!r}")
+
+
+def _fecha_hora(valor, campo, defecto):
+    texto = str(valor or '').strip()
+    if not texto:
+        return defecto
+    for formato in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(texto, formato).strftime("%Y-%m-%d %H:%M")
+        except ValueError:
+            pass
+    return _fecha(texto, campo) + " 00:00"
+
+
+def _lista_rubros(valor):
+    if isinstance(valor, str):
+        texto = valor.strip()
+        if texto.startswith('['):
+            try:
+                valor = json.loads(texto)
+            except ValueError:
+                raise FilaInvalida("'rubros' no es una lista JSON válida")
+        else:
+            for separador in (';', '|'):
+                texto = texto.replace(separador, ',')
+            valor = texto.split(',')
+    if not isinstance(valor, (list, tuple)):
+        raise FilaInvalida("'rubros' debe ser una lista")
+    return valor
+
+
+class ValidadorVentas:
+    """
+    Valida y normaliza filas de importación contra el catálogo de rubros
+    """
+
+    def __init__(self, rubros):
+        # 'zapatos', 'ZAPATOS' y 'Zapatos' son el mismo rubro
+        self.rubros_por_nombre = {plegar_texto(rubro): rubro for rubro in rubros}
+        # Forma escrita -> rubro oficial ('' si está vacía), para plegar cada
+        # forma una sola vez en todo el archivo
+        self._formas = {}
+
+    def _rubro_oficial(self, rubro):
+        texto = str(rubro)
+        oficial = self._formas.get(texto)
+        if oficial is None:
+            nombre = plegar_texto(texto)
+            oficial = self.rubros_por_nombre.get(nombre, '') if nombre else ''
+            if nombre and not oficial:
+                raise FilaInvalida(f"Rubro no válido: {texto!r}")
+            if len(self._formas) < 1000:
+                self._formas[texto] = oficial
+        return oficial
+
+    def _rubros(self, valor):
+        rubros = []
+        for rubro in _lista_rubros(valor):
+            oficial = self._rubro_oficial(rubro)
+            if oficial and oficial not in rubros:
+                rubros.append(oficial)
+        if not rubros:
+            raise FilaInvalida("Debe tener al menos un rubro")
+        return rubros
+
+    def validar(self, datos):
+        """
+        Args:
+            datos (dict): Fila leída del archivo
+        Returns:
+            dict: Venta lista para Venta.desde_dict (sin 'id')
+        Raises:
+            FilaInvalida: Con el motivo, para el reporte de errores
+        """
+        if isinstance(datos, FilaInvalida):
+            raise datos
+        if not isinstance(datos, dict):
+            raise FilaInvalida("La fila debe ser un objeto")
+
+        cliente = str(datos.get('cliente') or '').strip()
+        if not cliente:
+            raise FilaInvalida("Falta 'cliente'")
+
+        valor_total = _numero(datos.get('valor_total'), 'valor_total')
+        rubros = self._rubros(datos.get('rubros', ''))
+        fecha = _fecha(datos.get('fecha'), 'fecha')
+        fecha_registro = _fecha_hora(datos.get('fecha_registro'), 'fecha_registro', f"{fecha} 00:00")
+
+        historial = self._pagos(datos, fecha_registro)
+        abono = round(sum(pago['monto'] for pago in historial), 2)
+        if abono > valor_total + 1e-9:
+            raise FilaInvalida("Los pagos superan el valor total")
+
+        saldo_pendiente = valor_total - abono
+        estado = 'Activa' if saldo_pendiente > 0 else 'Cerrada'
+
+        return {
+            'cliente': cliente,
+            'valor_total': valor_total,
+            'abono': abono,
+            'saldo_pendiente': saldo_pendiente if estado == 'Activa' else 0,
+            'rubros': rubros,
+            'fecha': fecha,
+            'fecha_registro': fecha_registro,
+            'estado': estado,
+            'historial_pagos': historial,
+            'total_pagos': len(historial),
+            'incluida_en_estadisticas': True,
+            'mes_cierre': None
+        }
+
+    def _pagos(self, datos, fecha_registro):
+        pagos = datos.get('pagos') or datos.get('historial_pagos')
+        if isinstance(pagos, str):
+            try:
+                pagos = json.loads(pagos) if pagos.strip() else None
+            except ValueError:
+                raise FilaInvalida("'pagos' no es una lista JSON válida")
+
+        if not pagos:
+            # Solo el abono: un pago inicial en la fecha de registro
+            abono = _numero(datos.get('abono'), 'abono', defecto=0.0)
+            if abono <= 0:
+                return []
+            return [{'id': 1, 'monto': abono, 'fecha': fecha_registro, 'tipo': 'Pago inicial'}]
+
+        if not isinstance(pagos, list):
+            raise FilaInvalida("'pagos' debe ser una lista")
+
+        historial = []
+        for numero, pago in enumerate(pagos, 1):
+            if not isinstance(pago, dict):
+                raise FilaInvalida(f"Pago {numero}: debe ser un objeto")
+            monto = _numero(pago.get('monto'), f'pagos[{numero}].monto')
+            if monto <= 0:
+                raise FilaInvalida(f"Pago {numero}: el monto debe ser mayor a 0")
+            historial.append({
+                'id': numero,
+                'monto': monto,
+                'fecha': _fecha_hora(pago.get('fecha'), f'pagos[{numero}].fecha', fecha_registro),
+                'tipo': str(pago.get('tipo') or ('Pago inicial' if numero == 1 else 'Abono'))
+            })
+
+        abono = datos.get('abono')
+        if abono not in (None, '') and abs(_numero(abono, 'abono') - sum(p['monto'] for p in historial)) > 0.005:
+            raise FilaInvalida("'abono' no coincide con la suma de los pagos")
+        return historial
+
+
+class _FlujoCrudo(io.RawIOBase):
+    """
+    Adapta un objeto que solo tiene read() al protocolo de io (con
+    gunicorn request.stream es su propio cuerpo del request, no un io)
+    """
+
+    def __init__(self, flujo):
+        self._flujo = flujo
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        datos = self._flujo.read(len(destino))
+        destino[:len(datos)] = datos
+        return len(datos)
+
+
+def abrir_texto(binario):
+    """
+    Envuelve un flujo binario (archivo, request.stream) como texto UTF-8
+    Acepta el BOM que dejan Excel y Google Sheets al exportar CSV
+    """
+    if not isinstance(binario, io.BufferedIOBase):
+        if not isinstance(binario, io.IOBase):
+            binario = _FlujoCrudo(binario)
+        binario = io.BufferedReader(binario)
+    return io.TextIOWrapper(binario, encoding='utf-8-sig', newline='')
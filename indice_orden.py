@@ -0,0 +1,192 @@
+# ========================================
+# ÍNDICES ORDENADOS PARA LA TABLA - Carloszerpav
+# ========================================
+# Para paginar y ordenar la tabla de ventas activas sin ordenar todo el
+# libro en cada request
+#
+# - ListaOrdenada: lista ordenada partida en bloques (insertar o quitar
+#   cuesta O(log n + bloque), sin mover todo el arreglo)
+# - IndiceOrdenado: índice derivado del VentaStore con una ListaOrdenada
+#   por campo; una página de 50 filas es O(log n + 50)
+# - Cada entrada es un solo int (clave y ID empaquetados) salvo el cliente,
+#   que va como (nombre plegado, ID): así el índice ocupa poco por venta
+
+import sys
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate
+
+from busqueda import plegar_texto
+from estadisticas import ordinal_de_fecha
+
+# Bits del ID dentro de la clave empaquetada
+BITS_ID = 32
+MASCARA_ID = (1 << BITS_ID) - 1
+
+# Campos por los que se puede ordenar la tabla
+CAMPOS_ORDEN = ('id', 'fecha', 'saldo_pendiente', 'cliente', 'valor_total')
+
+
+def _centavos(valor):
+    return round(float(valor or 0) * 100)
+
+
+# Campo -> función que da la parte ordenable de la clave
+CLAVES_ORDEN = {
+    'id': lambda venta: 0,
+    'fecha': lambda venta: ordinal_de_fecha(venta['fecha']) or 0,
+    'saldo_pendiente': lambda venta: _centavos(venta['saldo_pendiente']),
+    'valor_total': lambda venta: _centavos(venta['valor_total']),
+    'cliente': lambda venta: sys.intern(plegar_texto(venta['cliente']))
+}
+
+
+class ListaOrdenada:
+    """
+    Lista ordenada en bloques de hasta 2 × TAMANO_BLOQUE elementos
+
+    Se ubica el bloque con bisect sobre el máximo de cada bloque y dentro
+    del bloque con insort; un bloque que crece demasiado se parte en dos
+    """
+    TAMANO_BLOQUE = 512
+
+    def __init__(self, elementos=()):
+        ordenados = sorted(elementos)
+        tamano = self.TAMANO_BLOQUE
+        self._bloques = [ordenados[i:i + tamano] for i in range(0, len(ordenados), tamano)]
+        self._maximos = [bloque[-1] for bloque in self._bloques]
+        self._largo = len(ordenados)
+        # Posición de inicio de cada bloque; se recalcula al leer tras un cambio
+        self._inicios = None
+
+    def __len__(self):
+        return self._largo
+
+    def agregar(self, elemento):
+        self._largo += 1
+        self._inicios = None
+        if not self._bloques:
+            self._bloques.append([elemento])
+            self._maximos.append(elemento)
+            return
+        i = bisect_left(self._maximos, elemento)
+        if i == len(self._maximos):
+            i -= 1
+        bloque = self._bloques[i]
+        insort(bloque, elemento)
+        self._maximos[i] = bloque[-1]
+        if len(bloque) > 2 * self.TAMANO_BLOQUE:
+            mitad = len(bloque) // 2
+            self._bloques[i:i + 1] = [bloque[:mitad], bloque[mitad:]]
+            self._maximos[i:i + 1] = [bloque[mitad - 1], bloque[-1]]
+
+    def quitar(self, elemento):
+        """
+        Returns:
+            bool: False si el elemento no estaba
+        """
+        i = bisect_left(self._maximos, elemento)
+        if i == len(self._maximos):
+            return False
+        bloque = self._bloques[i]
+        j = bisect_left(bloque, elemento)
+        if j == len(bloque) or bloque[j] != elemento:
+            return False
+        del bloque[j]
+        self._largo -= 1
+        self._inicios = None
+        if bloque:
+            self._maximos[i] = bloque[-1]
+        else:
+            del self._bloques[i]
+            del self._maximos[i]
+        return True
+
+    def rebanada(self, desde, cantidad, descendente=False):
+        """
+        Args:
+            desde (int): Posición del primer elemento (contando desde el
+                final si es descendente)
+            cantidad (int): Cuántos elementos como máximo
+            descendente (bool): Recorrer de mayor a menor
+        Returns:
+            list: Los elementos pedidos, en el orden pedido
+        """
+        if cantidad <= 0 or desde >= self._largo:
+            return []
+        if descendente:
+            fin = self._largo - desde
+            inicio = max(0, fin - cantidad)
+            resultado = self._entre(inicio, fin)
+            resultado.reverse()
+            return resultado
+        return self._entre(desde, min(self._largo, desde + cantidad))
+
+    def _entre(self, inicio, fin):
+        if self._inicios is None:
+            self._inicios = [0, *accumulate(len(bloque) for bloque in self._bloques)]
+        resultado = []
+        i = bisect_right(self._inicios, inicio) - 1
+        posicion = inicio - self._inicios[i]
+        while len(resultado) < fin - inicio:
+            bloque = self._bloques[i]
+            resultado.extend(bloque[posicion:posicion + fin - inicio - len(resultado)])
+            i += 1
+            posicion = 0
+        return resultado
+
+    def __iter__(self):
+        for bloque in self._bloques:
+            yield from bloque
+
+
+class IndiceOrdenado:
+    """
+    Ventas de un estado ordenadas por un campo (desempate por ID)
+
+    Se registra como índice derivado del VentaStore; quitar() recibe la
+    venta con los valores viejos, así la clave siempre se encuentra
+    """
+
+    def __init__(self, campo, estado='Activa'):
+        if campo not in CLAVES_ORDEN:
+            raise ValueError(f"No se puede ordenar por {campo}")
+        self.campo = campo
+        self.estado = estado
+        # Campos de los que depende (ver VentaStore.actualizar)
+        self.campos = frozenset(('estado', campo))
+        self._clave = CLAVES_ORDEN[campo]
+        self._empaquetada = campo != 'cliente'
+        self._lista = ListaOrdenada()
+
+    def __len__(self):
+        return len(self._lista)
+
+    def _entrada(self, venta):
+        clave = self._clave(venta)
+        if self._empaquetada:
+            return (clave << BITS_ID) | venta['id']
+        return (clave, venta['id'])
+
+    def agregar(self, venta):
+        if self.estado is not None and venta['estado'] != self.estado:
+            return
+        self._lista.agregar(self._entrada(venta))
+
+    def quitar(self, venta):
+        if self.estado is not None and venta['estado'] != self.estado:
+            return
+        self._lista.quitar(self._entrada(venta))
+
+    def pagina(self, desde, cantidad, descendente=False):
+        """
+        Args:
+            desde (int): Cuántas ventas saltear
+            cantidad (int): Tamaño de la página
+            descendente (bool): De mayor a menor
+        Returns:
+            list: IDs de las ventas de la página, en orden
+        """
+        entradas = self._lista.rebanada(desde, cantidad, descendente)
+        if self._empaquetada:
+            return [entrada & MASCARA_ID for entrada in entradas]
+        return [entrada[1] for entrada in entradas]
@@ -0,0 +1,231 @@
+# ========================================
+# MÉTRICAS DE LA APLICACIÓN - Carloszerpav
+# ========================================
+# Para ver dónde se va el tiempo cuando hay carga, en vez de llenar la
+# consola de prints
+#
+# - Por ruta: cantidad de requests (por método y código), errores e
+#   histogramas de latencia, tiempo de plantilla y tiempo de datos
+#   (todo lo que no es renderizar: leer el libro, calcular, serializar)
+# - Medidores que se leen al momento de exportar (tamaño del libro,
+#   saldo pendiente, ...)
+# - /metrics en formato de texto de Prometheus
+# - Las requests lentas quedan en el log con la ruta y sus parámetros
+#
+# Las métricas son de cada proceso: con varios workers de gunicorn cada
+# uno lleva las suyas
+
+import threading
+import time
+from bisect import bisect_left
+
+from flask import before_render_template, g, request, template_rendered
+
+# Límites de los buckets de latencia en segundos (los de Prometheus)
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Ruta que se usa cuando la URL no coincide con ninguna (404)
+SIN_RUTA = 'sin_ruta'
+
+
+class Histograma:
+    """
+    Histograma acumulado como los de Prometheus (conteo por bucket, suma y total)
+    """
+    __slots__ = ('limites', 'conteos', 'suma', 'total')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.conteos = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulados(self):
+        """
+        Yields:
+            tuple: (límite 'le', cantidad de observaciones <= límite)
+        """
+        acumulado = 0
+        for limite, conteo in zip(self.limites, self.conteos):
+            acumulado += conteo
+            yield _numero(limite), acumulado
+        yield '+Inf', self.total
+
+
+def _numero(valor):
+    # 0.5 -> '0.5', 1.0 -> '1' (como los escribe Prometheus)
+    return repr(float(valor)).removesuffix('.0')
+
+
+def _etiqueta(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(**etiquetas):
+    return '{' + ','.join(f'{clave}="{_etiqueta(valor)}"' for clave, valor in etiquetas.items()) + '}'
+
+
+class Metricas:
+    """
+    Contadores, histogramas y medidores de las requests de la app
+    """
+
+    def __init__(self, limites=BUCKETS_LATENCIA, umbral_lento=0.5, logger=None):
+        """
+        Args:
+            limites (tuple): Buckets de los histogramas (segundos)
+            umbral_lento (float): Desde cuántos segundos una request va al log
+                como lenta (None = no registrar)
+            logger: Logger para las requests lentas
+        """
+        self.limites = tuple(limites)
+        self.umbral_lento = umbral_lento
+        self.logger = logger
+        self.inicio = time.time()
+        self._cerrojo = threading.Lock()
+        self.solicitudes = {}   # (ruta, método, código) -> cantidad
+        self.errores = {}       # ruta -> excepciones y respuestas 5xx
+        self.latencia = {}      # ruta -> Histograma (request completa)
+        self.plantilla = {}     # ruta -> Histograma (render_template)
+        self.datos = {}         # ruta -> Histograma (latencia - plantilla)
+        self.lentas = 0
+        self.medidores = {}     # nombre -> (ayuda, función sin argumentos, tipo)
+
+    def _histograma(self, tabla, ruta):
+        histograma = tabla.get(ruta)
+        if histograma is None:
+            histograma = tabla[ruta] = Histograma(self.limites)
+        return histograma
+
+    def registrar_medidor(self, nombre, ayuda, funcion, tipo='gauge'):
+        """
+        Args:
+            nombre (str): Nombre de la métrica (ej. 'ventas_libro_ventas')
+            ayuda (str): Descripción para el # HELP
+            funcion (callable): Devuelve el valor actual al exportar
+            tipo (str): 'gauge', o 'counter' si el valor solo sube
+        """
+        self.medidores[nombre] = (ayuda, funcion, tipo)
+
+    def observar(self, ruta, metodo, codigo, duracion, tiempo_plantilla=0.0, error=False):
+        """
+        Registra una request terminada
+        Args:
+            ruta (str): Regla de la ruta (ej. '/historial/<int:venta_id>')
+            metodo (str): GET, POST, ...
+            codigo (int): Código HTTP de la respuesta
+            duracion (float): Segundos de la request completa
+            tiempo_plantilla (float): Segundos dentro de render_template
+            error (bool): Terminó con una excepción sin manejar
+        Returns:
+            bool: True si la request fue lenta
+        """
+        lenta = self.umbral_lento is not None and duracion >= self.umbral_lento
+        with self._cerrojo:
+            clave = (ruta, metodo, codigo)
+            self.solicitudes[clave] = self.solicitudes.get(clave, 0) + 1
+            if error or codigo >= 500:
+                self.errores[ruta] = self.errores.get(ruta, 0) + 1
+            self._histograma(self.latencia, ruta).observar(duracion)
+            self._histograma(self.datos, ruta).observar(max(0.0, duracion - tiempo_plantilla))
+            if tiempo_plantilla:
+                self._histograma(self.plantilla, ruta).observar(tiempo_plantilla)
+            if lenta:
+                self.lentas += 1
+        return lenta
+
+    def exportar(self):
+        """
+        Returns:
+            str: Todas las métricas en formato de texto de Prometheus
+        """
+        lineas = []
+
+        def encabezado(nombre, tipo, ayuda):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+
+        def histogramas(nombre, ayuda, tabla):
+            encabezado(nombre, 'histogram', ayuda)
+            for ruta, histograma in sorted(tabla.items()):
+                for limite, acumulado in histograma.acumulados():
+                    lineas.append(f"{nombre}_bucket{_etiquetas(ruta=ruta, le=limite)} {acumulado}")
+                lineas.append(f"{nombre}_sum{_etiquetas(ruta=ruta)} {histograma.suma!r}")
+                lineas.append(f"{nombre}_count{_etiquetas(ruta=ruta)} {histograma.total}")
+
+        with self._cerrojo:
+            encabezado('ventas_http_solicitudes_total', 'counter', 'Requests atendidas por ruta, método y código')
+            for (ruta, metodo, codigo), cantidad in sorted(self.solicitudes.items()):
+                lineas.append(f"ventas_http_solicitudes_total{_etiquetas(ruta=ruta, metodo=metodo, codigo=codigo)} {cantidad}")
+
+            encabezado('ventas_http_errores_total', 'counter', 'Requests con excepción o respuesta 5xx por ruta')
+            for ruta, cantidad in sorted(self.errores.items()):
+                lineas.append(f"ventas_http_errores_total{_etiquetas(ruta=ruta)} {cantidad}")
+
+            encabezado('ventas_http_lentas_total', 'counter', 'Requests que superaron el umbral de lentitud')
+            lineas.append(f"ventas_http_lentas_total {self.lentas}")
+
+            histogramas('ventas_http_latencia_segundos', 'Duración de la request completa', self.latencia)
+            histogramas('ventas_http_plantilla_segundos', 'Tiempo dentro de render_template', self.plantilla)
+            histogramas('ventas_http_datos_segundos', 'Tiempo fuera de la plantilla (datos y lógica)', self.datos)
+
+        # Los medidores se leen fuera del cerrojo: pueden tardar un poco
+        for nombre, (ayuda, funcion, tipo) in self.medidores.items():
+            encabezado(nombre, tipo, ayuda)
+            lineas.append(f"{nombre} {_numero(funcion())}")
+
+        encabezado('ventas_proceso_inicio_segundos', 'gauge', 'Hora de arranque del proceso (epoch)')
+        lineas.append(f"ventas_proceso_inicio_segundos {self.inicio!r}")
+        return '\n'.join(lineas) + '\n'
+
+    def instrumentar(self, app):
+        """
+        Mide cada request de la app Flask
+
+        Registrar antes que los demás before_request para que el tiempo
+        incluya todo lo que corre antes de la vista
+        """
+        @app.before_request
+        def iniciar_medicion():
+            g.metricas_inicio = time.perf_counter()
+            g.metricas_plantilla = 0.0
+
+        @app.after_request
+        def guardar_codigo(respuesta):
+            g.metricas_codigo = respuesta.status_code
+            return respuesta
+
+        @app.teardown_request
+        def terminar_medicion(error=None):
+            # teardown corre al cerrar el contexto: con stream_with_context
+            # eso es después de mandar el último bloque
+            inicio = g.pop('metricas_inicio', None)
+            if inicio is None:
+                return
+            duracion = time.perf_counter() - inicio
+            tiempo_plantilla = g.pop('metricas_plantilla', 0.0)
+            codigo = g.pop('metricas_codigo', 500)
+            ruta = request.url_rule.rule if request.url_rule is not None else SIN_RUTA
+            lenta = self.observar(ruta, request.method, codigo, duracion, tiempo_plantilla, error is not None)
+            if lenta and self.logger is not None:
+                self.logger.warning(
+                    "Request lenta: %s %s (%s) %.0f ms [plantilla %.0f ms] parametros=%s query=%s",
+                    request.method, ruta, request.path, duracion * 1000, tiempo_plantilla * 1000,
+                    request.view_args or {}, request.args.to_dict(flat=False))
+
+        def antes_de_plantilla(sender, template, context, **extra):
+            g.metricas_plantilla_desde = time.perf_counter()
+
+        def despues_de_plantilla(sender, template, context, **extra):
+            desde = g.pop('metricas_plantilla_desde', None)
+            if desde is not None:
+                g.metricas_plantilla = g.get('metricas_plantilla', 0.0) + time.perf_counter() - desde
+
+        # weak=False: las funciones son locales y si no se perderían
+        before_render_template.connect(antes_de_plantilla, app, weak=False)
+        template_rendered.connect(despues_de_plantilla, app, weak=False)
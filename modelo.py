@@ -0,0 +1,354 @@
+# ========================================
+# MODELO COMPACTO DE VENTAS - Carloszerpav
+# ========================================
+# Cada venta era un dict de 13 claves con fechas en texto, una lista de
+# rubros y una lista de dicts de pagos: pesa mucho por registro
+#
+# Aquí la guardo compacta:
+# - Venta usa __slots__ (sin dict por objeto)
+# - Fechas como número de día / minutos, estado como entero chico
+# - Rubros como máscara de bits sobre el catálogo de rubros
+# - Pagos en un libro de arreglos (array) por cada carga del almacén y
+#   cada venta solo guarda su libro y las posiciones de sus pagos
+#
+# Por fuera se ve igual que antes: venta['cliente'], venta.get(...),
+# venta.rubros en las plantillas, a_dict() para JSON
+
+import sys
+from array import array
+from datetime import date, datetime, timedelta
+
+ESTADOS = ('Activa', 'Cerrada')
+
+CAMPOS_VENTA = ('id', 'cliente', 'valor_total', 'abono', 'saldo_pendiente', 'rubros', 'fecha',
+                'fecha_registro', 'estado', 'historial_pagos', 'total_pagos',
+                'incluida_en_estadisticas', 'mes_cierre')
+_CAMPOS = frozenset(CAMPOS_VENTA)
+
+FORMATO_FECHA_HORA = "%Y-%m-%d %H:%M"
+_EPOCA = datetime(1970, 1, 1)
+_ORDINAL_EPOCA = _EPOCA.toordinal()
+
+# Catálogo de rubros para la máscara de bits (lo configura app.py)
+_catalogo_rubros = []
+_bit_rubro = {}
+
+
+def configurar_rubros(rubros):
+    """
+    Define el catálogo de rubros que usan las máscaras de bits
+    Args:
+        rubros (list): Rubros en su orden oficial
+    """
+    _catalogo_rubros[:] = list(rubros)
+    _bit_rubro.clear()
+    _bit_rubro.update({rubro: 1 << i for i, rubro in enumerate(_catalogo_rubros)})
+
+
+def _fecha_a_dia(fecha):
+    # Número de día; si no es exactamente 'YYYY-MM-DD' guardo el texto tal
+    # cual para devolverlo sin cambios (fromisoformat es más rápido que strptime)
+    try:
+        if len(fecha) == 10 and fecha[4] == '-' and fecha[7] == '-':
+            return date.fromisoformat(fecha).toordinal()
+    except (TypeError, ValueError):
+        pass
+    return fecha
+
+
+def _dia_a_fecha(dia):
+    if isinstance(dia, int):
+        return date.fromordinal(dia).isoformat()
+    return dia
+
+
+def _fecha_hora_a_minutos(fecha):
+    try:
+        if len(fecha) == 16 and fecha[10] == ' ' and fecha[13] == ':':
+            return int((datetime.fromisoformat(fecha) - _EPOCA).total_seconds()) // 60
+    except (TypeError, ValueError):
+        pass
+    return fecha
+
+
+def _minutos_a_fecha_hora(minutos):
+    if isinstance(minutos, int):
+        return (_EPOCA + timedelta(minutes=minutos)).strftime(FORMATO_FECHA_HORA)
+    return minutos
+
+
+class LibroPagos:
+    """
+    Todos los pagos en arreglos paralelos (una columna por campo)
+    Cada pago ocupa ~26 bytes en vez de un dict de ~400
+    """
+
+    def __init__(self):
+        self.venta_id = array('q')
+        self.monto = array('d')
+        self.minutos = array('q')
+        self.tipo = array('H')
+        self._tipos = []
+        self._codigo_tipo = {}
+        # Fechas que no se pudieron convertir: posición -> texto original
+        self._fechas_texto = {}
+
+    def __len__(self):
+        return len(self.monto)
+
+    def agregar(self, venta_id, monto, fecha, tipo):
+        """
+        Agrega un pago al libro
+        Returns:
+            int: Posición del pago en el libro
+        """
+        codigo = self._codigo_tipo.get(tipo)
+        if codigo is None:
+            codigo = self._codigo_tipo[tipo] = len(self._tipos)
+            self._tipos.append(tipo)
+
+        posicion = len(self.monto)
+        minutos = _fecha_hora_a_minutos(fecha)
+        if not isinstance(minutos, int):
+            self._fechas_texto[posicion] = minutos
+            minutos = -1
+
+        self.venta_id.append(venta_id)
+        self.monto.append(float(monto))
+        self.minutos.append(minutos)
+        self.tipo.append(codigo)
+        return posicion
+
+    def fecha(self, posicion):
+        """
+        Returns:
+            str: Fecha del pago en formato 'YYYY-MM-DD HH:MM'
+        """
+        texto = self._fechas_texto.get(posicion)
+        if texto is not None:
+            return texto
+        return _minutos_a_fecha_hora(self.minutos[posicion])
+
+    def dia(self, posicion):
+        """
+        Returns:
+            int: Número de día del pago (date.toordinal) o None si su fecha
+                 no empieza con 'YYYY-MM-DD'
+        """
+        minutos = self.minutos[posicion]
+        if minutos >= 0:
+            return _ORDINAL_EPOCA + minutos // 1440
+        dia = _fecha_a_dia(str(self._fechas_texto.get(posicion, ''))[:10])
+        return dia if isinstance(dia, int) else None
+
+    def compactar(self, ventas):
+        """
+        Deja en el libro solo los pagos de estas ventas (los de ventas que
+        ya no están no se vuelven a leer) y les renumera las posiciones
+        Args:
+            ventas (iterable): Todas las ventas que usan este libro
+        Returns:
+            int: Cuántos pagos se descartaron
+        """
+        antes = len(self.monto)
+        venta_id, monto, minutos, tipo = array('q'), array('d'), array('q'), array('H')
+        fechas_texto = {}
+        for venta in ventas:
+            posiciones = []
+            for posicion in venta._pagos:
+                if posicion in self._fechas_texto:
+                    fechas_texto[len(monto)] = self._fechas_texto[posicion]
+                posiciones.append(len(monto))
+                venta_id.append(self.venta_id[posicion])
+                monto.append(self.monto[posicion])
+                minutos.append(self.minutos[posicion])
+                tipo.append(self.tipo[posicion])
+            venta._pagos = tuple(posiciones)
+        self.venta_id, self.monto, self.minutos, self.tipo = venta_id, monto, minutos, tipo
+        self._fechas_texto = fechas_texto
+        return antes - len(monto)
+
+    def como_dict(self, posicion, numero):
+        """
+        Arma el pago como dict (la forma de historial_pagos)
+        Args:
+            posicion (int): Posición en el libro
+            numero (int): Número del pago dentro de su venta
+        """
+        return {
+            'id': numero,
+            'monto': self.monto[posicion],
+            'fecha': self.fecha(posicion),
+            'tipo': self._tipos[self.tipo[posicion]]
+        }
+
+
+class Venta:
+    """
+    Registro compacto de una venta con vista tipo dict
+    """
+
+    __slots__ = ('id', 'cliente', 'valor_total', 'abono', 'saldo_pendiente', '_rubros', '_dia',
+                 '_fecha_registro', '_estado', '_libro', '_pagos', 'incluida_en_estadisticas', 'mes_cierre')
+
+    def __init__(self, id, cliente, valor_total, abono, saldo_pendiente, rubros, fecha,
+                 fecha_registro, estado, incluida_en_estadisticas=True, mes_cierre=None, libro=None):
+        self.id = id
+        self.cliente = sys.intern(str(cliente))
+        self.valor_total = valor_total
+        self.abono = abono
+        self.saldo_pendiente = saldo_pendiente
+        self.rubros = rubros
+        self.fecha = fecha
+        self.fecha_registro = fecha_registro
+        self.estado = estado
+        self._libro = libro
+        self._pagos = ()
+        self.incluida_en_estadisticas = incluida_en_estadisticas
+        self.mes_cierre = mes_cierre
+
+    @classmethod
+    def desde_dict(cls, datos, libro):
+        """
+        Crea una venta compacta desde su forma dict (diario, instantánea, import)
+        Args:
+            datos (dict): La venta en su forma dict
+            libro (LibroPagos): Libro donde van sus pagos (el del libro de ventas)
+        """
+        venta = cls(
+            datos['id'], datos['cliente'], datos['valor_total'], datos['abono'],
+            datos['saldo_pendiente'], datos['rubros'], datos['fecha'],
+            datos.get('fecha_registro'), datos['estado'],
+            datos.get('incluida_en_estadisticas', True), datos.get('mes_cierre'), libro
+        )
+        for pago in datos.get('historial_pagos', ()):
+            venta.agregar_pago(pago)
+        return venta
+
+    # ---- Campos compactos ----
+
+    @property
+    def rubros(self):
+        if isinstance(self._rubros, int):
+            return [rubro for rubro in _catalogo_rubros if self._rubros & _bit_rubro[rubro]]
+        return list(self._rubros)
+
+    @rubros.setter
+    def rubros(self, rubros):
+        rubros = list(rubros)
+        if all(rubro in _bit_rubro for rubro in rubros):
+            mascara = 0
+            for rubro in rubros:
+                mascara |= _bit_rubro[rubro]
+            self._rubros = mascara
+        else:
+            # Rubro fuera del catálogo: lo guardo como tupla para no perderlo
+            self._rubros = tuple(rubros)
+
+    @property
+    def fecha(self):
+        return _dia_a_fecha(self._dia)
+
+    @fecha.setter
+    def fecha(self, fecha):
+        self._dia = _fecha_a_dia(fecha)
+
+    @property
+    def dia(self):
+        """
+        Returns:
+            int: Número de día de la venta o None si la fecha no es válida
+        """
+        return self._dia if isinstance(self._dia, int) else None
+
+    @property
+    def fecha_registro(self):
+        return _minutos_a_fecha_hora(self._fecha_registro)
+
+    @fecha_registro.setter
+    def fecha_registro(self, fecha):
+        self._fecha_registro = _fecha_hora_a_minutos(fecha)
+
+    @property
+    def estado(self):
+        if isinstance(self._estado, int):
+            return ESTADOS[self._estado]
+        return self._estado
+
+    @estado.setter
+    def estado(self, estado):
+        self._estado = ESTADOS.index(estado) if estado in ESTADOS else estado
+
+    @property
+    def historial_pagos(self):
+        return [self._libro.como_dict(posicion, numero) for numero, posicion in enumerate(self._pagos, 1)]
+
+    @property
+    def total_pagos(self):
+        return len(self._pagos)
+
+    @property
+    def posiciones_pagos(self):
+        """
+        Returns:
+            tuple: Posiciones de los pagos de esta venta en su libro de pagos
+        """
+        return self._pagos
+
+    def agregar_pago(self, pago):
+        """
+        Agrega un pago al libro de pagos y lo asocia a esta venta
+        Args:
+            pago (dict): {'monto', 'fecha', 'tipo'} ('id' se deduce del orden)
+        Returns:
+            int: Posición del pago en el libro de pagos
+        """
+        posicion = self._libro.agregar(self.id, pago['monto'], pago['fecha'], pago['tipo'])
+        self._pagos = self._pagos + (posicion,)
+        return posicion
+
+    # ---- Vista tipo dict ----
+
+    def __getitem__(self, campo):
+        if campo not in _CAMPOS:
+            raise KeyError(campo)
+        return getattr(self, campo)
+
+    def __setitem__(self, campo, valor):
+        if campo not in _CAMPOS or campo in ('historial_pagos', 'total_pagos'):
+            raise KeyError(campo)
+        setattr(self, campo, valor)
+
+    def __contains__(self, campo):
+        return campo in _CAMPOS
+
+    def __iter__(self):
+        return iter(CAMPOS_VENTA)
+
+    def __len__(self):
+        return len(CAMPOS_VENTA)
+
+    def get(self, campo, defecto=None):
+        if campo not in _CAMPOS:
+            return defecto
+        return getattr(self, campo)
+
+    def keys(self):
+        return CAMPOS_VENTA
+
+    def items(self):
+        return [(campo, getattr(self, campo)) for campo in CAMPOS_VENTA]
+
+    def update(self, cambios=(), **otros):
+        for campo, valor in dict(cambios, **otros).items():
+            self[campo] = valor
+
+    def a_dict(self):
+        """
+        Returns:
+            dict: La venta completa en su forma dict (para JSON y el diario)
+        """
+        return {campo: getattr(self, campo) for campo in CAMPOS_VENTA}
+
+    def __repr__(self):
+        return f"Venta(id={self.id!r}, cliente={self.cliente!r}, estado={self.estado!r})"
@@ -0,0 +1,864 @@
+# ========================================
+# PERSISTENCIA DEL LIBRO DE VENTAS - Carloszerpav
+# ========================================
+# Aquí guardo cada cambio de mis ventas en disco para no perder nada
+# cuando se reinicia el servidor (gunicorn, Render, etc.)
+#
+# Funciona como un diario (write-ahead log):
+# - Cada operación (agregar, pago, eliminar, cierre, archivar) se agrega
+#   al final de un archivo, una línea JSON por operación
+# - Los fsync se agrupan en lotes para no frenar cada escritura
+# - Cada cierto tiempo guardo una instantánea compacta de todo el libro
+#   y empiezo un diario nuevo, así al arrancar solo repito la cola
+# - La instantánea es JSON-lines (una cabecera y una venta por línea), así
+#   se escribe y se lee de a una venta sin armar todo el libro en memoria
+#
+# Con varios workers de gunicorn el diario no sirve (cada proceso tendría su
+# propio libro), para eso está AlmacenSQLite: una base compartida en modo WAL
+#
+# Cada almacén lleva además los resúmenes congelados de los cierres
+# mensuales (almacen.cierres, ver cierres.py): van dentro de la operación
+# 'cierre' y en la instantánea (o en su tabla de SQLite)
+#
+# AlmacenDiario pasa las ventas excluidas por un cierre a su archivo por
+# mes (archivo.py) con la operación 'archivar': la instantánea y el libro
+# en memoria quedan solo con las ventas que siguen en las estadísticas
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+from archivo import CARPETA_ARCHIVO, ArchivoVentas
+from cierres import acumular_cierre
+
+ARCHIVO_DIARIO = 'diario.log'
+ARCHIVO_INSTANTANEA = 'instantanea.jsonl'
+# Nombre de la instantánea antes de pasar a JSON-lines
+ARCHIVO_INSTANTANEA_VIEJA = 'instantanea.json'
+
+ARCHIVO_SQLITE = 'ventas.db'
+
+# Modos de sincronización con el disco
+MODOS_SYNC = ('siempre', 'lote', 'nunca')
+
+# Nivel de PRAGMA synchronous de SQLite para cada modo
+SYNC_SQLITE = {'siempre': 'FULL', 'lote': 'NORMAL', 'nunca': 'OFF'}
+
+
+def aplicar_operacion(ventas_por_id, operacion, fabrica):
+    """
+    Repite una operación del diario sobre el libro en memoria
+    Args:
+        ventas_por_id (dict): Ventas indexadas por ID, en orden de registro
+        operacion (dict): Operación leída del diario
+        fabrica (callable): Crea el registro de una venta desde su dict
+            (debe ofrecer update() y agregar_pago(), ver modelo.Venta)
+    Returns:
+        int: El siguiente ID a usar según esta operación (0 si no aplica)
+    """
+    tipo = operacion['op']
+
+    if tipo == 'agregar':
+        venta = fabrica(operacion['venta'])
+        ventas_por_id[venta['id']] = venta
+        return venta['id'] + 1
+
+    if tipo == 'pago':
+        venta = ventas_por_id.get(operacion['venta_id'])
+        if venta is not None:
+            venta.agregar_pago(operacion['pago'])
+            venta.update(
+                abono=operacion['abono'],
+                saldo_pendiente=operacion['saldo_pendiente'],
+                estado=operacion['estado']
+            )
+        return 0
+
+    if tipo == 'eliminar':
+        ventas_por_id.pop(operacion['id'], None)
+        return 0
+
+    if tipo == 'cierre':
+        for id in operacion['ids']:
+            venta = ventas_por_id.get(id)
+            if venta is not None:
+                venta['incluida_en_estadisticas'] = False
+                venta['mes_cierre'] = operacion['mes_cierre']
+        return 0
+
+    if tipo == 'archivar':
+        # Las ventas ya quedaron en su partición del archivo (ver archivo.py)
+        for id in operacion['ids']:
+            ventas_por_id.pop(id, None)
+        return 0
+
+    raise ValueError(f"Operación desconocida en el diario: {tipo}")
+
+
+def aplicar_cierre(cierres, operacion):
+    """
+    Suma a los cierres mensuales el resumen de una operación 'cierre'
+    (las demás operaciones y los cierres sin resumen no cambian nada)
+    Args:
+        cierres (dict): mes_cierre -> resumen
+        operacion (dict): Operación del diario
+    """
+    if operacion['op'] == 'cierre' and operacion.get('resumen'):
+        acumular_cierre(cierres, operacion['resumen'])
+
+
+class Diario:
+    """
+    Archivo de solo-agregar con commit en grupo
+
+    En modo 'lote' cada registro se escribe y se pasa al sistema operativo
+    de inmediato (sobrevive a que se caiga el proceso), pero el fsync se
+    hace para varios registros a la vez: cuando se juntan `lote_sync`
+    pendientes o cada `intervalo_sync` segundos desde un hilo de fondo.
+    """
+
+    def __init__(self, ruta, modo_sync='lote', intervalo_sync=0.05, lote_sync=256):
+        if modo_sync not in MODOS_SYNC:
+            raise ValueError(f"Modo de sincronización no válido: {modo_sync}")
+
+        self.ruta = ruta
+        self.modo_sync = modo_sync
+        self.intervalo_sync = intervalo_sync
+        self.lote_sync = lote_sync
+
+        self._archivo = open(ruta, 'ab')
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._cerrado = False
+
+        self._hilo = None
+        if modo_sync == 'lote':
+            self._hilo = threading.Thread(target=self._sincronizar_periodicamente, daemon=True)
+            self._hilo.start()
+
+    def escribir(self, linea):
+        """
+        Agrega una línea al diario
+        Args:
+            linea (bytes): Registro ya serializado, terminado en salto de línea
+        """
+        with self._lock:
+            self._archivo.write(linea)
+            self._archivo.flush()
+            if self.modo_sync == 'siempre':
+                os.fsync(self._archivo.fileno())
+                return
+            self._pendientes += 1
+            if self.modo_sync != 'lote' or self._pendientes < self.lote_sync:
+                return
+            self._pendientes = 0
+            fd = self._archivo.fileno()
+        # El fsync va fuera del lock para que otros escritores sigan agregando
+        os.fsync(fd)
+
+    def sincronizar(self):
+        """
+        Fuerza a disco todo lo escrito hasta ahora
+        """
+        with self._lock:
+            if self._cerrado:
+                return
+            self._archivo.flush()
+            self._pendientes = 0
+            fd = self._archivo.fileno()
+        os.fsync(fd)
+
+    def _sincronizar_periodicamente(self):
+        while not self._cerrado:
+            time.sleep(self.intervalo_sync)
+            if self._pendientes:
+                try:
+                    self.sincronizar()
+                except (OSError, ValueError):
+                    # El archivo se cerró mientras esperaba
+                    pass
+
+    def cerrar(self):
+        """
+        Sincroniza y cierra el archivo del diario
+        """
+        self.sincronizar()
+        with self._lock:
+            self._cerrado = True
+            self._archivo.close()
+
+
+class AlmacenMemoria:
+    """
+    Almacén sin persistencia - las ventas viven solo en memoria
+    Es el comportamiento original, útil para pruebas y benchmarks
+    """
+
+    # Solo AlmacenSQLite se comparte entre procesos
+    compartido = False
+    # Solo AlmacenSQLite deshace lo registrado si la transacción falla
+    transaccional = False
+    # Solo AlmacenDiario pasa las ventas excluidas al archivo
+    archivo = None
+
+    def __init__(self):
+        self.cierres = {}
+        self.operaciones_con_clave = []
+
+    def cargar(self, fabrica):
+        """
+        Returns:
+            tuple: (lista de ventas, siguiente ID)
+        """
+        return [], 1
+
+    def registrar(self, operacion):
+        aplicar_cierre(self.cierres, operacion)
+
+    def debe_compactar(self, total_ventas):
+        return False
+
+    def compactar(self, ventas, contador_id):
+        pass
+
+    def transaccion(self):
+        return nullcontext()
+
+    def leer_cambios(self):
+        return []
+
+    def hay_cambios(self):
+        return False
+
+    def cerrar(self):
+        pass
+
+
+class AlmacenDiario:
+    """
+    Almacén en disco: diario de operaciones + instantáneas compactas
+
+    Al arrancar carga la última instantánea y repite solo las operaciones
+    del diario con número de secuencia (lsn) mayor al de la instantánea.
+    """
+
+    compartido = False
+    # Lo registrado ya está en el diario aunque la escritura falle después
+    transaccional = False
+
+    def __init__(self, directorio, modo_sync='lote', intervalo_sync=0.05,
+                 lote_sync=256, compactar_minimo=10000, compactar_proporcion=0.5,
+                 archivar=True):
+        self.directorio = directorio
+        self.modo_sync = modo_sync
+        self.intervalo_sync = intervalo_sync
+        self.lote_sync = lote_sync
+        # Compacto cuando la cola supera el mínimo y una proporción del libro,
+        # así el costo de las instantáneas queda amortizado por operación
+        self.compactar_minimo = compactar_minimo
+        self.compactar_proporcion = compactar_proporcion
+
+        self.ruta_diario = os.path.join(directorio, ARCHIVO_DIARIO)
+        self.ruta_instantanea = os.path.join(directorio, ARCHIVO_INSTANTANEA)
+
+        self.lsn = 0
+        self.operaciones_en_cola = 0
+        self.cierres = {}
+        self.operaciones_con_clave = []
+        self._diario = None
+        self._lock = threading.Lock()
+        # Particiones por mes de cierre con las ventas excluidas
+        self.archivo = ArchivoVentas(os.path.join(directorio, CARPETA_ARCHIVO)) if archivar else None
+
+        # Métricas del último arranque
+        self.tiempo_carga = 0.0
+        self.operaciones_repetidas = 0
+
+    def cargar(self, fabrica):
+        """
+        Reconstruye el libro desde la instantánea y la cola del diario
+        Args:
+            fabrica (callable): Crea el registro de una venta desde su dict
+        Returns:
+            tuple: (lista de ventas, siguiente ID)
+        """
+        inicio = time.perf_counter()
+        os.makedirs(self.directorio, exist_ok=True)
+
+        ventas_por_id = {}
+        contador_id = 1
+        lsn_instantanea = 0
+        self.cierres = {}
+
+        vieja = os.path.join(self.directorio, ARCHIVO_INSTANTANEA_VIEJA)
+        if not os.path.exists(self.ruta_instantanea) and os.path.exists(vieja):
+            os.replace(vieja, self.ruta_instantanea)
+
+        if os.path.exists(self.ruta_instantanea):
+            with open(self.ruta_instantanea, 'rb') as f:
+                cabecera = json.loads(f.readline())
+                lsn_instantanea = cabecera['lsn']
+                contador_id = cabecera['contador_id']
+                self.cierres = cabecera.get('cierres', {})
+                # Formato viejo: todo el libro en un solo JSON
+                filas = cabecera['ventas'] if 'ventas' in cabecera else (json.loads(linea) for linea in f)
+                for datos in filas:
+                    venta = fabrica(datos)
+                    ventas_por_id[venta['id']] = venta
+
+        self.lsn = lsn_instantanea
+        self.operaciones_repetidas = 0
+        # Las claves de idempotencia de la API siguen valiendo después de
+        # reiniciar (solo las del diario: lo compactado ya no se reintenta)
+        self.operaciones_con_clave = []
+
+        if os.path.exists(self.ruta_diario):
+            valido_hasta = 0
+            with open(self.ruta_diario, 'rb') as f:
+                for linea in f:
+                    # Última línea cortada por una caída - se descarta
+                    # (sin el salto de línea la escritura no terminó, aunque
+                    # el JSON esté completo: lo siguiente quedaría pegado)
+                    if not linea.endswith(b'\n'):
+                        break
+                    try:
+                        operacion = json.loads(linea)
+                    except ValueError:
+                        break
+                    valido_hasta += len(linea)
+                    if operacion['lsn'] <= lsn_instantanea:
+                        continue
+                    contador_id = max(contador_id, aplicar_operacion(ventas_por_id, operacion, fabrica))
+                    aplicar_cierre(self.cierres, operacion)
+                    if 'clave' in operacion:
+                        self.operaciones_con_clave.append(operacion)
+                    self.lsn = operacion['lsn']
+                    self.operaciones_repetidas += 1
+            if valido_hasta < os.path.getsize(self.ruta_diario):
+                with open(self.ruta_diario, 'r+b') as f:
+                    f.truncate(valido_hasta)
+
+        self.operaciones_en_cola = self.operaciones_repetidas
+        self._abrir_diario()
+        self.tiempo_carga = time.perf_counter() - inicio
+
+        return list(ventas_por_id.values()), contador_id
+
+    def _abrir_diario(self):
+        self._diario = Diario(self.ruta_diario, self.modo_sync, self.intervalo_sync, self.lote_sync)
+
+    def registrar(self, operacion):
+        """
+        Agrega una operación al diario
+        Args:
+            operacion (dict): Operación a guardar (debe tener la clave 'op')
+        """
+        with self._lock:
+            self.lsn += 1
+            registro = dict(operacion, lsn=self.lsn)
+            linea = json.dumps(registro, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+            self.operaciones_en_cola += 1
+            aplicar_cierre(self.cierres, operacion)
+            diario = self._diario
+        diario.escribir(linea)
+
+    def debe_compactar(self, total_ventas):
+        """
+        Indica si ya vale la pena guardar una instantánea nueva
+        """
+        umbral = max(self.compactar_minimo, int(total_ventas * self.compactar_proporcion))
+        return self.operaciones_en_cola >= umbral
+
+    def compactar(self, ventas, contador_id):
+        """
+        Guarda una instantánea del libro completo y empieza un diario vacío
+        Args:
+            ventas (iterable): Todas las ventas actuales, como dicts
+            contador_id (int): Siguiente ID a usar
+        """
+        with self._lock:
+            self._diario.cerrar()
+
+            temporal = self.ruta_instantanea + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'lsn': self.lsn, 'contador_id': contador_id, 'formato': 2,
+                                    'cierres': self.cierres}, ensure_ascii=False) + '\n')
+                for venta in ventas:
+                    f.write(json.dumps(venta, ensure_ascii=False, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, self.ruta_instantanea)
+            _sincronizar_directorio(self.directorio)
+
+            # Si el proceso se cae aquí, el diario viejo se ignora por su lsn
+            os.remove(self.ruta_diario)
+            self._abrir_diario()
+            self.operaciones_en_cola = 0
+
+    def transaccion(self):
+        # Un solo proceso: el cerrojo de la app ya ordena las escrituras
+        return nullcontext()
+
+    def leer_cambios(self):
+        return []
+
+    def hay_cambios(self):
+        return False
+
+    def cerrar(self):
+        if self._diario is not None:
+            self._diario.cerrar()
+
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS ventas (
+    id INTEGER PRIMARY KEY,
+    cliente TEXT NOT NULL,
+    valor_total REAL NOT NULL,
+    abono REAL NOT NULL,
+    saldo_pendiente REAL NOT NULL,
+    rubros TEXT NOT NULL,
+    fecha TEXT,
+    fecha_registro TEXT,
+    estado TEXT NOT NULL,
+    incluida_en_estadisticas INTEGER NOT NULL DEFAULT 1,
+    mes_cierre TEXT
+);
+CREATE INDEX IF NOT EXISTS ventas_fecha ON ventas (fecha);
+CREATE INDEX IF NOT EXISTS ventas_estado ON ventas (estado);
+CREATE INDEX IF NOT EXISTS ventas_cliente ON ventas (cliente);
+
+CREATE TABLE IF NOT EXISTS pagos (
+    venta_id INTEGER NOT NULL,
+    numero INTEGER NOT NULL,
+    monto REAL NOT NULL,
+    fecha TEXT,
+    tipo TEXT,
+    PRIMARY KEY (venta_id, numero)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS diario (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    origen TEXT NOT NULL,
+    operacion TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS cierres (
+    mes_cierre TEXT PRIMARY KEY,
+    resumen TEXT NOT NULL
+);
+"""
+
+# Sentencias fijas: sqlite3 las prepara una vez por conexión y las reutiliza
+SQL_INSERTAR_VENTA = (
+    "INSERT INTO ventas (id, cliente, valor_total, abono, saldo_pendiente, rubros, fecha, "
+    "fecha_registro, estado, incluida_en_estadisticas, mes_cierre) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_INSERTAR_PAGO = "INSERT INTO pagos (venta_id, numero, monto, fecha, tipo) VALUES (?, ?, ?, ?, ?)"
+SQL_ACTUALIZAR_SALDO = "UPDATE ventas SET abono = ?, saldo_pendiente = ?, estado = ? WHERE id = ?"
+SQL_CERRAR_VENTA = "UPDATE ventas SET incluida_en_estadisticas = 0, mes_cierre = ? WHERE id = ?"
+SQL_ELIMINAR_PAGOS = "DELETE FROM pagos WHERE venta_id = ?"
+SQL_ELIMINAR_VENTA = "DELETE FROM ventas WHERE id = ?"
+SQL_INSERTAR_DIARIO = "INSERT INTO diario (origen, operacion) VALUES (?, ?)"
+SQL_LEER_DIARIO = "SELECT seq, origen, operacion FROM diario WHERE seq > ? ORDER BY seq"
+SQL_ULTIMO_SEQ = "SELECT COALESCE(MAX(seq), 0) FROM diario"
+SQL_HAY_CAMBIOS = (
+    "SELECT EXISTS (SELECT 1 FROM diario WHERE seq > ?) "
+    "OR EXISTS (SELECT 1 FROM meta WHERE clave = 'diario_recortado_hasta' AND valor > ?)"
+)
+# Solo las operaciones con clave de idempotencia (dentro de un texto JSON
+# las comillas van escapadas, así que '"clave":' solo calza con el campo)
+SQL_LEER_DIARIO_CON_CLAVE = "SELECT operacion FROM diario WHERE operacion LIKE '%\"clave\":%' ORDER BY seq"
+SQL_RECORTAR_DIARIO = "DELETE FROM diario WHERE seq <= ?"
+SQL_LEER_META = "SELECT valor FROM meta WHERE clave = ?"
+SQL_SUBIR_META = (
+    "INSERT INTO meta (clave, valor) VALUES (?, ?) "
+    "ON CONFLICT (clave) DO UPDATE SET valor = MAX(valor, excluded.valor)"
+)
+SQL_LEER_VENTAS = (
+    "SELECT id, cliente, valor_total, abono, saldo_pendiente, rubros, fecha, fecha_registro, "
+    "estado, incluida_en_estadisticas, mes_cierre FROM ventas ORDER BY id"
+)
+SQL_LEER_PAGOS = "SELECT venta_id, numero, monto, fecha, tipo FROM pagos ORDER BY venta_id, numero"
+SQL_LEER_CIERRES = "SELECT mes_cierre, resumen FROM cierres"
+SQL_LEER_CIERRE = "SELECT resumen FROM cierres WHERE mes_cierre = ?"
+SQL_GUARDAR_CIERRE = (
+    "INSERT INTO cierres (mes_cierre, resumen) VALUES (?, ?) "
+    "ON CONFLICT (mes_cierre) DO UPDATE SET resumen = excluded.resumen"
+)
+
+
+class AlmacenSQLite:
+    """
+    Almacén compartido en SQLite (modo WAL) para varios workers
+
+    - Las tablas ventas/pagos siempre tienen el libro al día
+    - Cada escritura va en una transacción BEGIN IMMEDIATE, que además es
+      el cerrojo entre procesos: dos workers nunca escriben a la vez
+    - Cada operación también queda en la tabla diario, así los demás
+      procesos se ponen al día leyendo solo lo nuevo (leer_cambios)
+    - Una conexión por hilo (y por proceso, por si gunicorn hace fork)
+    """
+
+    compartido = True
+    # Un error dentro de la transacción hace ROLLBACK de todo lo registrado
+    transaccional = True
+    # Varios workers escribirían las mismas particiones: las ventas
+    # excluidas se quedan en las tablas
+    archivo = None
+
+    def __init__(self, ruta, modo_sync='lote', compactar_minimo=10000, timeout=30.0):
+        if modo_sync not in MODOS_SYNC:
+            raise ValueError(f"Modo de sincronización no válido: {modo_sync}")
+
+        self.ruta = ruta
+        self.modo_sync = modo_sync
+        self.timeout = timeout
+        # Filas del diario que se conservan al recortarlo; un worker que se
+        # quede más atrás que eso recarga el libro completo
+        self.compactar_minimo = compactar_minimo
+
+        self.operaciones_en_cola = 0
+        self.cierres = {}
+        self.operaciones_con_clave = []
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex
+        self._ultimo_seq = 0
+        self._recargar = False
+        self._esquema_listo = False
+
+        # Métricas del último arranque
+        self.tiempo_carga = 0.0
+        self.operaciones_repetidas = 0
+
+    def _origen(self):
+        # Distinto en cada proceso aunque el almacén venga de un fork
+        return f"{self._token}:{os.getpid()}"
+
+    def _conexion(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conexion = sqlite3.connect(self.ruta, timeout=self.timeout, isolation_level=None,
+                                       check_same_thread=False, cached_statements=256)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute(f"PRAGMA synchronous={SYNC_SQLITE[self.modo_sync]}")
+            local.conexion = conexion
+            local.pid = os.getpid()
+            local.profundidad = 0
+            local.escrituras = 0
+            with self._lock:
+                self._conexiones.append((local.pid, conexion))
+        return local.conexion
+
+    @contextmanager
+    def transaccion(self):
+        """
+        Transacción de escritura (anidable): bloquea a los demás escritores,
+        de este y de otros procesos, hasta el COMMIT
+        """
+        conexion = self._conexion()
+        local = self._local
+        if local.profundidad:
+            local.profundidad += 1
+            try:
+                yield conexion
+            finally:
+                local.profundidad -= 1
+            return
+
+        conexion.execute("BEGIN IMMEDIATE")
+        local.profundidad = 1
+        local.escrituras = 0
+        try:
+            yield conexion
+        except BaseException:
+            if conexion.in_transaction:
+                conexion.execute("ROLLBACK")
+            # Si ya se había registrado algo, la memoria de este proceso
+            # quedó adelantada respecto a la base: hay que recargar
+            if local.escrituras:
+                self._recargar = True
+            raise
+        else:
+            try:
+                conexion.execute("COMMIT")
+            except sqlite3.Error:
+                self._recargar = True
+                raise
+        finally:
+            local.profundidad = 0
+
+    def cargar(self, fabrica):
+        """
+        Lee el libro completo desde la base
+        Args:
+            fabrica (callable): Crea el registro de una venta desde su dict
+        Returns:
+            tuple: (lista de ventas, siguiente ID)
+        """
+        inicio = time.perf_counter()
+        os.makedirs(os.path.dirname(self.ruta) or '.', exist_ok=True)
+        conexion = self._conexion()
+        if not self._esquema_listo:
+            conexion.executescript(ESQUEMA_SQLITE)
+            self._esquema_listo = True
+
+        ventas = []
+        # Una sola transacción de lectura: ventas, pagos y diario del mismo
+        # instante (si ya estoy dentro de una escritura, uso esa)
+        lectura = nullcontext() if self._local.profundidad else self._lectura(conexion)
+        with lectura:
+            fila = conexion.execute(SQL_LEER_META, ('contador_id',)).fetchone()
+            contador_id = fila[0] if fila else 1
+            ultimo_seq = conexion.execute(SQL_ULTIMO_SEQ).fetchone()[0]
+            cierres = {mes_cierre: json.loads(resumen) for mes_cierre, resumen in conexion.execute(SQL_LEER_CIERRES)}
+            # Claves de idempotencia de la API que siguen en el diario
+            # compartido (un worker nuevo también tiene que conocerlas)
+            con_clave = [json.loads(texto) for texto, in conexion.execute(SQL_LEER_DIARIO_CON_CLAVE)]
+
+            # Las dos consultas vienen ordenadas por venta: las recorro a la par
+            pagos = conexion.execute(SQL_LEER_PAGOS)
+            pago = pagos.fetchone()
+            for (id, cliente, valor_total, abono, saldo_pendiente, rubros, fecha, fecha_registro,
+                 estado, incluida, mes_cierre) in conexion.execute(SQL_LEER_VENTAS):
+                historial = []
+                while pago is not None and pago[0] <= id:
+                    if pago[0] == id:
+                        historial.append({'id': pago[1], 'monto': pago[2], 'fecha': pago[3], 'tipo': pago[4]})
+                    pago = pagos.fetchone()
+                ventas.append(fabrica({
+                    'id': id,
+                    'cliente': cliente,
+                    'valor_total': valor_total,
+                    'abono': abono,
+                    'saldo_pendiente': saldo_pendiente,
+                    'rubros': json.loads(rubros),
+                    'fecha': fecha,
+                    'fecha_registro': fecha_registro,
+                    'estado': estado,
+                    'historial_pagos': historial,
+                    'total_pagos': len(historial),
+                    'incluida_en_estadisticas': bool(incluida),
+                    'mes_cierre': mes_cierre
+                }))
+
+        self._ultimo_seq = ultimo_seq
+        self.cierres = cierres
+        self.operaciones_con_clave = [operacion for operacion in con_clave if 'clave' in operacion]
+        self._recargar = False
+        self.operaciones_repetidas = 0
+        self.tiempo_carga = time.perf_counter() - inicio
+        return ventas, contador_id
+
+    def leer_cambios(self):
+        """
+        Operaciones que registraron otros procesos desde la última lectura
+        Returns:
+            list: Operaciones en orden, o None si hay que recargar el libro
+            completo (el diario ya se recortó o una transacción falló)
+        """
+        if self._recargar:
+            return None
+        conexion = self._conexion()
+        # Meta y diario se leen en el mismo instante (dentro de una transacción)
+        lectura = nullcontext() if self._local.profundidad else self._lectura(conexion)
+        with lectura:
+            fila = conexion.execute(SQL_LEER_META, ('diario_recortado_hasta',)).fetchone()
+            if fila and fila[0] > self._ultimo_seq:
+                return None
+            filas = conexion.execute(SQL_LEER_DIARIO, (self._ultimo_seq,)).fetchall()
+
+        origen = self._origen()
+        cambios = []
+        for seq, origen_fila, texto in filas:
+            if origen_fila != origen:
+                operacion = json.loads(texto)
+                aplicar_cierre(self.cierres, operacion)
+                cambios.append(operacion)
+            self._ultimo_seq = seq
+        return cambios
+
+    def hay_cambios(self):
+        """
+        Si leer_cambios() tiene algo que traer, con una sola consulta por
+        índice y sin leer las operaciones (así un request que no tiene nada
+        nuevo no toma el cerrojo de escritura)
+        Returns:
+            bool: True si hay operaciones nuevas en el diario, se recortó o
+            hay que recargar
+        """
+        if self._recargar:
+            return True
+        fila = self._conexion().execute(SQL_HAY_CAMBIOS, (self._ultimo_seq, self._ultimo_seq)).fetchone()
+        return bool(fila[0])
+
+    @contextmanager
+    def _lectura(self, conexion):
+        conexion.execute("BEGIN")
+        try:
+            yield
+        finally:
+            conexion.execute("COMMIT")
+
+    def registrar(self, operacion):
+        """
+        Aplica una operación a las tablas y la deja en el diario compartido
+        Debe ir dentro de transaccion() después de leer_cambios(), para que
+        la memoria de este proceso esté al día antes de escribir
+        Args:
+            operacion (dict): Operación a guardar (debe tener la clave 'op')
+        """
+        conexion = self._conexion()
+        if not self._local.profundidad:
+            with self.transaccion():
+                return self.registrar(operacion)
+
+        try:
+            self._aplicar_sql(conexion, operacion)
+            seq = conexion.execute(SQL_INSERTAR_DIARIO, (
+                self._origen(), json.dumps(operacion, ensure_ascii=False, separators=(',', ':'))
+            )).lastrowid
+        except Exception:
+            self._recargar = True
+            raise
+        self._local.escrituras += 1
+        self.operaciones_en_cola += 1
+        # Si nadie escribió entre medio (el seq sigue justo al último leído)
+        # lo propio no cuenta como cambio para hay_cambios()
+        if seq == self._ultimo_seq + 1:
+            self._ultimo_seq = seq
+
+    def _aplicar_sql(self, conexion, operacion):
+        tipo = operacion['op']
+
+        if tipo == 'agregar':
+            venta = operacion['venta']
+            conexion.execute(SQL_INSERTAR_VENTA, (
+                venta['id'], venta['cliente'], venta['valor_total'], venta['abono'],
+                venta['saldo_pendiente'], json.dumps(venta['rubros'], ensure_ascii=False),
+                venta['fecha'], venta.get('fecha_registro'), venta['estado'],
+                int(bool(venta.get('incluida_en_estadisticas', True))), venta.get('mes_cierre')
+            ))
+            conexion.executemany(SQL_INSERTAR_PAGO, [
+                (venta['id'], pago['id'], pago['monto'], pago['fecha'], pago['tipo'])
+                for pago in venta.get('historial_pagos', ())
+            ])
+            conexion.execute(SQL_SUBIR_META, ('contador_id', venta['id'] + 1))
+
+        elif tipo == 'pago':
+            pago = operacion['pago']
+            conexion.execute(SQL_INSERTAR_PAGO, (
+                operacion['venta_id'], pago['id'], pago['monto'], pago['fecha'], pago['tipo']
+            ))
+            conexion.execute(SQL_ACTUALIZAR_SALDO, (
+                operacion['abono'], operacion['saldo_pendiente'], operacion['estado'], operacion['venta_id']
+            ))
+
+        elif tipo == 'eliminar':
+            conexion.execute(SQL_ELIMINAR_PAGOS, (operacion['id'],))
+            conexion.execute(SQL_ELIMINAR_VENTA, (operacion['id'],))
+
+        elif tipo == 'cierre':
+            conexion.executemany(SQL_CERRAR_VENTA, [(operacion['mes_cierre'], id) for id in operacion['ids']])
+            resumen = operacion.get('resumen')
+            if resumen:
+                # Acumulo sobre lo que hay en la base (otro worker pudo
+                # cerrar el mismo mes)
+                fila = conexion.execute(SQL_LEER_CIERRE, (resumen['mes_cierre'],)).fetchone()
+                cierres = {resumen['mes_cierre']: json.loads(fila[0])} if fila else {}
+                acumulado = acumular_cierre(cierres, resumen)
+                conexion.execute(SQL_GUARDAR_CIERRE, (
+                    resumen['mes_cierre'], json.dumps(acumulado, ensure_ascii=False, separators=(',', ':'))
+                ))
+                self.cierres[resumen['mes_cierre']] = acumulado
+
+        else:
+            raise ValueError(f"Operación desconocida en el diario: {tipo}")
+
+    def debe_compactar(self, total_ventas):
+        """
+        Indica si ya vale la pena recortar la tabla diario
+        """
+        return self.operaciones_en_cola >= self.compactar_minimo
+
+    def compactar(self, ventas, contador_id):
+        """
+        Recorta el diario compartido dejando las últimas `compactar_minimo`
+        operaciones (las tablas ya tienen el libro, no hace falta instantánea)
+        """
+        with self.transaccion() as conexion:
+            corte = conexion.execute(SQL_ULTIMO_SEQ).fetchone()[0] - self.compactar_minimo
+            if corte > 0:
+                conexion.execute(SQL_RECORTAR_DIARIO, (corte,))
+                conexion.execute(SQL_SUBIR_META, ('diario_recortado_hasta', corte))
+        self.operaciones_en_cola = 0
+
+    def cerrar(self):
+        with self._lock:
+            conexiones, self._conexiones = self._conexiones, []
+        for pid, conexion in conexiones:
+            # Las conexiones heredadas de otro proceso no se tocan
+            if pid == os.getpid():
+                conexion.close()
+        self._local = threading.local()
+
+
+def _sincronizar_directorio(directorio):
+    # Asegura que el rename de la instantánea quede en disco (no existe en Windows)
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directorio, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def crear_almacen():
+    """
+    Crea el almacén según la configuración del entorno
+
+    Variables de entorno:
+        VENTAS_ALMACEN: 'diario' (por defecto), 'sqlite' o 'memoria'
+        VENTAS_DATOS: carpeta de datos (por defecto ./datos junto a app.py)
+        VENTAS_SYNC: 'lote' (por defecto), 'siempre' o 'nunca'
+        VENTAS_COMPACTAR_CADA: mínimo de operaciones antes de compactar
+        VENTAS_ARCHIVAR: '1' (por defecto) pasa las ventas excluidas al
+            archivo por mes (solo con 'diario'); '0' las deja en el libro
+    Returns:
+        AlmacenDiario | AlmacenSQLite | AlmacenMemoria: El almacén configurado
+    """
+    tipo = os.environ.get('VENTAS_ALMACEN', 'diario').strip().lower()
+
+    if tipo == 'memoria':
+        return AlmacenMemoria()
+
+    directorio = os.environ.get('VENTAS_DATOS') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos')
+
+    if tipo == 'sqlite':
+        return AlmacenSQLite(
+            os.path.join(directorio, ARCHIVO_SQLITE),
+            modo_sync=os.environ.get('VENTAS_SYNC', 'lote'),
+            compactar_minimo=int(os.environ.get('VENTAS_COMPACTAR_CADA', 10000))
+        )
+
+    if tipo == 'diario':
+        return AlmacenDiario(
+            directorio,
+            modo_sync=os.environ.get('VENTAS_SYNC', 'lote'),
+            compactar_minimo=int(os.environ.get('VENTAS_COMPACTAR_CADA', 10000)),
+            archivar=os.environ.get('VENTAS_ARCHIVAR', '1').strip() != '0'
+        )
+
+    raise ValueError(f"Tipo de almacén no válido: {tipo}")
@@ -20,6 +20,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Inicializar búsqueda
     initSearch();
     
+    // Inicializar paginación y orden de la tabla
+    initTablePagination();
+    
     // Inicializar header colapsable
     initCollapsibleHeader();
 });
@@ -474,41 +477,33 @@ function performSearch(query) {
     // Actualizar URL sin recargar la página
     window.history.pushState({}, '', currentUrl);
     
-    // Realizar la búsqueda
-    fetch(currentUrl.pathname + currentUrl.search)
-        .then(response => response.text())
-        .then(html => {
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(html, 'text/html');
-            
-            // Actualizar solo la tabla de ventas
-            const newTable = doc.querySelector('.table-container');
-            const currentTable = document.querySelector('.table-container');
-            
-            if (newTable && currentTable) {
-                currentTable.innerHTML = newTable.innerHTML;
+    // Sin búsqueda vuelve la tabla paginada de activas
+    if (!query) {
+        currentUrl.searchParams.delete('pagina');
+        loadTablePage(currentUrl);
+        updateSearchResults('', 0);
+        return;
+    }
+    
+    // Pedir solo el fragmento de la tabla (mucho menos que la página completa)
+    const params = new URLSearchParams({ q: query, formato: 'html' });
+    
+    fetch('/api/buscar?' + params.toString())
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Respuesta ' + response.status);
             }
-            
-            // Actualizar contador de resultados
-            const newResults = doc.querySelector('.search-results');
-            const currentResults = document.querySelector('.search-results');
-            
-            if (newResults && currentResults) {
-                currentResults.innerHTML = newResults.innerHTML;
-            } else if (newResults && !currentResults) {
-                const searchContainer = document.querySelector('.search-container');
-                if (searchContainer) {
-                    searchContainer.appendChild(newResults);
-                }
-            } else if (!newResults && currentResults) {
-                currentResults.remove();
+            const total = parseInt(response.headers.get('X-Total-Resultados') || '0', 10);
+            return response.text().then(html => ({ html, total }));
+        })
+        .then(({ html, total }) => {
+            // Actualizar solo la tabla de ventas
+            const contenedor = document.getElementById('ventas-resultados');
+            if (contenedor) {
+                contenedor.innerHTML = html;
             }
             
-            // Actualizar el input de búsqueda
-            const newInput = doc.getElementById('search-input');
-            if (newInput) {
-                document.getElementById('search-input').value = newInput.value;
-            }
+            updateSearchResults(query, total);
         })
         .catch(error => {
             console.error('Error en la búsqueda:', error);
@@ -517,6 +512,81 @@ function performSearch(query) {
         });
 }
 
+// ========================================
+// PAGINACIÓN DE LA TABLA - Carloszerpav
+// ========================================
+// Los enlaces de orden y de página funcionan sin JavaScript (recargan
+// index), pero si está disponible pido solo el fragmento de la tabla
+
+function initTablePagination() {
+    const contenedor = document.getElementById('ventas-resultados');
+    if (!contenedor) return;
+    
+    contenedor.addEventListener('click', function(e) {
+        const enlace = e.target.closest('a.enlace-tabla');
+        if (!enlace) return;
+        e.preventDefault();
+        
+        const url = new URL(enlace.href, window.location.origin);
+        window.history.pushState({}, '', url);
+        loadTablePage(url);
+    });
+}
+
+function loadTablePage(url, desplazar = true) {
+    const params = new URLSearchParams(url.search);
+    params.delete('q');
+    params.set('formato', 'html');
+    
+    fetch('/api/ventas/activas?' + params.toString())
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Respuesta ' + response.status);
+            }
+            return response.text();
+        })
+        .then(html => {
+            const contenedor = document.getElementById('ventas-resultados');
+            if (contenedor) {
+                contenedor.innerHTML = html;
+                if (desplazar) {
+                    contenedor.scrollIntoView({ behavior: 'smooth', block: 'start' });
+                }
+            }
+        })
+        .catch(error => {
+            console.error('Error al cargar la página de ventas:', error);
+            window.location.href = url.pathname + url.search;
+        });
+}
+
+function updateSearchResults(query, total) {
+    const searchContainer = document.querySelector('.search-container');
+    let results = document.querySelector('.search-results');
+    
+    if (!query) {
+        if (results) {
+            results.remove();
+        }
+        return;
+    }
+    
+    if (!results && searchContainer) {
+        results = document.createElement('div');
+        results.className = 'search-results';
+        searchContainer.appendChild(results);
+    }
+    
+    if (results) {
+        results.innerHTML = `
+            <span class="results-count">${total} resultado${total !== 1 ? 's' : ''}</span>
+            <a href="/" class="clear-search" title="Limpiar búsqueda">
+                <i class="fas fa-times"></i>
+            </a>
+        `;
+    }
+}
+
 // ========================================
 // VALIDACIÓN DE RUBROS - Carloszerpav
 // ========================================
@@ -579,6 +649,174 @@ document.addEventListener('DOMContentLoaded', function() {
     initRubrosValidation();
 });
 
+// ========================================
+// CAMBIOS EN VIVO - Carloszerpav
+// ========================================
+// /api/eventos avisa cada venta, pago o cierre (de este equipo o de los
+// otros del local) y aquí se cambia solo lo que cambió: la fila, las
+// tarjetas y los rubros. Con eso el formulario ya no necesita recargar
+
+let eventosConectados = false;
+let recargaTablaPendiente = null;
+
+// Si el servidor no tiene lugar (503) EventSource no vuelve a intentar:
+// se reconecta a mano después de este tiempo (más un poco al azar)
+const REINTENTO_EVENTOS_MS = 15000;
+
+function initEventosEnVivo() {
+    const principal = document.querySelector('main[data-ultimo-evento]');
+    if (!principal || !window.EventSource) return;
+    principal.classList.add('en-vivo');
+    conectarEventos(principal);
+}
+
+function conectarEventos(principal) {
+    const params = new URLSearchParams({ ultimo: principal.dataset.ultimoEvento });
+    const fuente = new EventSource('/api/eventos?' + params.toString());
+    
+    fuente.addEventListener('open', () => { eventosConectados = true; });
+    fuente.addEventListener('error', () => {
+        eventosConectados = false;
+        if (fuente.readyState === EventSource.CLOSED) {
+            setTimeout(() => conectarEventos(principal), REINTENTO_EVENTOS_MS + Math.random() * REINTENTO_EVENTOS_MS);
+        }
+    });
+    
+    fuente.addEventListener('venta', function(e) {
+        const datos = JSON.parse(e.data);
+        actualizarFilaVenta(datos.id, datos.fila);
+    });
+    
+    fuente.addEventListener('estadisticas', function(e) {
+        // Al reconectar a mano se sigue desde el último aviso recibido
+        if (e.lastEventId) principal.dataset.ultimoEvento = e.lastEventId;
+        const datos = JSON.parse(e.data);
+        const tarjetas = document.getElementById('tarjetas-estadisticas');
+        const rubros = document.getElementById('rubros-estadisticas');
+        if (tarjetas) tarjetas.innerHTML = datos.tarjetas;
+        if (rubros) rubros.innerHTML = datos.rubros;
+    });
+    
+    fuente.addEventListener('tabla', recargarTabla);
+}
+
+function actualizarFilaVenta(id, fila) {
+    const tabla = document.querySelector('#ventas-resultados .ventas-table tbody');
+    const actual = document.querySelector(`#ventas-resultados tr[data-id="${id}"]`);
+    
+    if (actual) {
+        // Ya está en pantalla: se reemplaza o se quita (pagada o eliminada)
+        if (fila) {
+            actual.insertAdjacentHTML('afterend', fila);
+            actual.nextElementSibling.classList.add('actualizada');
+        }
+        actual.remove();
+        return;
+    }
+    
+    // Venta nueva: con una búsqueda abierta no se toca la tabla
+    if (!fila || new URL(window.location).searchParams.get('q')) return;
+    
+    // Ordenada por ID sé dónde va (al final de la última página o al
+    // principio de la primera); en otro orden recargo la página de la tabla
+    const vista = document.querySelector('#ventas-resultados .table-container');
+    if (!tabla || !vista || vista.dataset.orden !== 'id'
+            || tabla.rows.length >= parseInt(vista.dataset.porPagina, 10)) {
+        recargarTabla();
+        return;
+    }
+    if (vista.dataset.dir === 'asc' && vista.dataset.pagina === vista.dataset.paginas) {
+        tabla.insertAdjacentHTML('beforeend', fila);
+        tabla.lastElementChild.classList.add('actualizada');
+    } else if (vista.dataset.dir === 'desc' && vista.dataset.pagina === '1') {
+        tabla.insertAdjacentHTML('afterbegin', fila);
+        tabla.firstElementChild.classList.add('actualizada');
+    }
+}
+
+function recargarTabla() {
+    // Varios avisos seguidos (una importación) se juntan en una recarga
+    if (new URL(window.location).searchParams.get('q')) return;
+    clearTimeout(recargaTablaPendiente);
+    recargaTablaPendiente = setTimeout(() => loadTablePage(new URL(window.location), false), 300);
+}
+
+function initFormularioEnVivo() {
+    const form = document.querySelector('.venta-form');
+    if (!form) return;
+    
+    // Va después de las validaciones: si alguna canceló el envío no hago nada
+    form.addEventListener('submit', function(e) {
+        if (e.defaultPrevented || !eventosConectados) return;
+        e.preventDefault();
+        
+        fetch('/agregar?formato=json', { method: 'POST', body: new FormData(form) })
+            .then(response => response.json().then(datos => ({ ok: response.ok, datos })))
+            .then(({ ok, datos }) => {
+                if (!ok) {
+                    showNotification(datos.error || 'No se pudo guardar la venta', 'error');
+                    return;
+                }
+                form.reset();
+                // Se cortó la conexión: la guardó el service worker (avisa él)
+                if (datos.pendiente) return;
+                showNotification(`Venta #${datos.id} registrada`, 'success');
+            })
+            .catch(error => {
+                console.error('Error al guardar la venta:', error);
+                showNotification('No se pudo guardar la venta, revisa la conexión', 'error');
+            });
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    initEventosEnVivo();
+    initFormularioEnVivo();
+});
+
+// ========================================
+// MODO SIN CONEXIÓN - Carloszerpav
+// ========================================
+// El service worker (static/js/sw.js) guarda la base de la app y las
+// ventas y pagos que se hacen sin señal; aquí solo lo registro y muestro
+// lo que va pasando con la cola
+
+function initModoSinConexion() {
+    // Solo en HTTPS o localhost (el navegador no lo permite en otro caso)
+    if (!('serviceWorker' in navigator) || !window.isSecureContext) return;
+    
+    navigator.serviceWorker.register('/sw.js').catch(error => {
+        console.error('No se pudo registrar el service worker:', error);
+    });
+    
+    navigator.serviceWorker.addEventListener('message', function(e) {
+        const datos = e.data || {};
+        if (datos.tipo === 'pendiente-guardado') {
+            showNotification(`Sin conexión: ${datos.cantidad} pendiente(s) por enviar`, 'warning');
+        } else if (datos.tipo === 'pendientes-enviados') {
+            if (datos.enviados) {
+                showNotification(`Se enviaron ${datos.enviados} registro(s) hechos sin conexión`, 'success');
+            }
+            datos.rechazados.forEach(rechazado => {
+                const que = rechazado.tipo === 'venta' ? 'Una venta' : 'Un pago';
+                showNotification(`${que} hecho sin conexión no se guardó: ${rechazado.error}`, 'error');
+            });
+            if (datos.cantidad) {
+                showNotification(`Sin conexión: ${datos.cantidad} pendiente(s) por enviar`, 'warning');
+            }
+        }
+    });
+    
+    // Al volver la señal (y al abrir la página) se manda lo pendiente,
+    // también donde no hay Background Sync (Safari)
+    const enviarPendientes = () => navigator.serviceWorker.ready
+        .then(registro => registro.active && registro.active.postMessage({ tipo: 'enviar-pendientes' }));
+    window.addEventListener('online', enviarPendientes);
+    enviarPendientes();
+}
+
+document.addEventListener('DOMContentLoaded', initModoSinConexion);
+
 // ========================================
 // HEADER COLAPSABLE MEJORADO - Carloszerpav
 // ========================================
@@ -0,0 +1,268 @@
+// ========================================
+// SERVICE WORKER - Carloszerpav
+// ========================================
+// En el celular la señal va y viene: con esto la app abre sin conexión
+// y las ventas y pagos que se registran sin señal no se pierden
+//
+// - La base de la app (página principal, estilos, script) queda en caché;
+//   la app reemplaza estas URLs por las de static/dist/ con hash, que no
+//   cambian nunca: se sirven de la caché sin volver a preguntar
+// - Las páginas se piden a la red y, si no hay, salen de la caché
+// - Un POST de /agregar o /pago/<id> que no llega queda en una cola
+//   (IndexedDB) y se reenvía al volver la conexión por la API JSON con
+//   una clave de idempotencia: aunque se reenvíe dos veces se registra una
+
+const VERSION_CACHE = 'ventas-v1';
+const CACHE_BASE = `${VERSION_CACHE}-base`;
+const CACHE_PAGINAS = `${VERSION_CACHE}-paginas`;
+const BASE_APP = ['/', '/static/css/style.css', '/static/js/script.js'];
+
+// Páginas que se guardan para abrir sin conexión
+const MAXIMO_PAGINAS = 30;
+
+const BASE_DATOS = 'ventas-offline';
+const COLA = 'pendientes';
+const ETIQUETA_SYNC = 'enviar-pendientes';
+
+self.addEventListener('install', function(event) {
+    event.waitUntil(
+        caches.open(CACHE_BASE)
+            .then(cache => cache.addAll(BASE_APP))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', function(event) {
+    // Borro las cachés de versiones anteriores y los estáticos que ya no
+    // son de la base (los hashes de la construcción anterior)
+    event.waitUntil(
+        caches.keys()
+            .then(nombres => Promise.all(nombres
+                .filter(nombre => nombre.startsWith('ventas-') && !nombre.startsWith(VERSION_CACHE))
+                .map(nombre => caches.delete(nombre))))
+            .then(() => caches.open(CACHE_BASE))
+            .then(cache => cache.keys().then(guardadas => Promise.all(guardadas
+                .filter(guardada => !BASE_APP.includes(new URL(guardada.url).pathname))
+                .map(guardada => cache.delete(guardada)))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', function(event) {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (request.method === 'POST') {
+        if (leerEscritura(url)) event.respondWith(enviarOEncolar(request, url));
+        return;
+    }
+    if (request.method !== 'GET') return;
+
+    if (request.mode === 'navigate') {
+        event.respondWith(paginaRedPrimero(request));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(estaticoDeCache(request));
+    }
+    // La API y /api/eventos van directo a la red
+});
+
+self.addEventListener('sync', function(event) {
+    if (event.tag === ETIQUETA_SYNC) event.waitUntil(enviarPendientes());
+});
+
+self.addEventListener('message', function(event) {
+    if (event.data && event.data.tipo === 'enviar-pendientes') {
+        event.waitUntil(enviarPendientes());
+    }
+});
+
+// ========================================
+// PÁGINAS Y ARCHIVOS ESTÁTICOS
+// ========================================
+
+async function paginaRedPrimero(request) {
+    try {
+        const respuesta = await fetch(request);
+        if (respuesta.ok) guardarPagina(request, respuesta.clone());
+        // Hay red: aprovecho para mandar lo que haya quedado en la cola
+        enviarPendientes();
+        return respuesta;
+    } catch (error) {
+        const guardada = await caches.match(request, { ignoreVary: true });
+        return guardada || caches.match('/');
+    }
+}
+
+async function guardarPagina(request, respuesta) {
+    const cache = await caches.open(CACHE_PAGINAS);
+    await cache.put(request, respuesta);
+    // Solo las últimas visitadas (keys() viene en orden de inserción)
+    const claves = await cache.keys();
+    for (const vieja of claves.slice(0, Math.max(0, claves.length - MAXIMO_PAGINAS))) {
+        await cache.delete(vieja);
+    }
+}
+
+async function estaticoDeCache(request) {
+    // De la caché al instante y se actualiza por detrás para la próxima vez
+    // (los de static/dist/ llevan el hash en el nombre: nunca cambian)
+    const cache = await caches.open(CACHE_BASE);
+    const guardada = await cache.match(request);
+    if (guardada && new URL(request.url).pathname.startsWith('/static/dist/')) return guardada;
+    const deRed = fetch(request)
+        .then(respuesta => {
+            if (respuesta.ok) cache.put(request, respuesta.clone());
+            return respuesta;
+        })
+        .catch(() => guardada);
+    return guardada || deRed;
+}
+
+// ========================================
+// COLA DE ESCRITURAS SIN CONEXIÓN
+// ========================================
+
+function leerEscritura(url) {
+    // Qué formulario es: una venta nueva o un pago de una venta
+    if (url.pathname === '/agregar') return { tipo: 'venta' };
+    const pago = url.pathname.match(/^\/pago\/(\d+)$/);
+    return pago ? { tipo: 'pago', ventaId: parseInt(pago[1], 10) } : null;
+}
+
+async function enviarOEncolar(request, url) {
+    const copia = request.clone();
+    try {
+        return await fetch(request);
+    } catch (error) {
+        // Sin conexión: se guarda lo del formulario para mandarlo después
+        const escritura = leerEscritura(url);
+        const form = await copia.formData();
+        const pendiente = {
+            tipo: escritura.tipo,
+            ventaId: escritura.ventaId,
+            clave: crypto.randomUUID(),
+            creado: Date.now(),
+            datos: escritura.tipo === 'venta'
+                ? {
+                    cliente: form.get('cliente'),
+                    valor_total: form.get('valor_total'),
+                    abono: form.get('abono'),
+                    rubros: form.getAll('rubros'),
+                    // Sin fecha, la del día en que se hizo (no la del reenvío)
+                    fecha: form.get('fecha') || fechaLocal()
+                }
+                : { monto: form.get('monto_pago'), tipo: form.get('tipo_pago') }
+        };
+        await encolar(pendiente);
+        if (self.registration.sync) {
+            self.registration.sync.register(ETIQUETA_SYNC).catch(() => {});
+        }
+        avisarPaginas({ tipo: 'pendiente-guardado', cantidad: await contarPendientes() });
+
+        // El formulario con script espera JSON; el envío normal vuelve al inicio
+        if (url.searchParams.get('formato') === 'json') {
+            return new Response(JSON.stringify({ pendiente: true, clave: pendiente.clave }), {
+                status: 202,
+                headers: { 'Content-Type': 'application/json' }
+            });
+        }
+        return Response.redirect('/', 303);
+    }
+}
+
+function fechaLocal() {
+    const ahora = new Date();
+    return new Date(ahora.getTime() - ahora.getTimezoneOffset() * 60000).toISOString().slice(0, 10);
+}
+
+let envioEnCurso = null;
+
+function enviarPendientes() {
+    // Un solo envío a la vez (la clave igual evitaría duplicados)
+    if (!envioEnCurso) {
+        envioEnCurso = enviarCola().finally(() => { envioEnCurso = null; });
+    }
+    return envioEnCurso;
+}
+
+async function enviarCola() {
+    const pendientes = await leerPendientes();
+    let enviados = 0;
+    const rechazados = [];
+
+    for (const pendiente of pendientes) {
+        const url = pendiente.tipo === 'venta' ? '/api/ventas' : `/api/ventas/${pendiente.ventaId}/pagos`;
+        let respuesta;
+        try {
+            respuesta = await fetch(url, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ ...pendiente.datos, clave: pendiente.clave })
+            });
+        } catch (error) {
+            // Sigue sin conexión: lo que queda se manda la próxima vez
+            break;
+        }
+        if (respuesta.status >= 500) break;
+
+        // Registrado, repetido (ya había llegado) o rechazado por los
+        // datos: en todos los casos sale de la cola
+        if (respuesta.ok) {
+            enviados++;
+        } else {
+            const datos = await respuesta.json().catch(() => ({}));
+            rechazados.push({ tipo: pendiente.tipo, error: datos.error || `Error ${respuesta.status}` });
+        }
+        await quitarPendiente(pendiente.id);
+    }
+
+    if (pendientes.length) {
+        avisarPaginas({ tipo: 'pendientes-enviados', enviados, rechazados, cantidad: await contarPendientes() });
+    }
+}
+
+async function avisarPaginas(mensaje) {
+    const paginas = await self.clients.matchAll({ type: 'window' });
+    paginas.forEach(pagina => pagina.postMessage(mensaje));
+}
+
+// ========================================
+// INDEXEDDB
+// ========================================
+
+function abrirBase() {
+    return new Promise((resolve, reject) => {
+        const pedido = indexedDB.open(BASE_DATOS, 1);
+        pedido.onupgradeneeded = () => pedido.result.createObjectStore(COLA, { keyPath: 'id', autoIncrement: true });
+        pedido.onsuccess = () => resolve(pedido.result);
+        pedido.onerror = () => reject(pedido.error);
+    });
+}
+
+async function usarCola(modo, operar) {
+    const base = await abrirBase();
+    return new Promise((resolve, reject) => {
+        const transaccion = base.transaction(COLA, modo);
+        const pedido = operar(transaccion.objectStore(COLA));
+        transaccion.oncomplete = () => { base.close(); resolve(pedido.result); };
+        transaccion.onerror = () => { base.close(); reject(transaccion.error); };
+    });
+}
+
+function encolar(pendiente) {
+    return usarCola('readwrite', cola => cola.add(pendiente));
+}
+
+function leerPendientes() {
+    // En orden de llegada (la clave es autoincremental)
+    return usarCola('readonly', cola => cola.getAll());
+}
+
+function contarPendientes() {
+    return usarCola('readonly', cola => cola.count());
+}
+
+function quitarPendiente(id) {
+    return usarCola('readwrite', cola => cola.delete(id));
+}
@@ -0,0 +1,13 @@
+# ========================================
+# PRUEBAS - Carloszerpav
+# ========================================
+# Los módulos de la app están sueltos en la raíz del repo (sin paquete):
+# la agrego al path para que las pruebas los importen igual que app.py
+#
+# Uso:
+#   python -m pytest -q
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
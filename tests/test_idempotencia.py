@@ -0,0 +1,124 @@
+# ========================================
+# PRUEBAS DE LAS CLAVES DE IDEMPOTENCIA - Carloszerpav
+# ========================================
+# Un reintento con la misma clave no registra dos veces, una escritura
+# deshecha libera su clave y el vencimiento de cada clave sobrevive a
+# recargar el libro (sale de 'creada' en la operación guardada)
+#
+# Las pruebas de la API importan app.py con el almacén SQLite en una
+# carpeta temporal (el módulo se importa una sola vez por sesión)
+
+import importlib
+
+import pytest
+
+from idempotencia import VIDA_CLAVES, ClavesIdempotencia
+
+
+class Reloj:
+    def __init__(self, ahora=1000.0):
+        self.ahora = ahora
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_repetido_y_conflicto():
+    claves = ClavesIdempotencia(reloj=Reloj())
+    assert claves.buscar(('venta', 'k1'), 'abc') is None
+    claves.recordar(('venta', 'k1'), 'abc', 7)
+    assert claves.buscar(('venta', 'k1'), 'abc') == (7, True)
+    assert claves.buscar(('venta', 'k1'), 'otra') == (7, False)
+    assert (claves.repetidas, claves.conflictos) == (1, 1)
+
+
+def test_vence_desde_que_se_creo():
+    reloj = Reloj()
+    claves = ClavesIdempotencia(vida=100, reloj=reloj)
+    claves.recordar(('venta', 'k1'), 'abc', 1, creada=reloj.ahora - 90)
+    assert claves.buscar(('venta', 'k1'), 'abc') == (1, True)
+    reloj.ahora += 10
+    assert claves.buscar(('venta', 'k1'), 'abc') is None
+
+    # Una clave que ya venció al cargarla no ocupa lugar
+    claves.recordar(('venta', 'k2'), 'abc', 2, creada=reloj.ahora - 100)
+    assert len(claves) == 1
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as entorno:
+        entorno.setenv('VENTAS_ALMACEN', 'sqlite')
+        entorno.setenv('VENTAS_DATOS', str(tmp_path_factory.mktemp('datos')))
+        entorno.setenv('VENTAS_LOG', 'CRITICAL')
+        modulo = importlib.import_module('app')
+    yield modulo
+    modulo.almacen.cerrar()
+
+
+@pytest.fixture
+def cliente(app, monkeypatch):
+    monkeypatch.setattr(app.claves_idempotencia, 'reloj', Reloj())
+    return app.app.test_client()
+
+
+def venta(cliente, clave):
+    return {'cliente': cliente, 'valor_total': 50, 'rubros': ['Zapatos'], 'clave': clave}
+
+
+def test_api_clave_repetida(app, cliente):
+    respuesta = cliente.post('/api/ventas', json=venta('Ana', 'repetida-1'))
+    assert respuesta.status_code == 201
+    id = respuesta.json['venta']['id']
+    total = len(app.ventas)
+
+    respuesta = cliente.post('/api/ventas', json=venta('Ana', 'repetida-1'))
+    assert respuesta.status_code == 200
+    assert respuesta.json['estado'] == 'repetido'
+    assert respuesta.json['venta']['id'] == id
+    assert len(app.ventas) == total
+
+    respuesta = cliente.post('/api/ventas', json=venta('Otra', 'repetida-1'))
+    assert respuesta.status_code == 409
+    assert respuesta.json['estado'] == 'conflicto'
+
+
+def test_api_clave_de_escritura_deshecha_se_puede_reusar(app, cliente, monkeypatch):
+    original = app.leer_venta_nueva
+
+    def falla(cliente, *args, **kwargs):
+        if cliente == 'Falla':
+            raise RuntimeError("disco lleno")
+        return original(cliente, *args, **kwargs)
+
+    # El segundo elemento rompe el envío: la transacción se deshace entera,
+    # también la venta ya registrada con 'deshecha-1'
+    monkeypatch.setattr(app, 'leer_venta_nueva', falla)
+    total = len(app.ventas)
+    respuesta = cliente.post('/api/ventas', json=[venta('Ana', 'deshecha-1'), venta('Falla', 'deshecha-2')])
+    assert respuesta.status_code == 500
+    # La memoria se rehace desde la base con el request siguiente
+    cliente.get('/api/ventas?limite=1')
+    assert len(app.ventas) == total
+
+    monkeypatch.setattr(app, 'leer_venta_nueva', original)
+    respuesta = cliente.post('/api/ventas', json=[venta('Ana', 'deshecha-1'), venta('Beto', 'deshecha-2')])
+    assert [resultado['estado'] for resultado in respuesta.json['resultados']] == ['registrado', 'registrado']
+    assert len(app.ventas) == total + 2
+
+
+def test_api_clave_vence_igual_despues_de_recargar(app, cliente):
+    reloj = app.claves_idempotencia.reloj
+    assert cliente.post('/api/ventas', json=venta('Ana', 'recarga-1')).status_code == 201
+
+    # Recargar el libro (como un reinicio o un worker nuevo) casi al final
+    # de la vida de la clave: sigue valiendo solo lo que le quedaba
+    reloj.ahora += VIDA_CLAVES - 10
+    app.claves_idempotencia.limpiar()
+    app.recargar_ventas()
+    assert cliente.post('/api/ventas', json=venta('Ana', 'recarga-1')).json['estado'] == 'repetido'
+
+    reloj.ahora += 20
+    app.claves_idempotencia.limpiar()
+    app.recargar_ventas()
+    assert cliente.post('/api/ventas', json=venta('Ana', 'recarga-1')).json['estado'] == 'registrado'
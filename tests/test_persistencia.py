@@ -0,0 +1,278 @@
+# ========================================
+# PRUEBAS DE LOS ALMACENES - Carloszerpav
+# ========================================
+# AlmacenDiario tiene que devolver el mismo libro después de reiniciar:
+# instantánea + cola del diario, una caída a mitad de una línea y
+# compactaciones en el medio
+#
+# AlmacenSQLite: dos almacenes sobre la misma base hacen de dos workers
+# (cada uno tiene su origen en el diario compartido)
+
+import json
+import os
+
+import pytest
+
+from modelo import LibroPagos, Venta, configurar_rubros
+from persistencia import AlmacenDiario, AlmacenSQLite, aplicar_operacion
+
+RUBROS = ['Maquillaje', 'Renacer', 'Tendencia', 'Accesorios', 'Zapatos']
+
+
+@pytest.fixture(autouse=True)
+def rubros():
+    configurar_rubros(RUBROS)
+
+
+def venta_nueva(id, valor=100.0, abono=0.0, fecha='2025-03-10'):
+    return {
+        'id': id, 'cliente': f"Cliente {id}", 'valor_total': valor, 'abono': abono,
+        'saldo_pendiente': valor - abono, 'rubros': ['Maquillaje'], 'fecha': fecha,
+        'fecha_registro': f"{fecha} 10:00", 'estado': 'Activa' if abono < valor else 'Cerrada',
+        'historial_pagos': [], 'total_pagos': 0, 'incluida_en_estadisticas': True, 'mes_cierre': None
+    }
+
+
+def pago(venta_id, monto, abono, valor=100.0):
+    return {
+        'op': 'pago', 'venta_id': venta_id,
+        'pago': {'id': 1, 'monto': monto, 'fecha': '2025-03-11 09:30', 'tipo': 'Efectivo'},
+        'abono': abono, 'saldo_pendiente': valor - abono,
+        'estado': 'Activa' if abono < valor else 'Cerrada'
+    }
+
+
+def abrir(directorio):
+    """
+    Un almacén nuevo sobre el directorio, como al arrancar la app
+    Returns:
+        tuple: (almacén, {id: venta como dict}, siguiente ID)
+    """
+    almacen = AlmacenDiario(str(directorio), modo_sync='nunca', archivar=False)
+    libro = LibroPagos()
+    ventas, contador_id = almacen.cargar(lambda datos: Venta.desde_dict(datos, libro))
+    return almacen, {venta['id']: venta.a_dict() for venta in ventas}, contador_id
+
+
+def lineas_del_diario(almacen):
+    with open(almacen.ruta_diario, 'rb') as f:
+        return f.read().split(b'\n')
+
+
+def test_repite_solo_la_cola_despues_de_la_instantanea(tmp_path):
+    almacen, _, _ = abrir(tmp_path)
+    for id in (1, 2, 3):
+        almacen.registrar({'op': 'agregar', 'venta': venta_nueva(id)})
+    almacen.cerrar()
+    almacen, ventas, contador_id = abrir(tmp_path)
+    almacen.compactar(ventas.values(), contador_id)
+
+    # La cola: una venta nueva, un pago y una eliminación
+    almacen.registrar({'op': 'agregar', 'venta': venta_nueva(4)})
+    almacen.registrar(pago(2, 40.0, 40.0))
+    almacen.registrar({'op': 'eliminar', 'id': 1})
+    almacen.cerrar()
+
+    almacen, ventas, contador_id = abrir(tmp_path)
+    almacen.cerrar()
+    assert almacen.operaciones_repetidas == 3
+    assert sorted(ventas) == [2, 3, 4]
+    assert contador_id == 5
+    assert ventas[2]['abono'] == 40.0
+    assert ventas[2]['saldo_pendiente'] == 60.0
+    assert [p['monto'] for p in ventas[2]['historial_pagos']] == [40.0]
+
+
+@pytest.mark.parametrize('corte', [0.5, 1.0], ids=['mitad', 'sin_salto_de_linea'])
+def test_descarta_la_ultima_linea_cortada(tmp_path, corte):
+    almacen, _, _ = abrir(tmp_path)
+    almacen.registrar({'op': 'agregar', 'venta': venta_nueva(1)})
+    almacen.registrar({'op': 'agregar', 'venta': venta_nueva(2)})
+    almacen.cerrar()
+    tamano = os.path.getsize(almacen.ruta_diario)
+
+    # El proceso se cae mientras escribe la tercera operación (a la mitad,
+    # o con el JSON entero pero antes del salto de línea)
+    linea = json.dumps({'op': 'agregar', 'venta': venta_nueva(3), 'lsn': 3}).encode('utf-8')
+    with open(almacen.ruta_diario, 'ab') as f:
+        f.write(linea[:int(len(linea) * corte)])
+
+    almacen, ventas, contador_id = abrir(tmp_path)
+    assert sorted(ventas) == [1, 2]
+    assert contador_id == 3
+    assert almacen.lsn == 2
+    # La línea cortada se quita del archivo, no solo al leer
+    assert os.path.getsize(almacen.ruta_diario) == tamano
+
+    # Lo que se registra después queda en su propia línea
+    almacen.registrar({'op': 'agregar', 'venta': venta_nueva(3)})
+    almacen.cerrar()
+    almacen, ventas, _ = abrir(tmp_path)
+    almacen.cerrar()
+    assert sorted(ventas) == [1, 2, 3]
+    assert almacen.lsn == 3
+
+
+def test_compactar_conserva_el_lsn(tmp_path):
+    almacen, _, _ = abrir(tmp_path)
+    for id in (1, 2):
+        almacen.registrar({'op': 'agregar', 'venta': venta_nueva(id)})
+    almacen.registrar(pago(1, 30.0, 30.0))
+    lsn = almacen.lsn
+
+    almacen.cerrar()
+    with open(almacen.ruta_diario, 'rb') as f:
+        diario_viejo = f.read()
+    almacen, ventas, contador_id = abrir(tmp_path)
+    almacen.compactar(ventas.values(), contador_id)
+    assert almacen.lsn == lsn
+    with open(almacen.ruta_instantanea, encoding='utf-8') as f:
+        assert json.loads(f.readline())['lsn'] == lsn
+
+    # Después de compactar la numeración sigue donde iba
+    almacen.registrar({'op': 'agregar', 'venta': venta_nueva(3)})
+    almacen.cerrar()
+    assert json.loads(lineas_del_diario(almacen)[0])['lsn'] == lsn + 1
+
+    # Una caída entre la instantánea y borrar el diario viejo deja las
+    # operaciones ya compactadas en el diario: se saltan por su lsn
+    with open(almacen.ruta_diario, 'wb') as f:
+        f.write(diario_viejo)
+    almacen, ventas, _ = abrir(tmp_path)
+    almacen.cerrar()
+    assert almacen.operaciones_repetidas == 0
+    assert almacen.lsn == lsn
+    assert [p['monto'] for p in ventas[1]['historial_pagos']] == [30.0]
+
+
+def test_escritura_deshecha_no_deja_registros_a_medias(tmp_path):
+    almacen, _, _ = abrir(tmp_path)
+    almacen.registrar({'op': 'agregar', 'venta': venta_nueva(1)})
+    almacen.cerrar()
+
+    # Un pago que no terminó de escribirse (sin salto de línea) y una
+    # compactación que murió antes de reemplazar la instantánea
+    linea = json.dumps(dict(pago(1, 50.0, 50.0), lsn=2)).encode('utf-8')
+    with open(almacen.ruta_diario, 'ab') as f:
+        f.write(linea[:-10])
+    with open(almacen.ruta_instantanea + '.tmp', 'w', encoding='utf-8') as f:
+        f.write('{"lsn": 99, "contador_id"')
+
+    almacen, ventas, _ = abrir(tmp_path)
+    assert ventas[1]['historial_pagos'] == []
+    assert ventas[1]['abono'] == 0.0
+
+    # El pago se reintenta: queda en una línea propia, con el lsn del que
+    # se perdió, y nada del intento anterior sobrevive
+    almacen.registrar(pago(1, 50.0, 50.0))
+    almacen.cerrar()
+    lineas = lineas_del_diario(almacen)
+    assert lineas[-1] == b''
+    assert [json.loads(linea)['lsn'] for linea in lineas[:-1]] == [1, 2]
+
+    almacen, ventas, _ = abrir(tmp_path)
+    almacen.cerrar()
+    assert almacen.operaciones_repetidas == 2
+    assert [p['monto'] for p in ventas[1]['historial_pagos']] == [50.0]
+    assert ventas[1]['saldo_pendiente'] == 50.0
+
+
+# ---- AlmacenSQLite: varios workers sobre una base ----
+
+class Worker:
+    """
+    Lo que hace cada proceso de la app con el almacén compartido: su
+    libro en memoria y sincronizar_ventas() antes de leer o escribir
+    """
+
+    def __init__(self, ruta):
+        self.almacen = AlmacenSQLite(ruta, modo_sync='nunca')
+        self.recargas = 0
+        self.cargar()
+
+    def cargar(self):
+        self.libro = LibroPagos()
+        ventas, self.contador_id = self.almacen.cargar(self.fabrica)
+        self.ventas = {venta['id']: venta for venta in ventas}
+
+    def fabrica(self, datos):
+        return Venta.desde_dict(datos, self.libro)
+
+    def sincronizar(self):
+        if not self.almacen.hay_cambios():
+            return
+        cambios = self.almacen.leer_cambios()
+        if cambios is None:
+            self.recargas += 1
+            self.cargar()
+            return
+        for operacion in cambios:
+            aplicar_operacion(self.ventas, operacion, self.fabrica)
+
+    def agregar(self, id):
+        with self.almacen.transaccion():
+            self.sincronizar()
+            self.almacen.registrar({'op': 'agregar', 'venta': venta_nueva(id)})
+            self.ventas[id] = self.fabrica(venta_nueva(id))
+
+
+@pytest.fixture
+def workers(tmp_path):
+    ruta = str(tmp_path / 'ventas.db')
+    uno, otro = Worker(ruta), Worker(ruta)
+    yield uno, otro
+    uno.almacen.cerrar()
+    otro.almacen.cerrar()
+
+
+def test_sqlite_lo_escrito_en_un_worker_llega_al_otro(workers):
+    uno, otro = workers
+    uno.agregar(1)
+    with uno.almacen.transaccion():
+        uno.almacen.registrar(pago(1, 40.0, 40.0))
+
+    # Lo propio no cuenta como cambio
+    assert not uno.almacen.hay_cambios()
+    assert otro.almacen.hay_cambios()
+    otro.sincronizar()
+    assert otro.recargas == 0
+    assert not otro.almacen.hay_cambios()
+    assert sorted(otro.ventas) == [1]
+    assert otro.ventas[1]['abono'] == 40.0
+    assert [p['monto'] for p in otro.ventas[1]['historial_pagos']] == [40.0]
+
+    # Y al revés, con el libro del otro ya al día
+    otro.agregar(2)
+    uno.sincronizar()
+    assert sorted(uno.ventas) == [1, 2]
+
+
+def test_sqlite_rollback_recarga_el_libro(workers):
+    uno, otro = workers
+    uno.agregar(1)
+    otro.sincronizar()
+
+    # La venta 2 queda en la memoria de este worker pero la transacción
+    # se deshace: la base no la tiene
+    with pytest.raises(RuntimeError):
+        with uno.almacen.transaccion():
+            uno.sincronizar()
+            uno.almacen.registrar({'op': 'agregar', 'venta': venta_nueva(2)})
+            uno.ventas[2] = uno.fabrica(venta_nueva(2))
+            raise RuntimeError("falla después de registrar")
+
+    assert uno.almacen.hay_cambios()
+    uno.sincronizar()
+    assert uno.recargas == 1
+    assert sorted(uno.ventas) == [1]
+    assert uno.contador_id == 2
+
+    # El otro worker nunca vio nada de lo deshecho
+    assert not otro.almacen.hay_cambios()
+    assert sorted(otro.ventas) == [1]
+
+    # Un rollback sin nada registrado no obliga a recargar
+    with pytest.raises(RuntimeError):
+        with uno.almacen.transaccion():
+            raise RuntimeError("falla antes de registrar")
+    assert not uno.almacen.hay_cambios()
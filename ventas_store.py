@@ -0,0 +1,225 @@
+# ========================================
+# ALMACÉN INDEXADO DE VENTAS - Carloszerpav
+# ========================================
+# Aquí guardo las ventas con índices para no recorrer toda la lista
+# cada vez que busco una venta, registro un pago o elimino algo
+#
+# - Índice principal por ID (dict, conserva el orden de registro)
+# - Índices secundarios por 'estado' y por 'incluida_en_estadisticas'
+# - Índices derivados registrados con registrar_indice() (estadísticas,
+#   etc.) que reciben cada cambio como quitar(venta) + agregar(venta)
+#   (si el índice declara 'campos', actualizar() solo lo toca cuando
+#   cambia alguno de esos campos)
+#
+# - Lista de IDs ordenada para recorrer por cursor (paginación/streaming)
+# - Versión que sube con cada cambio, para los cachés y los ETag
+#
+# Importante: los campos indexados se cambian siempre con actualizar(),
+# nunca directamente sobre el dict de la venta
+
+from bisect import bisect_right, insort
+
+
+class VentaStore:
+    """
+    Colección de ventas con búsquedas O(1) por ID y filtros O(k)
+    por estado / inclusión en estadísticas
+    """
+
+    def __init__(self, ventas=(), version=0):
+        """
+        Args:
+            ventas (iterable): Ventas iniciales
+            version (int): Versión de arranque (al recargar el libro se
+                sigue desde la anterior, así nunca se repite)
+        """
+        self._por_id = {}
+        self._por_estado = {}
+        self._por_inclusion = {True: {}, False: {}}
+        self._indices = []
+        # IDs en orden; al eliminar queda un hueco que se limpia después
+        self._orden = []
+        self._huecos = 0
+        # Sube con cada agregar / eliminar / actualizar
+        self.version = 0
+
+        for venta in ventas:
+            self.agregar(venta)
+        self.version = version
+
+    def __len__(self):
+        return len(self._por_id)
+
+    def __iter__(self):
+        return iter(list(self._por_id.values()))
+
+    def __contains__(self, id):
+        return id in self._por_id
+
+    def registrar_indice(self, indice):
+        """
+        Registra un índice derivado que se mantiene con cada cambio
+        Args:
+            indice: Objeto con métodos agregar(venta) y quitar(venta)
+        Returns:
+            El mismo índice, ya cargado con las ventas actuales
+        """
+        for venta in self._por_id.values():
+            indice.agregar(venta)
+        self._indices.append(indice)
+        return indice
+
+    def _indexar(self, venta, indices=None):
+        id = venta['id']
+        self._por_estado.setdefault(venta['estado'], {})[id] = venta
+        self._por_inclusion[bool(venta.get('incluida_en_estadisticas', True))][id] = venta
+        for indice in self._indices if indices is None else indices:
+            indice.agregar(venta)
+
+    def _desindexar(self, venta, indices=None):
+        id = venta['id']
+        self._por_estado.get(venta['estado'], {}).pop(id, None)
+        self._por_inclusion[bool(venta.get('incluida_en_estadisticas', True))].pop(id, None)
+        for indice in self._indices if indices is None else indices:
+            indice.quitar(venta)
+
+    def agregar(self, venta):
+        """
+        Agrega una venta nueva al almacén
+        Args:
+            venta (dict): La venta a guardar (su 'id' debe ser único)
+        """
+        id = venta['id']
+        if id in self._por_id:
+            raise ValueError(f"Ya existe una venta con ID {id}")
+        self._por_id[id] = venta
+        if not self._orden or id > self._orden[-1]:
+            self._orden.append(id)
+        else:
+            insort(self._orden, id)
+        self._indexar(venta)
+        self.version += 1
+
+    def obtener(self, id):
+        """
+        Obtiene una venta por ID
+        Returns:
+            dict: La venta o None si no existe
+        """
+        return self._por_id.get(id)
+
+    def eliminar(self, id):
+        """
+        Elimina una venta por ID
+        Returns:
+            dict: La venta eliminada o None si no existía
+        """
+        venta = self._por_id.pop(id, None)
+        if venta is not None:
+            self._desindexar(venta)
+            self.version += 1
+            self._huecos += 1
+            if self._huecos > len(self._orden) // 2:
+                self._orden = [i for i in self._orden if i in self._por_id]
+                self._huecos = 0
+        return venta
+
+    def actualizar(self, venta, **cambios):
+        """
+        Cambia campos de una venta manteniendo los índices al día
+        Args:
+            venta (dict): Venta que ya está en el almacén
+            **cambios: Campos a modificar
+        Returns:
+            dict: La venta actualizada
+        """
+        # Solo los índices que dependen de algún campo que cambia de verdad
+        # (un pago no mueve el índice por cliente ni el de fecha)
+        cambiados = {campo for campo, valor in cambios.items() if venta.get(campo) != valor}
+        indices = [indice for indice in self._indices
+                   if getattr(indice, 'campos', None) is None or not cambiados.isdisjoint(indice.campos)]
+        self._desindexar(venta, indices)
+        venta.update(cambios)
+        self._indexar(venta, indices)
+        self.version += 1
+        return venta
+
+    def filtrar(self, estado=None, incluida=None):
+        """
+        Devuelve las ventas que cumplen los filtros, ordenadas por ID
+        Args:
+            estado (str): 'Activa' o 'Cerrada' (None = cualquiera)
+            incluida (bool): Si está incluida en estadísticas (None = cualquiera)
+        Returns:
+            list: Las ventas encontradas
+        """
+        candidatos = []
+        if estado is not None:
+            candidatos.append(self._por_estado.get(estado, {}))
+        if incluida is not None:
+            candidatos.append(self._por_inclusion[bool(incluida)])
+        if not candidatos:
+            return list(self._por_id.values())
+
+        # Recorro el índice más chico y compruebo el otro por ID
+        candidatos.sort(key=len)
+        menor = candidatos[0]
+        otros = candidatos[1:]
+        resultado = [venta for id, venta in menor.items() if all(id in otro for otro in otros)]
+
+        # Una venta entra al índice al cambiar de estado, así que el orden
+        # puede no coincidir con el de registro (casi ordenado: sort es O(k))
+        resultado.sort(key=lambda venta: venta['id'])
+        return resultado
+
+    def contar(self, estado=None, incluida=None):
+        """
+        Cuenta las ventas que cumplen los filtros
+        Returns:
+            int: Cantidad de ventas
+        """
+        if estado is None and incluida is None:
+            return len(self._por_id)
+        if incluida is None:
+            return len(self._por_estado.get(estado, {}))
+        if estado is None:
+            return len(self._por_inclusion[bool(incluida)])
+        return len(self.filtrar(estado, incluida))
+
+    def recorrer(self, despues_de=None, estado=None, incluida=None, lote=512):
+        """
+        Recorre las ventas en orden de ID a partir de un cursor
+        Va leyendo de a lotes y retoma por ID, así no copia el libro
+        completo y tolera cambios mientras se recorre
+        Args:
+            despues_de (int): Cursor - solo ventas con ID mayor (None = desde el inicio)
+            estado (str): Filtrar por estado
+            incluida (bool): Filtrar por inclusión en estadísticas
+            lote (int): Cuántos IDs leer por vuelta
+        Yields:
+            dict: Cada venta que cumple los filtros
+        """
+        # Si el filtro deja pocas ventas, recorro directamente su índice
+        if estado is not None or incluida is not None:
+            if self.contar(estado, incluida) * 8 < len(self._por_id):
+                for venta in self.filtrar(estado, incluida):
+                    if despues_de is None or venta['id'] > despues_de:
+                        yield venta
+                return
+
+        cursor = despues_de
+        while True:
+            inicio = 0 if cursor is None else bisect_right(self._orden, cursor)
+            ids = self._orden[inicio:inicio + lote]
+            if not ids:
+                return
+            for id in ids:
+                venta = self._por_id.get(id)
+                if venta is None:
+                    continue
+                if estado is not None and venta['estado'] != estado:
+                    continue
+                if incluida is not None and bool(venta.get('incluida_en_estadisticas', True)) != bool(incluida):
+                    continue
+                yield venta
+            cursor = ids[-1]